@@ -1,5 +1,6 @@
 from tools.tool_definition import tools  
 from langchain_openai import ChatOpenAI
+from tools.tracing import llm_timer
 from dotenv import load_dotenv 
 import os
 
@@ -13,5 +14,15 @@ llm = ChatOpenAI(
     model="gpt-4o",
     temperature=0, #temperatura a 0 para evitar respuestas "creativas"
     streaming=True, #streaming para la experiencia de usuario
-    api_key=OPEN_AI_KEY
+    stream_usage=True, #para tener los tokens de prompt reales en usage_metadata también en streaming
+    api_key=OPEN_AI_KEY,
+    callbacks=[llm_timer], #duración de cada llamada y tiempo hasta el primer token (tools/tracing.py)
 ).bind_tools(tools)
+
+# Modelo sin herramientas y más barato para resumir conversaciones largas (nodo summarize)
+summary_llm = ChatOpenAI(
+    model="gpt-4o-mini",
+    temperature=0,
+    api_key=OPEN_AI_KEY,
+    callbacks=[llm_timer],
+)
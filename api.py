@@ -1,16 +1,133 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 from graph.workflow import build_graph
+from graph.response_cache import ResponseCache, RESPONSE_CACHE
+from graph.router import find_degrees
+from graph.tools_node import tool_memo
+from tools.resources import registry
+from tools.executor import run_blocking
+from tools.retrieval_tool import aembed_query, collection_version
+from tools.get_subjects import catalogue_version
+from tools import tracing
+from dotenv import load_dotenv
+import asyncio
 import uuid
 import json
+import os
 
-app = FastAPI(title="University agent")
+load_dotenv()
+WARM_UP = os.getenv("WARM_UP", "1") == "1" #cargar modelo, chroma y catálogo en segundo plano al arrancar
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "10")) #comentario SSE si no se envía nada en este tiempo
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # los recursos pesados se cargan en un hilo aparte: la API responde a /health desde el primer momento
+    if WARM_UP:
+        registry.start_warm_up()
+    yield
+
+
+app = FastAPI(title="University agent", lifespan=lifespan)
+
+
+class RequestTraceMiddleware:
+    """
+    Middleware ASGI: cada petición a los endpoints de chat recibe un request-id (cabecera X-Request-ID del cliente
+    o uno nuevo), se devuelve en la respuesta y liga todos los tramos medidos durante la petición, incluido
+    el streaming completo de /chat/stream (ver tools/tracing.py).
+    """
+
+    def __init__(self, app, paths=("/chat", "/chat/stream")):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or tracing.new_request_id()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        with tracing.trace(request_id, endpoint=scope["path"]):
+            await self.app(scope, receive, send_with_id)
+
+
+app.add_middleware(RequestTraceMiddleware)
 
 # se construye el grafo del agente (LangGraph) una sola vez al arrancar la API.
 graph = build_graph()
 
+
+def data_version():
+    # cambia cuando se re-ingiere la colección de chroma o el catálogo de asignaturas
+    return (collection_version(), catalogue_version())
+
+
+def reload_data():
+    # tras una re-ingesta se recargan la colección, los índices léxico y cuantizado y el catálogo en el siguiente uso
+    registry.reset("collection")
+    registry.reset("lexical_index")
+    registry.reset("quantized_index")
+    registry.reset("subject_index")
+    registry.reset("degree_resolver")
+    # los resultados de herramientas memorizados por hilo se calcularon con los datos anteriores
+    tool_memo.clear()
+
+
+# caché de respuestas delante del grafo (preguntas repetidas o casi iguales no pasan por el LLM)
+response_cache = ResponseCache(version_fn=data_version, on_invalidate=reload_data) if RESPONSE_CACHE else None
+
+
+async def lookup_cached_reply(message: str, config: dict, new_thread: bool):
+    """
+    Busca la respuesta en la caché. Solo se usa al inicio de una conversación: con historial,
+    la misma pregunta puede significar otra cosa ("¿y sus salidas?").
+    Devuelve (respuesta o None, (embedding, grados) de la pregunta para store_reply o None si no hace falta guardarla).
+    El embedding y los grados solo se calculan si falla la búsqueda exacta. El embedding pasa por la caché de
+    embeddings y el batcher de consultas (aembed_query): si el agente busca la pregunta tal cual, retrieve_docs
+    ya lo encuentra hecho.
+    """
+    if response_cache is None:
+        return None, None
+
+    # con un thread_id nuevo no hay historial que leer
+    if not new_thread:
+        state = await graph.aget_state(config)
+        if state.values.get("messages"):
+            return None, None
+
+    query = None
+    answer = response_cache.lookup_exact(message)
+    if answer is None:
+        embedding, degrees = await asyncio.gather(aembed_query(message), run_blocking(find_degrees, message))
+        query = (embedding, degrees)
+        answer = response_cache.lookup_similar(embedding, degrees)
+    if answer is not None:
+        # se guarda el turno en el historial del hilo como si lo hubiera respondido el agente
+        await graph.aupdate_state(
+            config,
+            {"messages": [HumanMessage(content=message), AIMessage(content=answer)]},
+            as_node="agent",
+        )
+    return answer, query
+
+
+def store_reply(message: str, messages: list, query):
+    """Guarda la respuesta final del turno (query: embedding y grados que devolvió lookup_cached_reply)."""
+    if response_cache is None or query is None:
+        return
+    embedding, degrees = query
+    response_cache.store(message, messages[-1].content, embedding, degrees)
+
 #Modelo pydantic de entrada y salida
 class ChatRequest(BaseModel):
     message: str
@@ -33,18 +150,62 @@ async def chat(request: ChatRequest):
     - Se devuelve la última respuesta generada por el agente.
     """
     thread_id = request.thread_id or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+
+    with tracing.span("response_cache"):
+        cached, query = await lookup_cached_reply(request.message, config, request.thread_id is None)
+    if cached is not None:
+        return ChatResponse(reply=cached, thread_id=thread_id)
+
     # se ejecuta el grafo con el mensaje del usuario
-    result = graph.invoke(
+    # ainvoke: mientras el LLM o las herramientas trabajan, el event loop sigue atendiendo otras peticiones
+    result = await graph.ainvoke(
         {"messages": [HumanMessage(content=request.message)]},
-        config={"configurable": {"thread_id": thread_id}},
+        config=config,
     )
 
+    store_reply(request.message, result["messages"], query)
     reply = result["messages"][-1].content
     return ChatResponse(reply=reply, thread_id=thread_id)
 
 
 from langchain_core.messages import AIMessageChunk
 
+
+def sse(event: dict) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+async def stream_events(message: str, config: dict):
+    """
+    Eventos del grafo para /chat/stream, en el orden en que se producen:
+    - tool_decision: el LLM ha decidido llamar a una herramienta; sale con el primer fragmento de la tool call,
+      antes de que el LLM termine de generar los argumentos
+    - tool_start / tool_end: cada herramienta al empezar y al terminar (los emite ToolsNode, modo "custom")
+    - token: texto del LLM del nodo agent, en cuanto llega cada fragmento
+    """
+    decided = set()
+    async for mode, payload in graph.astream(
+        {"messages": [HumanMessage(content=message)]},
+        config=config,
+        stream_mode=["messages", "custom"],
+    ):
+        if mode == "custom":
+            yield payload
+            continue
+        message_chunk, metadata = payload
+        # solo el LLM del agente (no el resumen del nodo summarize)
+        if not isinstance(message_chunk, AIMessageChunk) or metadata.get("langgraph_node") != "agent":
+            continue
+        for tool_chunk in message_chunk.tool_call_chunks:
+            key = (message_chunk.id, tool_chunk.get("index"))
+            if tool_chunk.get("name") and key not in decided:
+                decided.add(key)
+                yield {"type": "tool_decision", "name": tool_chunk["name"]}
+        if message_chunk.content:
+            yield {"type": "token", "value": message_chunk.content}
+
+
 @app.post("/chat/stream")
 async def chat_stream(request: ChatRequest):
     """
@@ -52,31 +213,90 @@ async def chat_stream(request: ChatRequest):
     
     Envía tokens a medida que el LLM los genera.
     Permite interfaces tipo "chat en tiempo real" (para una mejor UX).
-    También envía el thread_id al inicio del stream.
+    También envía el thread_id al inicio del stream y, mientras el agente decide y ejecuta herramientas,
+    eventos de progreso (tool_decision, tool_start, tool_end; ver stream_events). Si pasan
+    STREAM_HEARTBEAT_SECONDS sin nada que enviar se manda un comentario SSE (": ping") para que
+    los proxies no corten ni retengan la conexión.
     """
     
     thread_id = request.thread_id or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+
+    async def token_generator():
+        yield sse({"type": "thread_id", "value": thread_id})
 
-    def token_generator():
-        yield f"data: {json.dumps({'type': 'thread_id', 'value': thread_id})}\n\n"
+        with tracing.span("response_cache"):
+            cached, query = await lookup_cached_reply(request.message, config, request.thread_id is None)
+        if cached is not None:
+            # la respuesta cacheada se envía con el mismo protocolo, palabra a palabra
+            words = cached.split(" ")
+            for i, word in enumerate(words):
+                token = word if i == 0 else " " + word
+                yield sse({"type": "token", "value": token})
+            yield sse({"type": "done"})
+            return
 
-        for message_chunk, metadata in graph.stream(
-            {"messages": [HumanMessage(content=request.message)]},
-            config={"configurable": {"thread_id": thread_id}},
-            stream_mode="messages",
-        ):
-            # streaming los tokens de mensajes
-            if isinstance(message_chunk, AIMessageChunk):
-                token = message_chunk.content
-                if token:
-                    yield f"data: {json.dumps({'type': 'token', 'value': token})}\n\n"
+        # el grafo se ejecuta en otra tarea y deja los eventos en una cola: así se pueden enviar
+        # heartbeats mientras el LLM o las herramientas tardan
+        queue = asyncio.Queue()
 
-        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        async def produce():
+            try:
+                async for event in stream_events(request.message, config):
+                    await queue.put(event)
+                state = await graph.aget_state(config)
+                store_reply(request.message, state.values["messages"], query)
+            except Exception as e:
+                tracing.debug("Error en /chat/stream:", repr(e))
+                await queue.put({"type": "error", "value": "Error al generar la respuesta"})
+            await queue.put({"type": "done"})
 
-    return StreamingResponse(token_generator(), media_type="text/event-stream")
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield sse(event)
+                if event["type"] == "done":
+                    break
+        finally:
+            # cliente desconectado: se cancela el grafo
+            producer.cancel()
 
+    # sin caché ni buffering en proxies (nginx): cada evento se envía en cuanto se produce
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(token_generator(), media_type="text/event-stream", headers=headers)
 
-# healthcheck
+
+# healthcheck (liveness): el proceso está vivo y atiende peticiones, aunque los recursos aún se estén cargando
 @app.get("/health") 
 async def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok", "ready": registry.ready()}
+
+
+# readiness: 200 solo cuando el modelo de embeddings, chroma y el catálogo están cargados
+@app.get("/health/ready")
+async def ready():
+    status_code = 200 if registry.ready() else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"status": "ready" if status_code == 200 else "loading", "resources": registry.status()},
+    )
+
+
+# histogramas de latencia por tramo (agent, tools, cada herramienta, embed, chroma_query, llm, TTFT, petición completa)
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(tracing.metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# traza de una petición reciente: tramos con inicio y duración relativos a la petición
+@app.get("/traces/{request_id}")
+async def get_trace(request_id: str):
+    record = tracing.get_trace(request_id)
+    if record is None:
+        return JSONResponse(status_code=404, content={"detail": "traza no encontrada"})
+    return record
@@ -0,0 +1,136 @@
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+import wave
+from difflib import SequenceMatcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from stubs import StubASRModel, ToneSpeech
+from ingestion import transcribe as asr
+
+"""
+Benchmark de la transcripción de audio (ingestion/transcribe.py) sin GPU ni descargas: el audio es "habla"
+sintética (benchmarks/stubs.py, una ráfaga de tonos por palabra con las palabras de transcription.txt) y el
+modelo es StubASRModel, que la decodifica y simula el coste de un modelo real (carga, coste fijo por
+llamada y coste por ventana). Compara:
+- antes: modelo cargado en cada llamada, cada trozo de 30 s exportado a /tmp y transcrito de uno en uno
+- después: modelo cargado una vez, PCM en memoria, ventanas por lotes; con y sin solape
+- reanudación: se interrumpe la transcripción a mitad y se vuelve a lanzar
+La precisión es la similitud (difflib) entre las palabras transcritas y las originales.
+
+Uso:
+    python benchmarks/bench_asr.py --files 3 --words 600 --batch 8
+"""
+
+TRANSCRIPTION = os.path.join(ROOT, "ingestion", "data", "transcription.txt")
+
+
+def write_wav(path, samples, sample_rate):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+
+
+def legacy_transcribe(audio_path, make_model, tmp_dir):
+    # reproduce transcribe_audio anterior: carga del modelo, trozos de 30 s exportados a wav, uno por llamada
+    from pydub import AudioSegment
+    model = make_model()
+    audio = AudioSegment.from_file(audio_path)
+    chunk_ms = 30_000
+    full_text = []
+    for i in range(math.ceil(len(audio) / chunk_ms)):
+        chunk_path = os.path.join(tmp_dir, f"chunk_{i}.wav")
+        audio[i * chunk_ms:(i + 1) * chunk_ms].export(chunk_path, format="wav")
+        window = asr.decode_audio(chunk_path).astype(np.float32) / 32768.0
+        full_text.append(model.transcribe_batch([window], asr.ASR_SAMPLE_RATE)[0])
+    return " ".join(full_text)
+
+
+def accuracy(text, words):
+    return SequenceMatcher(None, text.split(), words, autojunk=False).ratio()
+
+
+class Interrupted(Exception):
+    pass
+
+
+class FailingModel:
+    """Falla tras `batches` llamadas, como un proceso que se corta a mitad de una grabación."""
+
+    def __init__(self, model, batches):
+        self.model = model
+        self.batches = batches
+
+    def transcribe_batch(self, windows, sample_rate):
+        if self.batches == 0:
+            raise Interrupted()
+        self.batches -= 1
+        return self.model.transcribe_batch(windows, sample_rate)
+
+
+def main(files, n_words, batch, load_seconds, call_overhead, per_window):
+    with open(TRANSCRIPTION, "r", encoding="utf-8") as f:
+        corpus = f.read().split()
+    speech = ToneSpeech(corpus)
+    make_model = lambda: StubASRModel(speech, load_seconds, call_overhead, per_window)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        audios = []
+        for i in range(files):
+            words = corpus[i * n_words:(i + 1) * n_words]
+            path = os.path.join(tmp, f"audio_{i}.wav")
+            write_wav(path, speech.synthesize(words), speech.sample_rate)
+            audios.append((path, words))
+        seconds_audio = n_words * (speech.WORD_SECONDS + speech.GAP_SECONDS) * files
+
+        def run(name, fn):
+            start = time.perf_counter()
+            scores = [accuracy(fn(path), words) for path, words in audios]
+            rows.append((name, time.perf_counter() - start, sum(scores) / len(scores)))
+
+        run("antes", lambda path: legacy_transcribe(path, make_model, tmp))
+
+        model = make_model()
+        run("sin solape", lambda path: asr.transcribe(path, model, overlap_seconds=0, batch_size=batch, checkpoint=False))
+        run("después", lambda path: asr.transcribe(path, model, batch_size=batch, checkpoint=False))
+
+        # reanudación: se corta a mitad del primer audio y se relanza
+        path, words = audios[0]
+        total = len(list(asr.iter_windows(asr.decode_audio(path))))
+        try:
+            asr.transcribe(path, FailingModel(model, batches=max(1, total // batch // 2)), batch_size=batch)
+        except Interrupted:
+            pass
+        before = model.windows
+        text = asr.transcribe(path, model, batch_size=batch)
+        resumed = model.windows - before
+
+    print()
+    print(f"{files} audios de {n_words} palabras ({seconds_audio / 60:.1f} min en total); "
+          f"modelo simulado: carga {load_seconds}s, {call_overhead * 1000:.0f} ms/llamada + {per_window * 1000:.0f} ms/ventana")
+    print(f"{'ejecución':<11} | {'segundos':>9} | {'x tiempo real':>13} | {'precisión':>9}")
+    for name, seconds, score in rows:
+        print(f"{name:<11} | {seconds:>9.2f} | {seconds_audio / seconds:>13.0f} | {score:>9.3f}")
+    print(f"reanudación: la segunda ejecución solo procesa {resumed} de {total} ventanas, precisión {accuracy(text, words):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--words", type=int, default=600, help="palabras por audio (0.53 s cada una)")
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--load-seconds", type=float, default=2.0, help="carga simulada del modelo")
+    parser.add_argument("--call-overhead", type=float, default=0.15, help="coste fijo simulado por llamada")
+    parser.add_argument("--per-window", type=float, default=0.03, help="coste simulado por ventana del lote")
+    args = parser.parse_args()
+    main(args.files, args.words, args.batch, args.load_seconds, args.call_overhead, args.per_window)
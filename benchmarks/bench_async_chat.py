@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from stubs import StubChatModel, install_stubs
+
+"""
+Benchmark de carga de /chat con un LLM falso.
+Compara el comportamiento anterior (graph.invoke dentro del endpoint async, que bloquea el event loop)
+con el camino asíncrono actual (graph.ainvoke). Se lanzan N clientes concurrentes y se mide req/s.
+
+Uso (desde la raíz del repo):
+    python benchmarks/bench_async_chat.py --clients 1 8 32 --llm-latency 0.2 --tool-latency 0.05
+"""
+
+
+async def legacy_chat(graph, message: str):
+    # reproduce el endpoint antiguo: llamada síncrona dentro de una corrutina
+    from langchain_core.messages import HumanMessage
+    result = graph.invoke(
+        {"messages": [HumanMessage(content=message)]},
+        config={"configurable": {"thread_id": str(uuid.uuid4())}},
+    )
+    return result["messages"][-1].content
+
+
+async def measure(fn, n_clients: int):
+    start = time.perf_counter()
+    await asyncio.gather(*(fn(f"salidas de derecho {i}") for i in range(n_clients)))
+    elapsed = time.perf_counter() - start
+    return elapsed, n_clients / elapsed
+
+
+async def main(clients, llm_latency, tool_latency):
+    install_stubs(StubChatModel(latency=llm_latency), tool_latency=tool_latency)
+    # se mide el grafo, no la caché de respuestas
+    os.environ["RESPONSE_CACHE"] = "0"
+
+    # se importa después de instalar los sustitutos para que el grafo use el LLM falso
+    import api
+
+    async def async_chat(message: str):
+        response = await api.chat(api.ChatRequest(message=message))
+        return response.reply
+
+    print(f"{'clientes':>8} | {'antes (req/s)':>14} | {'después (req/s)':>16} | {'mejora':>7}")
+    for n in clients:
+        _, before = await measure(lambda m: legacy_chat(api.graph, m), n)
+        _, after = await measure(async_chat, n)
+        print(f"{n:>8} | {before:>14.2f} | {after:>16.2f} | {after / before:>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.llm_latency, args.tool_latency))
@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from glob import glob
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.catalogue import Catalogue, write_catalogue
+from tools.subject_index import SubjectIndex, render_degree
+
+"""
+Benchmark de memoria y arranque del catálogo de asignaturas: JSON (como antes) frente al catálogo compilado
+abierto con mmap. Se genera un catálogo con todos los planes de la UCM a lo largo de varios años replicando
+los JSON de ingestion/data (con sus textos de conocimientos y salidas) por año de plan y campus.
+Cada modo se mide en un proceso nuevo: tiempo de load_subject_index, RSS añadido y primera consulta.
+Antes de medir se comprueba que el catálogo compilado devuelve lo mismo que los JSON (grados, cursos,
+asignaturas y créditos en el mismo orden) y que la búsqueda por título devuelve esos grados con el texto de sus
+propios planes, incluidos planes distintos con el mismo título.
+
+Uso:
+    python benchmarks/bench_catalogue.py --sizes 1000 5000
+"""
+
+DATA_DIR = os.path.join(ROOT, "ingestion", "data")
+CAMPUS = ["Moncloa", "Somosaguas", "Aranjuez", "Vicalvaro", "Online", "Noche", "Bilingue", "Intensivo"]
+
+# se ejecuta en un proceso aparte para que la memoria de un modo no afecte al otro
+CHILD = r"""
+import json, os, time
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+from tools import get_subjects
+before = rss_mb()
+start = time.perf_counter()
+index = get_subjects.load_subject_index()
+load = time.perf_counter() - start
+after = rss_mb()
+start = time.perf_counter()
+index.render(index.search("derecho 1995 moncloa"))
+query = time.perf_counter() - start
+print(json.dumps({"load_s": load, "rss_mb": after - before, "query_ms": query * 1000, "degrees": len(index)}))
+"""
+
+
+def write_synthetic(folder, size):
+    base = []
+    for path in sorted(glob(f"{DATA_DIR}/*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            base.append(json.load(f))
+    count, year = 0, 1990
+    while count < size:
+        for campus in CAMPUS:
+            for degree in base:
+                data = dict(degree, degree_title=f"{degree['degree_title']} Plan {year} {campus}")
+                with open(os.path.join(folder, f"{count:06d}.json"), "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                count += 1
+                if count >= size:
+                    return
+        year += 1
+
+
+def check_catalogue(data_list, catalogue):
+    """Falla si el catálogo no tiene exactamente los grados de data_list, en el mismo orden y con los mismos planes."""
+    assert len(catalogue) == len(data_list), f"{len(catalogue)} grados en el catálogo, {len(data_list)} en los JSON"
+    for pos, degree in enumerate(data_list):
+        assert catalogue.title(pos) == degree["degree_title"], f"grado {pos}: {catalogue.title(pos)!r}"
+        years = catalogue.years(pos)
+        assert [label for label, _, _ in years] == list(degree["plan_estudios"]), f"cursos de {degree['degree_title']}"
+        for (label, start, end), items in zip(years, degree["plan_estudios"].values()):
+            found = [(catalogue.string(int(catalogue.sections["subject_name"][j])), catalogue.ects(j)[0])
+                     for j in range(start, end)]
+            expected = [(item["subject"], item.get("ects", "")) for item in items]
+            assert found == expected, f"asignaturas de {degree['degree_title']}, {label}"
+
+    # búsqueda: las posiciones devueltas son las de los grados con los títulos que reconoce el resolvedor,
+    # y el texto de cada una sale de su propio plan
+    index = SubjectIndex.from_catalogue(catalogue)
+    for title in dict.fromkeys(d["degree_title"] for d in data_list):
+        found = index.search(title)
+        titles = set(index.resolver.resolve_titles(title))
+        assert title in titles, f"{title!r} no se encuentra"
+        expected = [pos for pos, d in enumerate(data_list) if d["degree_title"] in titles]
+        assert sorted(found) == expected, f"búsqueda de {title!r}: {found} en lugar de {expected}"
+        rendered = [render_degree(data_list[pos]["degree_title"],
+                                  [item["subject"] for items in data_list[pos]["plan_estudios"].values() for item in items])
+                    for pos in found]
+        assert index.render(found) == "\n".join(rendered), f"texto de {title!r}"
+
+
+def with_repeated_titles(data_list):
+    """data_list con una copia de cada uno de los primeros grados con el mismo título y otro plan."""
+    repeated = [{"degree_title": d["degree_title"], "plan_estudios": dict(reversed(list(d["plan_estudios"].items())))}
+                for d in data_list[:10]]
+    return data_list + repeated
+
+
+def measure(folder, catalogue_path):
+    env = dict(os.environ, PATH_DICT_SUBJECTS=folder, CATALOGUE_PATH=catalogue_path)
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(sizes):
+    print(f"{'grados':>7} | {'modo':<6} | {'disco (MB)':>10} | {'carga (s)':>9} | {'RSS (MB)':>8} | {'1ª consulta (ms)':>16}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            write_synthetic(folder, size)
+            json_mb = sum(os.path.getsize(p) for p in glob(f"{folder}/*.json")) / 1e6
+            compiled = os.path.join(folder, "subjects_catalogue.bin")
+
+            # JSON: se apunta CATALOGUE_PATH a un fichero inexistente para forzar la carga de los JSON
+            result = measure(folder, os.path.join(folder, "missing.bin"))
+            print(f"{size:>7} | {'json':<6} | {json_mb:>10.1f} | {result['load_s']:>9.2f} | {result['rss_mb']:>8.1f} | {result['query_ms']:>16.2f}")
+
+            data_list = []
+            for path in sorted(glob(f"{folder}/*.json")):
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                data_list.append({"degree_title": data["degree_title"], "plan_estudios": data["plan_estudios"]})
+            write_catalogue(data_list, compiled)
+            catalogue = Catalogue.open(compiled)
+            check_catalogue(data_list, catalogue)
+            catalogue.close()
+            repeated = with_repeated_titles(data_list)
+            check_catalogue(repeated, Catalogue.from_data_list(repeated))
+            result = measure(folder, compiled)
+            print(f"{size:>7} | {'mmap':<6} | {os.path.getsize(compiled) / 1e6:>10.1f} | {result['load_s']:>9.2f} | {result['rss_mb']:>8.1f} | {result['query_ms']:>16.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000])
+    args = parser.parse_args()
+    main(args.sizes)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from glob import glob
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.memory import MemorySaver
+
+from graph.checkpointer import SqliteCheckpointSaver
+from tools.subject_index import SubjectIndex
+
+"""
+Benchmark de latencia de lectura/escritura de checkpoints en función del número de hilos guardados.
+Cada hilo tiene una conversación realista (pregunta, tool call, lista de asignaturas, respuesta).
+Compara MemorySaver con el checkpointer SQLite acotado.
+
+Uso:
+    python benchmarks/bench_checkpointer.py --threads 100 1000 10000 --samples 500
+"""
+
+DATA_DIR = os.path.join(ROOT, "ingestion", "data")
+
+
+def conversation():
+    data = []
+    for path in sorted(glob(f"{DATA_DIR}/*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            data.append(json.load(f))
+    index = SubjectIndex(data)
+    subjects = index.render(index.search("derecho"))
+    return [
+        HumanMessage(content="¿Qué asignaturas tiene derecho?"),
+        AIMessage(content="", tool_calls=[{"name": "retrieve_subjects", "args": {"query": "derecho"}, "id": "call_1"}]),
+        ToolMessage(content=subjects, tool_call_id="call_1"),
+        AIMessage(content="Estas son las asignaturas del grado en Derecho: ..."),
+    ]
+
+
+def put(saver, thread_id, messages):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = str(uuid6())
+    checkpoint["channel_values"] = {"messages": messages}
+    checkpoint["channel_versions"] = {"messages": 1}
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    saver.put(config, checkpoint, {"source": "loop", "step": 1}, {"messages": 1})
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def run(name, saver, n_threads, samples, messages):
+    for i in range(n_threads):
+        put(saver, f"t{i}", messages)
+
+    write_us, read_us = [], []
+    for _ in range(samples):
+        thread_id = f"t{random.randrange(n_threads)}"
+        start = time.perf_counter()
+        put(saver, thread_id, messages)
+        write_us.append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        saver.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+        read_us.append((time.perf_counter() - start) * 1e6)
+
+    w50, w95 = percentiles(write_us)
+    r50, r95 = percentiles(read_us)
+    size = os.path.getsize(saver.path) / 1e6 if isinstance(saver, SqliteCheckpointSaver) else float("nan")
+    print(f"{name:<8} | {n_threads:>7} | {w50:>9.0f} | {w95:>9.0f} | {r50:>9.0f} | {r95:>9.0f} | {size:>8.1f}")
+
+
+def main(threads, samples):
+    messages = conversation()
+    print(f"{'backend':<8} | {'hilos':>7} | {'put p50':>9} | {'put p95':>9} | {'get p50':>9} | {'get p95':>9} | {'MB disco':>8}")
+    print(f"{'':<8} | {'':>7} | {'(µs)':>9} | {'(µs)':>9} | {'(µs)':>9} | {'(µs)':>9} |")
+    for n in threads:
+        run("memory", MemorySaver(), n, samples, messages)
+        with tempfile.TemporaryDirectory() as tmp:
+            saver = SqliteCheckpointSaver(path=os.path.join(tmp, "checkpoints.sqlite"), max_threads=max(threads))
+            run("sqlite", saver, n, samples, messages)
+            saver.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--samples", type=int, default=500)
+    args = parser.parse_args()
+    main(args.threads, args.samples)
@@ -0,0 +1,143 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["EMBED_CACHE_PATH"] = ""  # el embedder falso no necesita caché
+os.environ.setdefault("PATH_DICT_SUBJECTS", os.path.join(ROOT, "ingestion", "data"))
+
+import chromadb
+
+from bench_hybrid_retrieval import TEMPLATES
+from stubs import DATA_DIR, FakeEmbedder
+from graph.context import count_text_tokens
+from ingestion import ingest_data
+from tools import chunking, retrieval_tool
+from tools.lexical_index import build_index
+from tools.resources import registry
+
+"""
+Benchmark del troceado de documentos (tools/chunking.py) sobre los JSON de ingestion/data y la transcripción
+de ejemplo: sin trocear (como antes) frente a fragmentos por frases o por ventanas de tokens.
+Para cada configuración se mide:
+- fragmentos, tamaño de la colección chroma en disco y tiempo de ingesta (embeddings + inserción)
+- tokens que superarían el límite del modelo de embeddings (--embed-limit) y se perderían al truncar
+- para preguntas sobre los grados y frases de la transcripción: hit@k y tokens devueltos por consulta
+Con el embedder falso de stubs.py el tiempo de ingesta no es el del modelo real; los tokens embebidos sí
+son el coste que pagaría el modelo.
+
+Uso:
+    python benchmarks/bench_chunking.py --k 5 --embed-limit 512
+"""
+
+TRANSCRIPTION = os.path.join(DATA_DIR, "transcription.txt")
+AUDIO_PATH = "transcription.m4a"
+
+CONFIGS = [
+    ("sin trocear", "none", 200, 40, 0),
+    ("frases 200/40", "sentence", 200, 40, 0),
+    ("frases 200/40 +1 vecino", "sentence", 200, 40, 1),
+    ("tokens 200/40", "tokens", 200, 40, 0),
+    ("frases 120/20", "sentence", 120, 20, 0),
+]
+
+
+def build_corpus():
+    texts, metadatas, ids = [], [], []
+    ingest_data.JSON_DIR = DATA_DIR
+    with open(TRANSCRIPTION, "r", encoding="utf-8") as f:
+        transcript = f.read().strip()
+    ingest_data.transcribe_audio = lambda path: transcript
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest_data.load_json_grados(texts, metadatas, ids)
+        ingest_data.load_audio(texts, metadatas, ids, AUDIO_PATH)
+    return texts, metadatas, ids, transcript
+
+
+def build_questions(transcript, n_transcript):
+    """(pregunta, grado, id del documento relevante, offset en la transcripción o None)."""
+    questions = []
+    for file in sorted(os.listdir(DATA_DIR)):
+        if not file.endswith(".json"):
+            continue
+        degree = file[:-5].replace("Grado y Doble Grado ", "")
+        for template, section in TEMPLATES:
+            questions.append((template.format(degree=degree), degree, ingest_data.make_id(file, section), None))
+
+    # frases de la transcripción: el fragmento devuelto tiene que contenerla
+    sentences = [m for m in re.finditer(r"[^.?!]{40,}[.?!]", transcript)]
+    parent = ingest_data.make_id(AUDIO_PATH, "audio_transcript")
+    for m in random.Random(0).sample(sentences, min(n_transcript, len(sentences))):
+        questions.append((m.group().strip(), None, parent, m.start() + len(m.group()) // 2))
+    return questions
+
+
+def is_hit(doc, relevant, offset):
+    metadata = doc["metadata"]
+    if metadata.get("parent_id", doc["id"]) != relevant:
+        return False
+    return offset is None or metadata["start"] <= offset < metadata["end"]
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def main(k, dim, embed_limit, n_transcript):
+    embedder = FakeEmbedder(dim)
+    registry.override("embedder", embedder)
+    retrieval_tool.HYBRID_SEARCH = True
+
+    print(f"{'configuración':<24} | {'fragm.':>6} | {'disco (MB)':>10} | {'ingesta (s)':>11} | {'tok. embebidos':>14} "
+          f"| {'tok. truncados':>14} | {'hit@' + str(k) + ' grados':>12} | {'hit@' + str(k) + ' audio':>11} | {'tok./consulta':>13}")
+    for name, strategy, max_tokens, overlap, neighbours in CONFIGS:
+        chunking.CHUNK_STRATEGY, chunking.CHUNK_MAX_TOKENS, chunking.CHUNK_OVERLAP_TOKENS = strategy, max_tokens, overlap
+        texts, metadatas, ids, transcript = build_corpus()
+        questions = build_questions(transcript, n_transcript)
+        tokens = [count_text_tokens(t) for t in texts]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            collection = chromadb.PersistentClient(path=tmp).create_collection("bench", metadata={"hnsw:space": "cosine"})
+            for i in range(0, len(texts), ingest_data.UPSERT_BATCH_SIZE):
+                batch = slice(i, i + ingest_data.UPSERT_BATCH_SIZE)
+                collection.add(ids=ids[batch], documents=texts[batch], metadatas=metadatas[batch],
+                               embeddings=embedder.encode(texts[batch]).tolist())
+            index = build_index(texts, metadatas, ids)
+            ingest_seconds = time.perf_counter() - start
+            size = dir_size(tmp) / 1e6
+
+            registry.override("collection", collection)
+            registry.override("lexical_index", index)
+            registry.reset("degree_resolver")
+
+            hits = {"grados": [], "audio": []}
+            returned = []
+            for question, degree, relevant, offset in questions:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    docs = retrieval_tool.retrieve_docs(question, k=k, degree=degree, neighbours=neighbours)
+                hits["audio" if offset is not None else "grados"].append(any(is_hit(d, relevant, offset) for d in docs))
+                returned.append(sum(count_text_tokens(d["content"]) for d in docs))
+
+        hit_degrees = sum(hits["grados"]) / len(hits["grados"])
+        hit_audio = sum(hits["audio"]) / len(hits["audio"])
+        print(f"{name:<24} | {len(texts):>6} | {size:>10.1f} | {ingest_seconds:>11.2f} | {sum(tokens):>14} "
+              f"| {sum(max(0, t - embed_limit) for t in tokens):>14} | {hit_degrees:>12.2f} | {hit_audio:>11.2f} "
+              f"| {sum(returned) / len(returned):>13.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--embed-limit", type=int, default=512, help="tokens máximos que acepta el modelo de embeddings")
+    parser.add_argument("--transcript-questions", type=int, default=30)
+    args = parser.parse_args()
+    main(args.k, args.dim, args.embed_limit, args.transcript_questions)
@@ -0,0 +1,71 @@
+import argparse
+import contextlib
+import io
+import os
+import uuid
+
+from stubs import StubChatModel, install_stubs
+
+"""
+Benchmark del tamaño del prompt en conversaciones largas.
+Simula un hilo de N turnos en el que cada pregunta provoca una llamada a retrieve_subjects (listas completas
+de asignaturas del catálogo de ingestion/data) y mide los tokens de prompt de cada llamada al LLM:
+- sin ventana (comportamiento anterior: todo el historial)
+- con ventana por presupuesto de tokens y resultados antiguos recortados
+- con ventana + nodo de resumen
+
+Uso:
+    python benchmarks/bench_context.py --turns 30 --budget 6000
+"""
+
+DEGREES = ["derecho", "economia", "biologia", "criminologia", "bellas artes", "comercio", "bioquimica", "arqueologia"]
+
+
+def run(mode, turns, budget):
+    import graph.context as context
+    import graph.nodes as nodes
+    import graph.workflow as workflow
+    from langchain_core.messages import HumanMessage
+
+    # sin ventana = comportamiento anterior: se envía todo el historial tal cual
+    nodes.build_context = (lambda messages: list(messages)) if mode == "sin ventana" else context.build_context
+    context.CONTEXT_MAX_TOKENS = budget
+    workflow.CONTEXT_SUMMARY = mode == "ventana + resumen"
+    graph = workflow.build_graph()
+
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    per_turn = []
+    for i in range(turns):
+        # tokens de la llamada más grande del turno
+        context.prompt_tokens.max = 0
+        graph.invoke({"messages": [HumanMessage(content=DEGREES[i % len(DEGREES)])]}, config=config)
+        per_turn.append(context.prompt_tokens.max)
+    state = graph.get_state(config)
+    return per_turn, len(state.values["messages"])
+
+
+def main(turns, budget):
+    install_stubs(StubChatModel(latency=0.0, tool_name="retrieve_subjects"), tool_latency=0.0)
+    os.environ["RESPONSE_CACHE"] = "0"
+
+    results = {}
+    for mode in ["sin ventana", "ventana", "ventana + resumen"]:
+        # los print de depuración de los nodos no interesan aquí
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[mode] = run(mode, turns, budget)
+
+    modes = list(results)
+    print(f"{'turno':>5} | " + " | ".join(f"{m:>18}" for m in modes))
+    for t in range(turns):
+        if t % 5 == 4 or t == turns - 1:
+            print(f"{t + 1:>5} | " + " | ".join(f"{results[m][0][t]:>18}" for m in modes))
+    print(f"{'máx':>5} | " + " | ".join(f"{max(results[m][0]):>18}" for m in modes))
+    print(f"{'msgs':>5} | " + " | ".join(f"{results[m][1]:>18}" for m in modes) + "   (mensajes guardados en el hilo)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=6000)
+    args = parser.parse_args()
+    main(args.turns, args.budget)
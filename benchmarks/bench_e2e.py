@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+from stubs import ROOT, FakeEmbedder, ScriptedChatModel, install_local_retrieval, install_stubs
+
+"""
+Suite extremo a extremo offline: api.py -> build_graph -> herramientas reales, sin OpenAI ni Qwen3-Embedding-4B.
+- LLM: ScriptedChatModel (stubs.py). Para cada pregunta pide la herramienta del guion con sus argumentos y,
+  con el resultado, responde token a token (--llm-latency hasta el primer token, --token-delay entre tokens)
+- embeddings: FakeEmbedder (bolsa de palabras con hashing, --dim)
+- chroma: colección temporal con los fragmentos de ingestion/data (como ingest_data) e índice BM25
+- retrieve_subjects: catálogo de los JSON de ingestion/data
+La API se sirve con uvicorn en un puerto local y los clientes usan httpx leyendo el cuerpo en streaming.
+Para cada número de clientes concurrentes se mide /chat y /chat/stream: req/s, latencia p50/p95/p99 y,
+en /chat/stream, el tiempo hasta el primer token (TTFT).
+El resultado se guarda en JSON (--output) con la configuración y el commit, para comparar ejecuciones
+(--compare otra.json muestra la diferencia con una ejecución anterior).
+
+Uso:
+    python benchmarks/bench_e2e.py --clients 1 8 32 --requests 64 --output e2e.json
+    python benchmarks/bench_e2e.py --clients 1 8 32 --requests 64 --compare e2e.json
+"""
+
+QUESTION_TEMPLATES = [
+    ("¿Qué salidas profesionales tiene {degree}?", "retrieve_docs", "salidas_profesionales"),
+    ("¿Qué conocimientos se adquieren en {degree}?", "retrieve_docs", "conocimientos"),
+    ("¿Qué asignaturas tiene {degree}?", "retrieve_subjects", None),
+]
+
+
+def build_script(metadatas):
+    """Preguntas de cada grado del corpus y la tool call que el LLM falso hace para cada una."""
+    script = {}
+    for degree in sorted({m["degree"] for m in metadatas}):
+        for template, tool, section in QUESTION_TEMPLATES:
+            question = template.format(degree=degree)
+            if tool == "retrieve_docs":
+                args = {"query": question, "degree": degree, "section": section}
+            else:
+                args = {"query": degree}
+            script[question] = [{"name": tool, "args": args}]
+    return script
+
+
+def serve(app):
+    """Arranca uvicorn en un hilo con un puerto libre; devuelve (servidor, url base)."""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def call_chat(client, message):
+    start = time.perf_counter()
+    response = await client.post("/chat", json={"message": message})
+    return time.perf_counter() - start, None, response.status_code == 200
+
+
+async def call_stream(client, message):
+    start = time.perf_counter()
+    ttft = None
+    ok = False
+    async with client.stream("POST", "/chat/stream", json={"message": message}) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "token" and event["value"] and ttft is None:
+                ttft = time.perf_counter() - start
+            elif event["type"] == "done":
+                ok = response.status_code == 200
+    return time.perf_counter() - start, ttft, ok
+
+
+async def load(client, call, questions, clients, requests):
+    """`requests` peticiones repartidas entre `clients` clientes que envían una tras otra."""
+    pending = iter(range(requests))
+    results = []
+
+    async def worker():
+        for i in pending:
+            results.append(await call(client, questions[i % len(questions)]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return results, time.perf_counter() - start
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def rank(p):
+        return 1000 * values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+    return {"p50": round(rank(50), 2), "p95": round(rank(95), 2), "p99": round(rank(99), 2),
+            "mean": round(1000 * statistics.mean(values), 2)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(base_url, questions, clients_list, requests):
+    import httpx
+    rows = []
+    limits = httpx.Limits(max_connections=max(clients_list), max_keepalive_connections=max(clients_list))
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        await load(client, call_stream, questions, 1, 4)  # calentamiento
+        for clients in clients_list:
+            for endpoint, call in [("/chat", call_chat), ("/chat/stream", call_stream)]:
+                results, elapsed = await load(client, call, questions, clients, requests)
+                rows.append({
+                    "endpoint": endpoint,
+                    "clients": clients,
+                    "requests": len(results),
+                    "errors": sum(1 for _, _, ok in results if not ok),
+                    "rps": round(len(results) / elapsed, 2),
+                    "latency_ms": percentiles([latency for latency, _, _ in results]),
+                    "ttft_ms": percentiles([ttft for _, ttft, _ in results if ttft is not None]),
+                })
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'endpoint':<13} | {'clientes':>8} | {'req/s':>7} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'p99 (ms)':>8} "
+          f"| {'TTFT p50':>8} | {'TTFT p95':>8} | {'TTFT p99':>8} | {'errores':>7}")
+    for row in rows:
+        lat, ttft = row["latency_ms"], row["ttft_ms"] or {}
+        print(f"{row['endpoint']:<13} | {row['clients']:>8} | {row['rps']:>7.1f} | {lat['p50']:>8.1f} | {lat['p95']:>8.1f} "
+              f"| {lat['p99']:>8.1f} | {ttft.get('p50', float('nan')):>8.1f} | {ttft.get('p95', float('nan')):>8.1f} "
+              f"| {ttft.get('p99', float('nan')):>8.1f} | {row['errors']:>7}")
+
+
+def print_comparison(previous, rows):
+    old = {(r["endpoint"], r["clients"]): r for r in previous["results"]}
+    print(f"\ncomparación con {previous.get('commit')} ({previous.get('timestamp')}):")
+    print(f"{'endpoint':<13} | {'clientes':>8} | {'req/s':>16} | {'p95 (ms)':>18} | {'TTFT p95 (ms)':>18}")
+    for row in rows:
+        before = old.get((row["endpoint"], row["clients"]))
+        if before is None:
+            continue
+
+        def delta(a, b):
+            return f"{a:>7.1f} -> {b:>7.1f}" if a is not None and b is not None else f"{'-':>18}"
+
+        ttft_old = (before["ttft_ms"] or {}).get("p95")
+        ttft_new = (row["ttft_ms"] or {}).get("p95")
+        print(f"{row['endpoint']:<13} | {row['clients']:>8} | {before['rps']:>6.1f} -> {row['rps']:>6.1f} "
+              f"| {delta(before['latency_ms']['p95'], row['latency_ms']['p95'])} | {delta(ttft_old, ttft_new)}")
+
+
+def main(args):
+    # se mide el grafo y las herramientas, no la caché de respuestas ni los print de depuración
+    os.environ["RESPONSE_CACHE"] = "1" if args.response_cache else "0"
+    os.environ.setdefault("DEBUG_LOGS", "0")
+    os.environ.setdefault("CHECKPOINT_PATH", os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _, metadatas, _ = install_local_retrieval(tmp, FakeEmbedder(args.dim))
+        script = build_script(metadatas)
+        llm = ScriptedChatModel(latency=args.llm_latency, token_delay=args.token_delay, script=script)
+        install_stubs(llm, retrieval=False)
+
+        import api
+        from graph.tools_node import tool_stats
+        from tools.resources import registry
+        registry.warm_up()
+
+        server, base_url = serve(api.app)
+        try:
+            rows = asyncio.run(run(base_url, list(script), args.clients, args.requests))
+        finally:
+            server.should_exit = True
+
+    result = {
+        "benchmark": "e2e",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "llm_latency": args.llm_latency, "token_delay": args.token_delay, "dim": args.dim,
+            "requests": args.requests, "questions": len(script), "response_cache": args.response_cache,
+        },
+        "results": rows,
+        "tools": tool_stats.snapshot(),
+    }
+
+    print()
+    print(f"{len(script)} preguntas, LLM {args.llm_latency * 1000:.0f} ms + {args.token_delay * 1000:.0f} ms/token, "
+          f"{args.requests} peticiones por endpoint y nivel de concurrencia")
+    print_rows(rows)
+    for name, stats in result["tools"].items():
+        print(f"  {name:<18} ejecuciones={stats['calls']:<5} errores={stats['errors']:<3} media={stats['mean_ms']:.1f} ms")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), rows)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nresultados en {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="peticiones por endpoint y nivel de concurrencia")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--response-cache", action="store_true", help="medir con la caché de respuestas activa")
+    parser.add_argument("--output", help="fichero JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior")
+    main(parser.parse_args())
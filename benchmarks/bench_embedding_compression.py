@@ -0,0 +1,192 @@
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from stubs import DATA_DIR, tiny_sentence_transformer
+
+"""
+Informe offline para elegir el punto de trabajo de la búsqueda densa en servidores solo con CPU
+(embeddings/model.py y embeddings/quantization.py).
+
+1. Compresión de los vectores: recall@k frente a latencia de búsqueda y memoria, para cada dimensión (truncado
+   Matryoshka) y cada modo: float32 exacto, int8 y binario, con y sin re-puntuar los candidatos en float32.
+   Sin descargar modelos no hay embeddings reales del corpus, así que se usa una colección sintética de --docs
+   vectores agrupados en temas cuya varianza decrece con la dimensión (como en un modelo entrenado con Matryoshka,
+   las primeras dimensiones llevan la mayor parte de la información). Cada consulta es un documento con ruido.
+   - recall@k: fracción del top-k exacto (float32, todas las dimensiones) que devuelve el modo
+   - acierto@k: consultas cuyo documento de origen está en el top-k
+   - memoria: lo que el índice mantiene en RAM (los float32 de la re-puntuación se leen con mmap)
+2. Modelo: latencia por consulta (lote de 1) y memoria de pesos en CPU de modelos BERT con el tamaño de los
+   candidatos, con pesos aleatorios (stubs.tiny_sentence_transformer): mide el coste, no la calidad.
+
+Uso:
+    python benchmarks/bench_embedding_compression.py --docs 50000 --dim 1024 --dims 1024 512 256 128
+    python benchmarks/bench_embedding_compression.py --models minilm-l6 minilm-l12 base --skip-vectors
+"""
+
+# nombre -> (capas, dimensión oculta, cabezas de atención); tamaños de modelos que se pueden usar en CPU
+MODELS = {
+    "minilm-l6": (6, 384, 12),     # all-MiniLM-L6-v2
+    "minilm-l12": (12, 384, 12),   # paraphrase-multilingual-MiniLM-L12-v2
+    "base": (12, 768, 12),         # multilingual-e5-base
+    "large": (24, 1024, 16),       # multilingual-e5-large
+}
+
+
+def synthetic_collection(n, dim, queries, clusters, decay, doc_noise, query_noise, seed=0):
+    """(documentos, consultas, documento de origen de cada consulta), normalizados."""
+    rng = np.random.default_rng(seed)
+    scale = ((1 + np.arange(dim)) ** -decay).astype(np.float32)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32) * scale
+    docs = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 10_000):
+        rows = min(10_000, n - start)
+        topic = rng.integers(clusters, size=rows)
+        docs[start:start + rows] = centers[topic] + doc_noise * rng.standard_normal((rows, dim), dtype=np.float32) * scale
+    targets = rng.choice(n, size=queries, replace=False)
+    # ruido de la consulta igual en todas las dimensiones: las últimas, con menos varianza, aportan poca información
+    query_vectors = docs[targets] + query_noise * rng.standard_normal((queries, dim), dtype=np.float32) * scale.mean()
+    return normalize(docs), normalize(query_vectors), targets
+
+
+def normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def exact_top(docs, query, k):
+    scores = docs @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def ms(values, q=0.5):
+    values = sorted(values)
+    return 1000 * values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+
+def vector_report(args):
+    from embeddings.model import truncate
+    from embeddings.quantization import QuantizedIndex
+
+    docs, queries, targets = synthetic_collection(args.docs, args.dim, args.queries, args.clusters, args.decay,
+                                                  args.doc_noise, args.query_noise)
+    k = args.k
+    truth = [set(exact_top(docs, q, k).tolist()) for q in queries]
+    ids = [str(i) for i in range(len(docs))]
+    metadatas = [{}] * len(docs)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for dim in args.dims:
+            stored = truncate(docs, dim)
+            query_vectors = truncate(queries, dim)
+            modes = [("float32", None, 0)] + [(kind, kind, r) for kind in ("int8", "binary") for r in args.rescore]
+            for name, kind, rescore in modes:
+                if kind is None:
+                    search = lambda q: exact_top(stored, q, k).tolist()
+                    memory = stored.nbytes
+                else:
+                    path = os.path.join(tmp, f"{kind}_{dim}")
+                    if not os.path.exists(path):
+                        QuantizedIndex.build(kind, stored, ids, metadatas).save(path)
+                    index = QuantizedIndex.load(path)
+                    search = lambda q, index=index, rescore=rescore: [int(i) for i, _ in index.search(q, k, rescore=rescore)]
+                    memory = index.nbytes()
+
+                search(query_vectors[0])  # calentamiento (páginas del mmap)
+                latencies, recalls, hits = [], [], []
+                for query, expected, target in zip(query_vectors, truth, targets):
+                    start = time.perf_counter()
+                    found = search(query)
+                    latencies.append(time.perf_counter() - start)
+                    recalls.append(len(expected.intersection(found)) / k)
+                    hits.append(target in found)
+                label = name if kind is None else f"{name} x{rescore}" if rescore else f"{name} sin re-puntuar"
+                rows.append((dim, label, statistics.mean(recalls), statistics.mean(hits), ms(latencies),
+                             ms(latencies, 0.95), memory / 2**20))
+                print(f"  dim {dim:<5} {label:<20} recall@{k}={rows[-1][2]:.3f}", flush=True)
+
+    print(f"\ncolección sintética: {args.docs} vectores de {args.dim} dimensiones, {args.queries} consultas, k={k}")
+    print(f"{'dim':>5} | {'modo':<20} | {f'recall@{k}':>9} | {f'acierto@{k}':>10} | {'p50 (ms)':>8} | {'p95 (ms)':>8} "
+          f"| {'RAM (MB)':>8} | {'vs float32':>10}")
+    full = args.docs * args.dim * 4 / 2**20
+    for dim, label, recall, hit, p50, p95, memory in rows:
+        print(f"{dim:>5} | {label:<20} | {recall:>9.3f} | {hit:>10.3f} | {p50:>8.2f} | {p95:>8.2f} | {memory:>8.1f} "
+              f"| {full / memory:>9.0f}x")
+    print("(x4 = se re-puntúan 4*k candidatos con los float32 del disco; RAM solo del índice en memoria)")
+
+
+def corpus_texts():
+    from ingestion import ingest_data
+    texts, metadatas, ids = [], [], []
+    ingest_data.JSON_DIR = DATA_DIR
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest_data.load_json_grados(texts, metadatas, ids)
+    return texts
+
+
+def model_report(args):
+    import torch
+    texts = corpus_texts()
+    queries = [t[:120] for t in texts]
+    rows = []
+    for name in args.models:
+        layers, hidden, heads = MODELS[name]
+        with tempfile.TemporaryDirectory() as tmp:
+            model = tiny_sentence_transformer(tmp, texts, hidden=hidden, layers=layers, heads=heads)
+        params = sum(p.numel() for p in model.parameters())
+        with torch.inference_mode():
+            model.encode(queries[:8])
+            latencies = []
+            for i in range(args.model_queries):
+                start = time.perf_counter()
+                model.encode([queries[i % len(queries)]])
+                latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            model.encode(texts, batch_size=32)
+            throughput = len(texts) / (time.perf_counter() - start)
+        rows.append((name, layers, hidden, params / 1e6, params * 4 / 2**20, ms(latencies), ms(latencies, 0.95), throughput))
+        print(f"  {name:<11} consulta p50={rows[-1][5]:.1f} ms", flush=True)
+        del model
+
+    print(f"\nmodelos en CPU ({os.cpu_count()} núcleos, {torch.get_num_threads()} hilos de torch), pesos aleatorios")
+    print(f"{'modelo':<11} | {'capas':>5} | {'dim':>5} | {'parámetros (M)':>14} | {'pesos (MB)':>10} | {'consulta p50':>12} "
+          f"| {'p95':>6} | {'ingesta (textos/s)':>18}")
+    for name, layers, hidden, params, memory, p50, p95, throughput in rows:
+        print(f"{name:<11} | {layers:>5} | {hidden:>5} | {params:>14.1f} | {memory:>10.0f} | {p50:>9.1f} ms | {p95:>6.1f} "
+              f"| {throughput:>18.1f}")
+    print("(vocabulario de 3000 piezas: en los modelos multilingües la matriz de vocabulario añade memoria, no latencia;"
+          " Qwen3-Embedding-4B: 4000 M parámetros, ~15 GB en float32, no se mide en CPU)")
+
+
+def main(args):
+    os.environ.setdefault("DEBUG_LOGS", "0")
+    if not args.skip_vectors:
+        vector_report(args)
+    if args.models:
+        print()
+        model_report(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1024, help="dimensión completa de los vectores sintéticos")
+    parser.add_argument("--dims", type=int, nargs="+", default=[1024, 512, 256, 128], help="dimensiones truncadas")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 4, 10], help="factores de re-puntuación")
+    parser.add_argument("--clusters", type=int, default=500, help="temas de la colección sintética")
+    parser.add_argument("--decay", type=float, default=0.5, help="caída de la varianza con la dimensión")
+    parser.add_argument("--doc-noise", type=float, default=0.6)
+    parser.add_argument("--query-noise", type=float, default=3.0)
+    parser.add_argument("--skip-vectors", action="store_true", help="solo el informe de modelos")
+    parser.add_argument("--models", nargs="*", default=["minilm-l6", "minilm-l12", "base"], choices=list(MODELS))
+    parser.add_argument("--model-queries", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import sys
+import time
+from glob import glob
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ingestion.ingest_data import iter_embeddings, load_embedding_model
+
+"""
+Benchmark de throughput (textos/s) del cálculo de embeddings de la ingesta.
+Compara el comportamiento original (un model.encode por texto) con los lotes ordenados por longitud
+y, opcionalmente, con el pool multiproceso. Usa un modelo pequeño para poder ejecutarse sin GPU.
+
+Uso:
+    python benchmarks/bench_embeddings.py --model sentence-transformers/all-MiniLM-L6-v2 --batch-sizes 8 32 64 --workers 0 4
+"""
+
+DATA_DIR = os.path.join(ROOT, "ingestion", "data")
+
+
+def load_texts(repeat):
+    texts = []
+    for path in sorted(glob(f"{DATA_DIR}/*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        degree = data.get("degree_title", "")
+        texts.append(f"Conocimientos para el grado de {degree}: {data.get('conocimientos', '')}")
+        texts.append(f"Salidas profesionales para el grado de {degree}: {data.get('salidas_profesionales', '')}")
+
+    # frases de la transcripción como textos cortos, para tener longitudes variadas
+    with open(os.path.join(DATA_DIR, "transcription.txt"), "r", encoding="utf-8") as f:
+        texts.extend(s.strip() for s in f.read().split(".") if s.strip())
+
+    return texts * repeat
+
+
+def run(label, fn, n):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} | {n / elapsed:>10.1f} textos/s | {elapsed:>7.2f} s")
+
+
+def main(model_name, device, batch_sizes, workers, repeat):
+    texts = load_texts(repeat)
+    model = load_embedding_model(model_name, device)
+    print(f"{len(texts)} textos, dispositivo {model.device}\n")
+
+    run("original (batch_size=1)", lambda: [model.encode([t]) for t in texts], len(texts))
+
+    for w in workers:
+        for bs in batch_sizes:
+            run(f"lotes={bs} workers={w}", lambda: list(iter_embeddings(texts, model, batch_size=bs, workers=w)), len(texts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--device", default="auto")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0])
+    parser.add_argument("--repeat", type=int, default=4)
+    args = parser.parse_args()
+    main(args.model, args.device, args.batch_sizes, args.workers, args.repeat)
@@ -0,0 +1,133 @@
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["EMBED_CACHE_PATH"] = ""  # el embedder falso no necesita caché
+os.environ.setdefault("PATH_DICT_SUBJECTS", os.path.join(ROOT, "ingestion", "data"))
+
+import chromadb
+
+from stubs import DATA_DIR, FakeEmbedder
+from ingestion import ingest_data
+from tools import get_subjects, retrieval_tool
+from tools.lexical_index import build_index
+from tools.resources import registry
+
+"""
+Benchmark offline de relevancia y latencia de retrieve_docs: densa, BM25, híbrida (RRF) e híbrida con filtro
+de grado en `where`. El corpus son los fragmentos conocimientos/salidas de los JSON de ingestion/data
+(los mismos que genera ingest_data) en una colección chroma temporal. Las preguntas siguen el formato
+de qa.json (pregunta + grado) y el fragmento relevante es el del grado y la sección por la que se pregunta.
+
+El embedder es el falso de stubs.py (bolsa de palabras con hashing) porque aquí no se puede cargar
+Qwen3-Embedding-4B; los números de la búsqueda densa sola no representan al modelo real, pero sí el
+efecto de la fusión y del filtro de metadatos sobre la misma colección.
+
+Uso:
+    python benchmarks/bench_hybrid_retrieval.py --k 5 --dim 256
+"""
+
+TEMPLATES = [
+    ("¿Qué salidas profesionales tiene el grado en {degree}?", "salidas_profesionales"),
+    ("¿De qué puedo trabajar si estudio {degree}?", "salidas_profesionales"),
+    ("¿Qué conocimientos se adquieren en {degree}?", "conocimientos"),
+    ("¿Qué aprenderé estudiando {degree}?", "conocimientos"),
+]
+
+
+def build_corpus():
+    texts, metadatas, ids = [], [], []
+    ingest_data.JSON_DIR = DATA_DIR
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest_data.load_json_grados(texts, metadatas, ids)
+    return texts, metadatas, ids
+
+
+def build_questions(metadatas, ids):
+    # el documento relevante es el de la sección completa (cualquiera de sus fragmentos vale)
+    questions = []
+    seen = set()
+    for metadata in metadatas:
+        parent = metadata["parent_id"]
+        if parent in seen:
+            continue
+        seen.add(parent)
+        for template, section in TEMPLATES:
+            if metadata["section"] == section:
+                questions.append((template.format(degree=metadata["degree"]), metadata["degree"], parent))
+    return questions
+
+
+def parent_ids(docs):
+    return [d["metadata"].get("parent_id", d["id"]) for d in docs]
+
+
+def evaluate(questions, k, hybrid, use_degree):
+    retrieval_tool.HYBRID_SEARCH = hybrid
+    ranks, latencies = [], []
+    for question, degree, relevant in questions:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            docs = retrieval_tool.retrieve_docs(question, k=k, degree=degree if use_degree else None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = parent_ids(docs)
+        ranks.append(found.index(relevant) + 1 if relevant in found else None)
+    return ranks, latencies
+
+
+def evaluate_bm25(questions, k, index):
+    ranks, latencies = [], []
+    for question, _, relevant in questions:
+        start = time.perf_counter()
+        docs = index.search(question, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = parent_ids(docs)
+        ranks.append(found.index(relevant) + 1 if relevant in found else None)
+    return ranks, latencies
+
+
+def report(name, ranks, latencies, k):
+    hit1 = sum(1 for r in ranks if r == 1) / len(ranks)
+    hitk = sum(1 for r in ranks if r) / len(ranks)
+    mrr = sum(1 / r for r in ranks if r) / len(ranks)
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<22} | {hit1:>6.2f} | {hitk:>6.2f} | {mrr:>6.3f} | {statistics.median(latencies):>8.2f} | {p95:>8.2f}")
+
+
+def main(k, dim):
+    texts, metadatas, ids = build_corpus()
+    questions = build_questions(metadatas, ids)
+    embedder = FakeEmbedder(dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=tmp)
+        collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+        collection.add(ids=ids, documents=texts, metadatas=metadatas, embeddings=embedder.encode(texts).tolist())
+        index = build_index(texts, metadatas, ids)
+
+        registry.override("embedder", embedder)
+        registry.override("collection", collection)
+        registry.override("lexical_index", index)
+
+        print(f"{len(texts)} fragmentos, {len(questions)} preguntas, k={k}")
+        print(f"{'modo':<22} | {'hit@1':>6} | {'hit@' + str(k):>6} | {'MRR':>6} | {'p50 (ms)':>8} | {'p95 (ms)':>8}")
+        report("densa", *evaluate(questions, k, hybrid=False, use_degree=False), k)
+        report("bm25", *evaluate_bm25(questions, k, index), k)
+        report("híbrida (RRF)", *evaluate(questions, k, hybrid=True, use_degree=False), k)
+        report("híbrida + where grado", *evaluate(questions, k, hybrid=True, use_degree=True), k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+    main(args.k, args.dim)
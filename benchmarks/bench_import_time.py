@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+"""
+Benchmark del arranque: cuánto tarda y cuánta memoria ocupa importar api.py (y otros módulos).
+Usa `python -X importtime` en un proceso nuevo y muestra el tiempo acumulado del módulo pedido,
+los imports más costosos y el pico de memoria (RSS) del proceso.
+
+Uso:
+    python benchmarks/bench_import_time.py --modules api tools.tool_definition --top 15
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "ingestion", "data")
+
+CHILD = """
+import resource, sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+sys.stdout.write(json.dumps({{"wall_seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def parse_importtime(stderr):
+    """Devuelve [(módulo, self_us, cumulative_us)] a partir de la salida de -X importtime."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")  # ChatOpenAI solo necesita que exista
+    env.setdefault("PATH_DICT_SUBJECTS", DATA_DIR)
+    env["WARM_UP"] = "0"
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(module=module)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main(modules, top, as_json):
+    report = {}
+    for module in modules:
+        result = measure(module)
+        imports = result.pop("imports")
+        own = next((cum for name, _, cum in imports if name == module), None)
+        heaviest = sorted(imports, key=lambda r: r[1], reverse=True)[:top]
+        report[module] = {
+            **result,
+            "importtime_cumulative_ms": own / 1000 if own else None,
+            "top_self_ms": [(name, self_us / 1000) for name, self_us, _ in heaviest],
+        }
+
+    if as_json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    for module, r in report.items():
+        print(f"== {module}: {r['wall_seconds']:.2f} s, pico RSS {r['max_rss_mb']:.0f} MB")
+        for name, ms in r["top_self_ms"]:
+            print(f"   {ms:>9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=["api"])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="salida en JSON para comparar ejecuciones")
+    args = parser.parse_args()
+    main(args.modules, args.top, args.json)
@@ -0,0 +1,72 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pdfplumber
+
+from ingestion import extract_pdf_data as ex
+
+"""
+Benchmark de la extracción de dípticos. Replica N veces el díptico de ejemplo de ingestion/data y compara:
+- antes: bucle secuencial, extract_text de las páginas 2 y 3 y cada extractor recorriendo page.chars
+- después: agrupación de caracteres una vez por página, con 1 y con W procesos
+- segunda ejecución: todos los PDFs sin cambios se saltan
+
+Uso:
+    python benchmarks/bench_pdf_extraction.py --copies 32 --workers 4
+"""
+
+SAMPLE = os.path.join(ROOT, "ingestion", "data", "Grado y Doble Grado Arqueología.pdf")
+
+
+def legacy_extract(pdf_path):
+    # reproduce el bucle anterior: páginas sin PageLayout, así que cada extractor reagrupa los caracteres
+    with pdfplumber.open(pdf_path) as pdf:
+        page1, page2, page3 = pdf.pages[0], pdf.pages[1], pdf.pages[2]
+        lines_page1 = ex.extract_lines_with_font_sizes(page1)
+        ex.extract_lines_with_font_sizes(page3)
+        page2.extract_text()
+        page3.extract_text()
+        ex.extract_degree_info(lines_page1)
+        ex.extract_sections(page3)
+        ex.extract_plan_estudios(page2)
+
+
+def main(copies, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_dir = os.path.join(tmp, "pdfs")
+        os.makedirs(pdf_dir)
+        for i in range(copies):
+            shutil.copy(SAMPLE, os.path.join(pdf_dir, f"diptico_{i:04d}.pdf"))
+
+        start = time.perf_counter()
+        for name in sorted(os.listdir(pdf_dir)):
+            legacy_extract(os.path.join(pdf_dir, name))
+        legacy = time.perf_counter() - start
+
+        results = {}
+        for n in [1, workers]:
+            out = os.path.join(tmp, f"out_{n}")
+            results[f"{n} proceso(s)"] = ex.extract_all(pdf_dir, out, workers=n)["seconds"]
+        results["sin cambios"] = ex.extract_all(pdf_dir, out, workers=workers)["seconds"]
+
+    print()
+    print(f"{copies} PDFs")
+    print(f"{'modo':<16} | {'segundos':>9} | {'PDF/s':>8} | {'mejora':>7}")
+    print(f"{'antes':<16} | {legacy:>9.2f} | {copies / legacy:>8.1f} | {1:>6.1f}x")
+    for name, seconds in results.items():
+        print(f"{name:<16} | {seconds:>9.2f} | {copies / max(seconds, 1e-9):>8.1f} | {legacy / max(seconds, 1e-9):>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    main(args.copies, args.workers)
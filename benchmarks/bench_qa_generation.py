@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from openai import OpenAI
+
+from fake_openai import FakeOpenAI, serve
+from stubs import DATA_DIR
+from ingestion import generate_questions, ingest_data
+
+"""
+Benchmark de la generación de preguntas (ingestion/generate_questions.py) contra el servidor local compatible
+con OpenAI (benchmarks/fake_openai.py), con la transcripción de ejemplo repetida `--copies` veces:
+- antes: la transcripción entera en una sola llamada, sin schema; la salida está limitada y llega como texto
+- después: ventanas en paralelo (1 y --concurrency llamadas simultáneas), JSON schema, deduplicación;
+  con un porcentaje de respuestas 429 y de JSON cortado que se reintentan (las ventanas que agotan los
+  reintentos se omiten y se cuentan como fallidas)
+El resultado se escribe en un qa.json temporal y se carga con ingest_data.load_qa.
+
+Uso:
+    python benchmarks/bench_qa_generation.py --copies 3 --concurrency 8 --failure-rate 0.2 --invalid-rate 0.1
+"""
+
+
+def legacy_generate(base_url, transcript):
+    # reproduce generate_qa_from_transcript anterior: una llamada con todo el texto
+    client = OpenAI(api_key="fake", base_url=base_url)
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You extract clear questions and answers from transcripts."},
+            {"role": "user", "content": f"Please generate a clean list of questions and answers.\n\nTRANSCRIPT:\n{transcript}"},
+        ],
+        temperature=0.3,
+    )
+    return response.choices[0].message.content
+
+
+def main(copies, concurrency, failure_rate, invalid_rate):
+    with open(os.path.join(DATA_DIR, "transcription.txt"), "r", encoding="utf-8") as f:
+        transcript = " ".join([f.read().strip()] * copies)
+
+    rows = []
+
+    api = FakeOpenAI()
+    server, base_url = serve(api)
+    start = time.perf_counter()
+    content = legacy_generate(base_url, transcript)
+    try:
+        json.loads(content)
+        valid = "sí"
+    except json.JSONDecodeError:
+        valid = "no"
+    n_pairs = len(api.pairs("TRANSCRIPT:" + transcript))
+    rows.append(("antes", time.perf_counter() - start, 1, n_pairs, "-", 0, 0, valid, 1))
+    server.shutdown()
+
+    for workers, failures, invalid in [(1, 0.0, 0.0), (concurrency, 0.0, 0.0), (concurrency, failure_rate, invalid_rate)]:
+        api = FakeOpenAI(failure_rate=failures, invalid_rate=invalid)
+        server, base_url = serve(api)
+        stats = {}
+        client = generate_questions.get_client(base_url=base_url, api_key="fake")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            pairs = asyncio.run(generate_questions.agenerate_qa(
+                transcript, "Enfermería", client=client, concurrency=workers, requests_per_minute=6000, stats=stats,
+            ))
+        elapsed = time.perf_counter() - start
+        name = f"después x{workers}" + (" con fallos" if failures or invalid else "")
+        rows.append((name, elapsed, api.stats["chat"], stats["pairs"], stats["unique"], stats.get("retries", 0),
+                     stats["failed_windows"], "sí", api.stats["max_concurrent"]))
+        server.shutdown()
+
+    # el resultado se puede ingerir tal cual
+    with tempfile.TemporaryDirectory() as tmp:
+        ingest_data.QA_FILE = os.path.join(tmp, "qa.json")
+        generate_questions.write_qa(pairs, ingest_data.QA_FILE)
+        texts, metadatas, ids = [], [], []
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_data.load_qa(texts, metadatas, ids)
+
+    print()
+    print(f"transcripción de ejemplo x{copies} ({len(transcript)} caracteres)")
+    print(f"{'ejecución':<22} | {'segundos':>8} | {'llamadas':>8} | {'pares':>5} | {'únicos':>6} | {'reintentos':>10} "
+          f"| {'fallidas':>8} | {'JSON válido':>11} | {'simultáneas':>11}")
+    for name, seconds, calls, n_pairs, unique, retries, failed, valid, simultaneous in rows:
+        print(f"{name:<22} | {seconds:>8.2f} | {calls:>8} | {n_pairs:>5} | {unique:>6} | {retries:>10} "
+              f"| {failed:>8} | {valid:>11} | {simultaneous:>11}")
+    print(f"qa.json: {len(texts)} documentos cargados por ingest_data.load_qa")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=3, help="veces que se repite la transcripción de ejemplo")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="respuestas 429")
+    parser.add_argument("--invalid-rate", type=float, default=0.1, help="respuestas con JSON cortado")
+    args = parser.parse_args()
+    main(args.copies, args.concurrency, args.failure_rate, args.invalid_rate)
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from stubs import DATA_DIR, tiny_sentence_transformer
+
+"""
+Benchmark del micro-batching de embeddings de consultas (embeddings/batcher.py) en CPU.
+El modelo es un SentenceTransformer local con pesos aleatorios del tamaño de all-MiniLM-L6-v2 (stubs.py), así el coste
+de cada pasada es realista sin descargar nada. Cada cliente es una tarea asyncio que pide embeddings en bucle durante
+--seconds con consultas distintas (sin caché de embeddings), por el mismo camino que aretrieve_docs en la API:
+- sin batching: run_blocking(embed_query) en el pool de herramientas, un model.encode por consulta
+- batching en el pool: run_blocking(embed_query) con el batcher; cada consulta ocupa un hilo del pool mientras
+  espera su lote, así que los lotes no pasan de TOOL_MAX_WORKERS
+- batching, espera N ms: aembed_query, que espera el lote sin ocupar hilos del pool
+Para cada número de clientes se mide consultas/s, latencia p50/p95 y tamaño medio del lote.
+
+Uso:
+    python benchmarks/bench_query_batching.py --clients 1 4 16 64 --seconds 3 --waits 0 2
+"""
+
+
+def load_queries():
+    from ingestion import ingest_data
+    texts, metadatas, ids = [], [], []
+    ingest_data.JSON_DIR = DATA_DIR
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest_data.load_json_grados(texts, metadatas, ids)
+    degrees = sorted({m["degree"] for m in metadatas})
+    templates = ["¿Qué salidas profesionales tiene {}?", "¿Qué conocimientos se adquieren en {}?",
+                 "¿Qué asignaturas de primero tiene {}?", "¿Dónde se puede trabajar después de {}?"]
+    return texts, [t.format(d) for d in degrees for t in templates]
+
+
+async def load(embed, queries, clients, seconds):
+    """`clients` tareas esperando `embed(consulta)` durante `seconds`; devuelve (latencias, segundos)."""
+    latencies = []
+    stop = time.perf_counter() + seconds
+
+    async def worker(i):
+        n = i
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            await embed(f"{queries[n % len(queries)]} ({n})")
+            latencies.append(time.perf_counter() - start)
+            n += clients
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def p(values, q):
+    values = sorted(values)
+    return 1000 * values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+
+def main(args):
+    os.environ["EMBED_CACHE_PATH"] = ""
+    os.environ.setdefault("DEBUG_LOGS", "0")
+    from embeddings.batcher import EmbeddingBatcher
+    from tools import retrieval_tool
+    from tools.executor import TOOL_MAX_WORKERS, run_blocking
+    from tools.resources import registry
+
+    async def pooled(query):
+        return await run_blocking(retrieval_tool.embed_query, query)
+
+    texts, queries = load_queries()
+    with tempfile.TemporaryDirectory() as tmp:
+        model = tiny_sentence_transformer(tmp, texts + queries, hidden=args.hidden, layers=args.layers)
+    registry.override("embedder", model)
+    model.encode(queries[:8])  # calentamiento
+
+    # el lote no cambia los vectores (el padding queda fuera de la media por la máscara de atención)
+    batcher = EmbeddingBatcher(model, max_batch_size=len(queries), max_wait_ms=50)
+    futures = [batcher.submit(q) for q in queries]
+    batched = np.vstack([f.result() for f in futures])
+    single = np.vstack([model.encode([q])[0] for q in queries])
+    batcher.close()
+
+    # (nombre, espera máxima del batcher o None, función que pide el embedding)
+    modes = [("sin batching", None, pooled), (f"pool, espera {args.waits[-1]:g} ms", args.waits[-1], pooled)]
+    modes += [(f"espera {w:g} ms", w, retrieval_tool.aembed_query) for w in args.waits]
+    rows = []
+    for name, wait, embed in modes:
+        batcher = None
+        if wait is None:
+            retrieval_tool.EMBED_BATCHING = False
+        else:
+            retrieval_tool.EMBED_BATCHING = True
+            batcher = EmbeddingBatcher(model, max_batch_size=args.max_batch, max_wait_ms=wait)
+            registry.override("query_encoder", batcher)
+        for clients in args.clients:
+            if batcher is not None:
+                batcher.batches = batcher.texts = batcher.largest_batch = 0
+            latencies, elapsed = asyncio.run(load(embed, queries, clients, args.seconds))
+            stats = batcher.stats() if batcher is not None else {"mean_batch": 1.0, "largest_batch": 1}
+            rows.append((name, clients, len(latencies) / elapsed, p(latencies, 0.5), p(latencies, 0.95),
+                         stats["mean_batch"], stats["largest_batch"]))
+            print(f"  {name:<17} {clients:>3} clientes: {rows[-1][2]:.0f} consultas/s", flush=True)
+        if batcher is not None:
+            batcher.close()
+
+    print()
+    print(f"modelo BERT {args.layers} capas x {args.hidden} en CPU ({os.cpu_count()} núcleos), lote máximo {args.max_batch}, "
+          f"TOOL_MAX_WORKERS={TOOL_MAX_WORKERS}, "
+          f"{args.seconds:g} s por medida; diferencia máxima lote vs individual: {np.abs(batched - single).max():.1e}")
+    print(f"{'modo':<17} | {'clientes':>8} | {'consultas/s':>11} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'lote medio':>10} | {'lote máx':>8}")
+    for name, clients, qps, p50, p95, mean_batch, largest in rows:
+        print(f"{name:<17} | {clients:>8} | {qps:>11.1f} | {p50:>8.1f} | {p95:>8.1f} | {mean_batch:>10.1f} | {largest:>8}")
+
+    base = {clients: qps for name, clients, qps, *_ in rows if name == "sin batching"}
+    print("\nconsultas/s frente a sin batching:")
+    for name, _, _ in modes[1:]:
+        ratios = [f"{clients}: x{qps / base[clients]:.2f}" for n, clients, qps, *_ in rows if n == name]
+        print(f"  {name:<17} {'  '.join(ratios)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--seconds", type=float, default=3.0, help="duración de cada medida")
+    parser.add_argument("--waits", type=float, nargs="+", default=[0, 2], help="esperas máximas (ms) a comparar")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--hidden", type=int, default=384)
+    parser.add_argument("--layers", type=int, default=6)
+    main(parser.parse_args())
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+import uuid
+
+from stubs import StubChatModel, install_stubs
+
+"""
+Benchmark del router determinista (graph/router.py) con un LLM falso de latencia fija.
+Las preguntas salen de plantillas con los grados de ingestion/data, cada una con la herramienta esperada
+(None = el router debería dejarla al LLM: comparaciones, preguntas generales o de seguimiento).
+Se compara el grafo sin router y con router (ROUTER=1):
+- llamadas al LLM por pregunta y latencia por pregunta (media y p95)
+- preguntas enrutadas y cuántas de ellas con la herramienta correcta
+- coste del propio router por mensaje
+
+Uso:
+    python benchmarks/bench_router.py --llm-latency 0.2
+"""
+
+DEGREES = [
+    "Antropología Social y Cultural", "Arqueología", "Bellas Artes", "Biología", "Bioquímica", "Comercio",
+    "Comunicación Audiovisual", "Criminología", "Economía", "Educación Social", "ADE", "Ciencias de las Religiones",
+]
+
+TEMPLATES = [
+    ("¿Qué asignaturas tiene {degree}?", "retrieve_subjects"),
+    ("asignaturas de primero de {degree}", "retrieve_subjects"),
+    ("¿Qué materias se dan en {degree}?", "retrieve_subjects"),
+    ("¿Qué salidas profesionales tiene {degree}?", "retrieve_docs"),
+    ("¿De qué puedo trabajar si estudio {degree}?", "retrieve_docs"),
+    ("¿Qué conocimientos se adquieren en {degree}?", "retrieve_docs"),
+    ("¿Por qué elegir la carrera de {degree}?", None),
+    ("¿Qué diferencia hay entre {degree} y Derecho?", None),
+    ("¿y sus salidas?", None),
+]
+
+
+class CountingStubChatModel(StubChatModel):
+    calls: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+def build_questions():
+    questions = []
+    for template, tool in TEMPLATES:
+        for degree in DEGREES:
+            questions.append((template.format(degree=degree), tool))
+            if "{degree}" not in template:
+                break
+    return questions
+
+
+async def run(graph, llm, questions):
+    from langchain_core.messages import HumanMessage
+    latencies = []
+    before = llm.calls
+    for question, _ in questions:
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(content=question)]},
+                            config={"configurable": {"thread_id": str(uuid.uuid4())}})
+        latencies.append(time.perf_counter() - start)
+    return latencies, (llm.calls - before) / len(questions)
+
+
+async def main(llm_latency, tool_latency):
+    llm = CountingStubChatModel(latency=llm_latency)
+    install_stubs(llm, tool_latency=tool_latency)
+    from graph import router, workflow
+
+    questions = build_questions()
+    rows = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, enabled in [("sin router", False), ("con router", True)]:
+            workflow.ROUTER = enabled
+            rows.append((name, *await run(workflow.build_graph(), llm, questions)))
+
+        # decisiones y coste del router (resolvedor ya cargado)
+        decisions = []
+        start = time.perf_counter()
+        for question, _ in questions:
+            decisions.append(router.route(question))
+        route_us = (time.perf_counter() - start) / len(questions) * 1e6
+
+    routed = [(call, tool) for call, (_, tool) in zip(decisions, questions) if call is not None]
+    correct = sum(1 for call, tool in routed if call["name"] == tool)
+    expected = sum(1 for _, tool in questions if tool)
+
+    print()
+    print(f"{len(questions)} preguntas ({expected} con herramienta clara), LLM {llm_latency * 1000:.0f} ms por llamada")
+    print(f"{'modo':<11} | {'llamadas LLM/pregunta':>21} | {'media (ms)':>10} | {'p95 (ms)':>8}")
+    for name, latencies, calls in rows:
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+        print(f"{name:<11} | {calls:>21.2f} | {statistics.mean(latencies) * 1000:>10.0f} | {p95 * 1000:>8.0f}")
+    print(f"enrutadas: {len(routed)}/{len(questions)} ({len(routed)}/{expected} de las claras), "
+          f"herramienta correcta: {correct}/{len(routed)}, router: {route_us:.0f} µs por mensaje")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(main(args.llm_latency, args.tool_latency))
@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+
+from fixture_server import FixtureSite, serve
+from ingestion import scrap
+
+"""
+Benchmark del scraper de dípticos contra un servidor local (benchmarks/fixture_server.py), sin red:
+- antes: bucle secuencial, requests.get sin sesión, pausa fija entre grados y el PDF entero en memoria
+- después: sesión compartida, pool de hilos con límite por host y descarga por streaming
+- segunda ejecución: peticiones condicionales, ningún PDF se vuelve a descargar
+- tercera ejecución tras cambiar un díptico en el servidor: solo se descarga ese
+Se mide el tiempo, los PDFs transferidos y el pico de memoria (tracemalloc).
+
+Uso:
+    python benchmarks/bench_scraper.py --degrees 20 --pdf-mb 5 --latency 0.05 --workers 8
+"""
+
+
+def legacy_scrape(start_url, base_url, output_dir, pause):
+    # reproduce el script anterior
+    soup = BeautifulSoup(requests.get(start_url, headers=scrap.headers).text, "html.parser")
+    links = [(urljoin(base_url, a.get("href", "")), a.get("title", "").strip())
+             for ul in soup.select("ul.menu_pag") for a in ul.select("a")]
+    for link, title in links:
+        page = BeautifulSoup(requests.get(link, headers=scrap.headers).text, "html.parser")
+        pdf_link = next(urljoin(base_url, a.get("href")) for a in page.select("a") if "díptico" in a.text.lower())
+        pdf_resp = requests.get(pdf_link, headers=scrap.headers)
+        with open(os.path.join(output_dir, scrap.sanitize_filename(title) + ".pdf"), "wb") as f:
+            f.write(pdf_resp.content)
+        time.sleep(pause)
+
+
+def measure(site, fn):
+    before = site.pdf_requests
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, site.pdf_requests - before, peak / 1e6
+
+
+def main(degrees, pdf_mb, latency, workers, min_interval, legacy_pause):
+    site = FixtureSite(n_degrees=degrees, pdf_bytes=b"%PDF-1.4\n" + os.urandom(int(pdf_mb * 1e6)), latency=latency)
+    server, url = serve(site)
+    start_url = f"{url}/estudios/grado"
+
+    rows = []
+    with tempfile.TemporaryDirectory() as legacy_dir, tempfile.TemporaryDirectory() as out:
+        rows.append(("antes", *measure(site, lambda: legacy_scrape(start_url, url, legacy_dir, legacy_pause))))
+
+        run = lambda: scrap.scrape(start_url, url, out, workers, min_interval)
+        rows.append(("después", *measure(site, run)))
+        rows.append(("sin cambios", *measure(site, run)))
+        site.set_pdf(0, b"nuevo")
+        rows.append(("1 cambiado", *measure(site, run)))
+
+        assert len([f for f in os.listdir(out) if f.endswith(".pdf")]) == degrees
+
+    server.shutdown()
+    print()
+    print(f"{degrees} grados, PDFs de {pdf_mb} MB, {latency * 1000:.0f} ms de latencia por petición")
+    print(f"{'ejecución':<12} | {'segundos':>9} | {'PDFs descargados':>16} | {'pico memoria (MB)':>17}")
+    for name, seconds, pdfs, peak in rows:
+        print(f"{name:<12} | {seconds:>9.2f} | {pdfs:>16} | {peak:>17.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--degrees", type=int, default=20)
+    parser.add_argument("--pdf-mb", type=float, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--min-interval", type=float, default=0.02)
+    parser.add_argument("--legacy-pause", type=float, default=1.0, help="pausa fija del script anterior entre grados")
+    args = parser.parse_args()
+    main(args.degrees, args.pdf_mb, args.latency, args.workers, args.min_interval, args.legacy_pause)
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi.responses import StreamingResponse
+
+from bench_e2e import build_script, serve
+from stubs import FakeEmbedder, ScriptedChatModel, install_local_retrieval, install_stubs
+
+"""
+Benchmark del tiempo hasta la primera respuesta visible en /chat/stream, con el LLM con guion de stubs.py
+(tool call en streaming: nombre y después argumentos a trozos) y las herramientas reales sobre una colección temporal.
+Se compara el generador anterior (solo thread_id y después los tokens de la respuesta, montado en /legacy/chat/stream)
+con el actual (tool_decision, tool_start/tool_end, tokens y heartbeats). Por petición se mide:
+- primer evento: primer evento después de thread_id (lo primero que el usuario ve además de la caja vacía)
+- TTFT: primer token de la respuesta
+- total
+y se muestra la secuencia de eventos de una petición con un heartbeat corto.
+
+Uso:
+    python benchmarks/bench_stream.py --requests 30 --llm-latency 0.3 --token-delay 0.01
+"""
+
+
+def legacy_endpoint(api):
+    # reproduce token_generator anterior: thread_id, tokens del modo "messages" y done
+    from langchain_core.messages import AIMessageChunk, HumanMessage
+
+    async def legacy_chat_stream(request: api.ChatRequest):
+        config = {"configurable": {"thread_id": request.thread_id or os.urandom(8).hex()}}
+
+        async def token_generator():
+            yield f"data: {json.dumps({'type': 'thread_id', 'value': config['configurable']['thread_id']})}\n\n"
+            async for message_chunk, metadata in api.graph.astream(
+                {"messages": [HumanMessage(content=request.message)]}, config=config, stream_mode="messages",
+            ):
+                if isinstance(message_chunk, AIMessageChunk) and message_chunk.content:
+                    yield f"data: {json.dumps({'type': 'token', 'value': message_chunk.content})}\n\n"
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+
+        return StreamingResponse(token_generator(), media_type="text/event-stream")
+
+    api.app.post("/legacy/chat/stream")(legacy_chat_stream)
+
+
+async def timed_stream(client, path, message, timeline=None):
+    start = time.perf_counter()
+    first_event = ttft = None
+    async with client.stream("POST", path, json={"message": message}) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            elapsed = time.perf_counter() - start
+            if line.startswith(":"):
+                if timeline is not None:
+                    timeline.append((elapsed, "heartbeat", ""))
+                continue
+            event = json.loads(line[len("data: "):])
+            if timeline is not None:
+                detail = event.get("name") or event.get("value") or ""
+                timeline.append((elapsed, event["type"], str(detail)[:40]))
+            if event["type"] not in ("thread_id", "done") and first_event is None:
+                first_event = elapsed
+            if event["type"] == "token" and ttft is None:
+                ttft = elapsed
+    return first_event, ttft, time.perf_counter() - start
+
+
+def p(values, q):
+    values = sorted(values)
+    return 1000 * values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+
+async def run(base_url, questions, requests, api):
+    import httpx
+    rows = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        await timed_stream(client, "/chat/stream", questions[0])  # calentamiento
+        for name, path in [("antes", "/legacy/chat/stream"), ("después", "/chat/stream")]:
+            results = [await timed_stream(client, path, questions[i % len(questions)]) for i in range(requests)]
+            rows.append((name, *zip(*results)))
+
+        # secuencia de eventos de una petición con heartbeat corto
+        api.STREAM_HEARTBEAT_SECONDS = 0.1
+        timeline = []
+        await timed_stream(client, "/chat/stream", questions[1], timeline)
+    return rows, timeline
+
+
+def main(requests, llm_latency, token_delay):
+    os.environ["RESPONSE_CACHE"] = "0"
+    os.environ.setdefault("DEBUG_LOGS", "0")
+    os.environ.setdefault("CHECKPOINT_PATH", os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _, metadatas, _ = install_local_retrieval(tmp, FakeEmbedder(256))
+        script = build_script(metadatas)
+        install_stubs(ScriptedChatModel(latency=llm_latency, token_delay=token_delay, script=script), retrieval=False)
+
+        import api
+        from tools.resources import registry
+        registry.warm_up()
+        legacy_endpoint(api)
+
+        server, base_url = serve(api.app)
+        try:
+            rows, timeline = asyncio.run(run(base_url, list(script), requests, api))
+        finally:
+            server.should_exit = True
+
+    print()
+    print(f"{requests} peticiones secuenciales a /chat/stream, LLM {llm_latency * 1000:.0f} ms hasta el primer fragmento "
+          f"+ {token_delay * 1000:.0f} ms por fragmento")
+    print(f"{'generador':<9} | {'primer evento p50':>17} | {'p95':>6} | {'TTFT p50':>8} | {'p95':>6} | {'total p50':>9} | {'p95':>6}")
+    for name, first, ttft, total in rows:
+        print(f"{name:<9} | {p(first, 0.5):>17.0f} | {p(first, 0.95):>6.0f} | {p(ttft, 0.5):>8.0f} | {p(ttft, 0.95):>6.0f} "
+              f"| {p(total, 0.5):>9.0f} | {p(total, 0.95):>6.0f}")
+    print(f"(ms; primera respuesta visible p50: {statistics.median(rows[0][1]) * 1000:.0f} -> "
+          f"{statistics.median(rows[1][1]) * 1000:.0f} ms)")
+
+    print("\neventos de una petición (heartbeat cada 100 ms):")
+    tokens = 0
+    for elapsed, kind, detail in timeline:
+        if kind == "token":
+            tokens += 1
+            if tokens > 3:
+                continue
+        print(f"  {elapsed * 1000:>7.1f} ms  {kind:<13} {detail}")
+    print(f"  ... {tokens} tokens en total")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    main(args.requests, args.llm_latency, args.token_delay)
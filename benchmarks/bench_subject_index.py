@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import sys
+import time
+import unicodedata
+from glob import glob
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.subject_index import SubjectIndex
+
+"""
+Benchmark del índice de retrieve_subjects frente al recorrido lineal original.
+Se genera un catálogo sintético a partir de los JSON de ingestion/data replicando cada grado
+por año de plan y campus (todos los planes de la UCM a lo largo de los años) hasta superar 10k grados.
+Además se mide la latencia del resolvedor de nombres con consultas con erratas y abreviaturas, y se
+compara qué grados encuentran el recorrido original y el resolvedor en el catálogo real.
+
+Uso:
+    python benchmarks/bench_subject_index.py --sizes 100 1000 10000 20000
+"""
+
+DATA_DIR = os.path.join(ROOT, "ingestion", "data")
+CAMPUS = ["Moncloa", "Somosaguas", "Aranjuez", "Vicalvaro", "Online", "Noche", "Bilingue", "Intensivo"]
+
+
+def load_base_catalogue():
+    base = []
+    for path in sorted(glob(f"{DATA_DIR}/*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            base.append(json.load(f))
+    return base
+
+
+def synthetic_catalogue(base, size):
+    catalogue = []
+    year = 1990
+    while len(catalogue) < size:
+        for campus in CAMPUS:
+            for degree in base:
+                catalogue.append({
+                    "degree_title": f"{degree['degree_title']} Plan {year} {campus}",
+                    "plan_estudios": degree["plan_estudios"],
+                })
+                if len(catalogue) >= size:
+                    return catalogue
+        year += 1
+    return catalogue
+
+
+# -- implementación original (recorrido lineal) para comparar --
+def legacy_normalize(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.lower().strip()
+
+
+def legacy_retrieve_subjects(data_list, query):
+    matches = []
+    for degree in data_list:
+        q = legacy_normalize(query).split()
+        t = legacy_normalize(degree["degree_title"])
+        if all(word in t for word in q):
+            subjects = []
+            for year, items in degree["plan_estudios"].items():
+                for item in items:
+                    subjects.append(item["subject"])
+            matches.append({"degree_title": degree["degree_title"], "subjects": subjects})
+    lines = []
+    for match in matches:
+        lines.append(f"Grado: {match['degree_title']}")
+        lines.append("Asignaturas:")
+        for subject in match["subjects"]:
+            lines.append(f"  - {subject}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def legacy_titles(data_list, query):
+    q = legacy_normalize(query).split()
+    return [d["degree_title"] for d in data_list if all(w in legacy_normalize(d["degree_title"]) for w in q)]
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(sizes, repeat):
+    base = load_base_catalogue()
+    queries = ["criminologia 1995 somosaguas", "Economía plan 1991 online", "derecho ciencias politicas 1990 moncloa"]
+    fuzzy_queries = ["criminologa 1995 somosaguas", "ADE 1992 online", "ciencias politica 1990 moncloa", "econ 1991"]
+
+    print(f"{'grados':>8} | {'build (ms)':>10} | {'lineal (ms/q)':>13} | {'índice (ms/q)':>13} | {'speedup':>8} | {'erratas/alias (ms/q)':>20}")
+    for size in sizes:
+        catalogue = synthetic_catalogue(base, size)
+
+        start = time.perf_counter()
+        index = SubjectIndex(catalogue)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # con nombres exactos se encuentran los mismos grados que con el recorrido original
+        # (si el original no encuentra nada, el resolvedor puede devolver coincidencias parciales)
+        for q in queries:
+            expected = legacy_titles(catalogue, q)
+            if expected:
+                assert sorted(index.titles[p] for p in index.search(q)) == sorted(expected), q
+
+        legacy_ms = timeit(lambda: [legacy_retrieve_subjects(catalogue, q) for q in queries], max(1, repeat // 10)) / len(queries)
+        index_ms = timeit(lambda: [index.render(index.search(q)) for q in queries], repeat) / len(queries)
+        # resolvedor sin caché de palabras: cada consulta paga el trie, los trigramas y difflib
+        def fuzzy():
+            index.resolver._token_cache.clear()
+            for q in fuzzy_queries:
+                index.resolver.resolve(q)
+        fuzzy_ms = timeit(fuzzy, repeat) / len(fuzzy_queries)
+        print(f"{size:>8} | {build_ms:>10.1f} | {legacy_ms:>13.3f} | {index_ms:>13.4f} | {legacy_ms / index_ms:>7.0f}x | {fuzzy_ms:>20.4f}")
+
+    print()
+    print("Catálogo real: grados encontrados")
+    index = SubjectIndex(base)
+    for q in ["criminologa", "ADE", "ciencias politica", "arquelogia", "rrhh", "econ", "derecho"]:
+        found = [index.titles[p] for p in index.search(q)]
+        print(f"  {q!r:<20} original: {len(legacy_titles(base, q)):>2} | resolvedor: {len(found):>2} {found[:2]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 20000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
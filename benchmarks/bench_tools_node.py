@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from stubs import StubChatModel, install_stubs
+
+"""
+Benchmark del nodo de herramientas (graph/tools_node.py) frente al ToolNode prebuilt de langgraph.
+El LLM falso pide varias herramientas en el mismo paso (salidas de tres grados con retrieve_docs y las
+asignaturas de otro con retrieve_subjects) y cada conversación repite la misma pregunta en un segundo turno,
+como cuando el usuario reformula o vuelve sobre lo mismo. Se mide, con el grafo en modo asíncrono (el de la API):
+- latencia de cada turno (media y p95 sobre --conversations conversaciones lanzadas a la vez)
+- ejecuciones reales de herramientas y aciertos de la memoización
+y al final la latencia por herramienta que registra tool_stats.
+
+Uso:
+    python benchmarks/bench_tools_node.py --conversations 16 --tool-latency 0.1 --llm-latency 0.05
+"""
+
+DEGREES = ["derecho", "medicina", "criminología"]
+
+
+class MultiToolStubChatModel(StubChatModel):
+    """Pide varias herramientas a la vez ante cada pregunta del usuario."""
+
+    def _decide(self, messages):
+        if isinstance(messages[-1], ToolMessage):
+            return AIMessage(content=self.answer)
+        calls = [{"name": "retrieve_docs", "args": {"query": f"salidas de {d}", "degree": d}} for d in DEGREES]
+        calls.append({"name": "retrieve_subjects", "args": {"query": "Enfermería"}})
+        return AIMessage(content="", tool_calls=[{**c, "id": f"call_{uuid.uuid4().hex[:8]}"} for c in calls])
+
+
+class PrebuiltToolNode:
+    """Adaptador del ToolNode prebuilt con la interfaz de ToolsNode (comportamiento anterior)."""
+
+    def __init__(self, tools):
+        from langgraph.prebuilt import ToolNode
+        self.node = ToolNode(tools)
+
+    def invoke(self, state, config=None):
+        return self.node.invoke(state, config)
+
+    async def ainvoke(self, state, config=None):
+        return await self.node.ainvoke(state, config)
+
+
+def count_executions(stats):
+    return sum(s["calls"] for s in stats.values()), sum(s["memo_hits"] for s in stats.values())
+
+
+async def run(graph, conversations):
+    async def turn(thread_id):
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(content="salidas y asignaturas")]},
+                            config={"configurable": {"thread_id": thread_id}})
+        return time.perf_counter() - start
+
+    threads = [str(uuid.uuid4()) for _ in range(conversations)]
+    first = await asyncio.gather(*(turn(t) for t in threads))
+    second = await asyncio.gather(*(turn(t) for t in threads))
+    return first, second
+
+
+def p95(values):
+    values = sorted(values)
+    return values[max(0, int(len(values) * 0.95) - 1)]
+
+
+async def main(conversations, tool_latency, llm_latency):
+    install_stubs(MultiToolStubChatModel(latency=llm_latency), tool_latency=tool_latency)
+    from graph import tools_node, workflow
+
+    rows = []
+    for name, node_class in [("antes (ToolNode)", PrebuiltToolNode), ("después (ToolsNode)", tools_node.ToolsNode)]:
+        workflow.ToolsNode = node_class
+        graph = workflow.build_graph()
+        before = count_executions(tools_node.tool_stats.snapshot())
+        first, second = await run(graph, conversations)
+        after = count_executions(tools_node.tool_stats.snapshot())
+        executions = after[0] - before[0] if node_class is tools_node.ToolsNode else 4 * 2 * conversations
+        rows.append((name, first, second, executions, after[1] - before[1]))
+
+    print()
+    print(f"{conversations} conversaciones x 2 turnos, 4 herramientas por turno "
+          f"(retrieve_docs {tool_latency * 1000:.0f} ms, LLM {llm_latency * 1000:.0f} ms)")
+    print(f"{'nodo':<20} | {'turno 1 media (ms)':>18} | {'turno 1 p95':>11} | {'turno 2 media (ms)':>18} "
+          f"| {'turno 2 p95':>11} | {'ejecuciones':>11} | {'memo':>4}")
+    for name, first, second, executions, hits in rows:
+        print(f"{name:<20} | {statistics.mean(first) * 1000:>18.0f} | {p95(first) * 1000:>11.0f} "
+              f"| {statistics.mean(second) * 1000:>18.0f} | {p95(second) * 1000:>11.0f} | {executions:>11} | {hits:>4}")
+
+    print("\nlatencia por herramienta (tool_stats):")
+    for name, stats in tools_node.tool_stats.snapshot().items():
+        print(f"  {name:<18} llamadas={stats['calls']:<4} memo={stats['memo_hits']:<4} "
+              f"media={stats['mean_ms']:.1f} ms  máx={stats['max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=16)
+    parser.add_argument("--tool-latency", type=float, default=0.1, help="encode simulado de retrieve_docs (bloqueante)")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.conversations, args.tool_latency, args.llm_latency))
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import time
+
+from stubs import StubChatModel, install_stubs
+
+"""
+Benchmark del coste de la instrumentación (tools/tracing.py).
+- micro: coste de un tramo `with span(...)` con TRACING=0, con TRACING=1 sin traza y dentro de la traza de una petición
+- extremo a extremo: peticiones a /chat/stream a través de la app ASGI (middleware de request-id incluido) con un LLM
+  y herramientas falsos sin latencia, para que solo se vea el coste propio de la API y el grafo:
+  antes (print de depuración, a /dev/null), DEBUG_LOGS=0 y DEBUG_LOGS=0 + TRACING=1, alternando los modos por rondas
+Al final se muestra la traza de una petición (GET /traces/{request_id}) y un resumen de /metrics.
+
+Uso:
+    python benchmarks/bench_tracing.py --requests 200 --rounds 5
+"""
+
+
+def micro(n):
+    from tools import tracing
+    rows = []
+    for name, enabled, traced in [("TRACING=0", False, False), ("TRACING=1 sin traza", True, False),
+                                  ("TRACING=1 con traza", True, True)]:
+        tracing.TRACING = enabled
+        with tracing.trace("micro") if traced else contextlib.nullcontext():
+            start = time.perf_counter()
+            for _ in range(n):
+                with tracing.span("micro"):
+                    pass
+            rows.append((name, (time.perf_counter() - start) / n * 1e9))
+    tracing.metrics.clear()
+    return rows
+
+
+async def run(client, n):
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        async with client.stream("POST", "/chat/stream", json={"message": f"salidas de derecho {i}"}) as response:
+            async for _ in response.aiter_lines():
+                pass
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+MODES = [("antes (prints)", True, False), ("DEBUG_LOGS=0", False, False), ("DEBUG_LOGS=0 + TRACING=1", False, True)]
+
+
+async def main(requests, spans, rounds):
+    os.environ["RESPONSE_CACHE"] = "0"
+    from tools import tracing
+    install_stubs(StubChatModel(latency=0.0, callbacks=[tracing.llm_timer]), tool_latency=0.0)
+    import httpx
+    import api
+    from graph import nodes
+
+    micro_rows = micro(spans)
+
+    latencies = {name: [] for name, _, _ in MODES}
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            await run(client, 5)  # calentamiento (catálogo, checkpointer)
+            tracing.metrics.clear()
+            for _ in range(rounds):
+                for name, debug_logs, enabled in MODES:
+                    tracing.DEBUG_LOGS = nodes.DEBUG_LOGS = debug_logs
+                    tracing.TRACING = enabled
+                    latencies[name] += await run(client, requests // rounds)
+
+        response = await client.post("/chat/stream", json={"message": "salidas de derecho"},
+                                     headers={"X-Request-ID": "bench-trace"})
+        await response.aread()
+        trace = (await client.get(f"/traces/{response.headers['x-request-id']}")).json()
+        exposition = (await client.get("/metrics")).text
+    snapshot = tracing.metrics.snapshot()
+
+    print()
+    print("coste por tramo:")
+    for name, ns in micro_rows:
+        print(f"  {name:<22} {ns:>8.0f} ns")
+
+    rows = list(latencies.items())
+    base = statistics.mean(latencies["DEBUG_LOGS=0"])
+    print(f"\n{requests} peticiones por modo a /chat/stream en {rounds} rondas (LLM y herramientas sin latencia)")
+    print(f"{'modo':<26} | {'media (ms)':>10} | {'p95 (ms)':>8} | {'vs DEBUG_LOGS=0':>15}")
+    for name, latencies in rows:
+        mean = statistics.mean(latencies)
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+        print(f"{name:<26} | {mean * 1000:>10.2f} | {p95 * 1000:>8.2f} | {(mean / base - 1) * 100:>+14.1f}%")
+
+    print(f"\ntraza {trace['request_id']} ({trace['duration_ms']:.2f} ms):")
+    for s in trace["spans"]:
+        attrs = f" {s['attrs']}" if s.get("attrs") else ""
+        print(f"  #{s['id']:<3} padre={str(s['parent']):<5} {s['name']:<22} +{s['start_ms']:>7.2f} ms "
+              f"{s['duration_ms']:>7.2f} ms{attrs}")
+    print(f"\n/metrics: {len(exposition.splitlines())} líneas; medias (ms) con TRACING=1:")
+    for metric, series in snapshot.items():
+        for label, values in series.items():
+            print(f"  {metric:<18} {label:<30} n={values['count']:<5} media={values['mean_ms']:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--spans", type=int, default=100_000, help="iteraciones del micro-benchmark de span()")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.spans, args.rounds))
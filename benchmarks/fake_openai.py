@@ -0,0 +1,125 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stubs import fake_embedding
+
+"""
+Servidor local compatible con la API de OpenAI (lo justo para ingestion/generate_questions.py), sin red ni clave:
+- POST /v1/chat/completions   genera pares pregunta-respuesta a partir de las frases del fragmento recibido
+- POST /v1/embeddings         embeddings deterministas de bolsa de palabras (stubs.fake_embedding)
+Simula lo que importa para medir el pipeline:
+- la latencia crece con la salida (base + por par generado) y la salida está limitada a `max_pairs` pares,
+  como el límite de tokens de respuesta de un modelo real
+- sin response_format la respuesta es texto con el JSON entre ```json ... ```, como hacen muchos modelos
+- `failure_rate` de respuestas 429 y `invalid_rate` de respuestas con JSON cortado
+`stats` cuenta peticiones, errores inyectados y el máximo de peticiones simultáneas.
+"""
+
+
+class FakeOpenAI:
+
+    def __init__(self, base_latency=0.2, per_pair_latency=0.1, max_pairs=20, failure_rate=0.0, invalid_rate=0.0,
+                 seed=0):
+        self.base_latency = base_latency
+        self.per_pair_latency = per_pair_latency
+        self.max_pairs = max_pairs
+        self.failure_rate = failure_rate
+        self.invalid_rate = invalid_rate
+        self.random = random.Random(seed)
+        self.stats = {"chat": 0, "embeddings": 0, "429": 0, "invalid": 0, "max_concurrent": 0}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def pairs(self, prompt):
+        """Una pregunta por frase del fragmento: '¿<primeras palabras>...?' -> la frase completa."""
+        fragment = re.split(r"TRANSCRIPT(?: FRAGMENT)?:", prompt)[-1]
+        pairs = []
+        for sentence in re.findall(r"[^.?!]{40,}[.?!]", fragment):
+            words = sentence.split()
+            pairs.append({"question": "¿" + " ".join(words[:8]) + "?", "answer": sentence.strip()})
+        return pairs[:self.max_pairs]
+
+    def chat(self, body):
+        prompt = body["messages"][-1]["content"]
+        pairs = self.pairs(prompt)
+        time.sleep(self.base_latency + self.per_pair_latency * len(pairs))
+
+        draw = self.random.random()
+        if draw < self.failure_rate:
+            self.stats["429"] += 1
+            return 429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+
+        content = json.dumps({"pairs": pairs}, ensure_ascii=False)
+        if draw < self.failure_rate + self.invalid_rate:
+            self.stats["invalid"] += 1
+            content = content[:len(content) // 2]
+        elif "response_format" not in body:
+            content = f"Here are the questions and answers:\n```json\n{json.dumps(pairs, ensure_ascii=False)}\n```"
+
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+
+    def embeddings(self, body):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return 200, {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text, 256).tolist()}
+                     for i, text in enumerate(inputs)],
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+
+def make_handler(api):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with api._lock:
+                api._active += 1
+                api.stats["max_concurrent"] = max(api.stats["max_concurrent"], api._active)
+            try:
+                if self.path.endswith("/chat/completions"):
+                    api.stats["chat"] += 1
+                    status, payload = api.chat(body)
+                elif self.path.endswith("/embeddings"):
+                    api.stats["embeddings"] += 1
+                    status, payload = api.embeddings(body)
+                else:
+                    status, payload = 404, {"error": {"message": "not found"}}
+            finally:
+                with api._lock:
+                    api._active -= 1
+
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def serve(api):
+    """Arranca el servidor en un puerto libre en segundo plano. Devuelve (servidor, base_url para el cliente)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+Servidor HTTP local que imita la web de grados de la UCM para probar y medir ingestion/scrap.py sin red:
+- /estudios/grado            índice con ul.menu_pag y un enlace por grado
+- /grado/<i>                 página del grado con el enlace "Díptico de la titulación"
+- /dipticos/<i>.pdf          PDF de ejemplo, con ETag y Last-Modified (responde 304 a peticiones condicionales)
+Cada respuesta tarda `latency` segundos para simular la red. `pdf_requests` y `pdf_bytes_sent` cuentan
+las descargas completas de PDFs.
+"""
+
+
+class FixtureSite:
+
+    def __init__(self, n_degrees=20, pdf_bytes=b"", latency=0.05):
+        self.n_degrees = n_degrees
+        self.pdf = pdf_bytes or b"%PDF-1.4\n" + b"0" * 200_000
+        self.latency = latency
+        self.last_modified = formatdate(time.time() - 3600, usegmt=True)
+        self.etags = {}
+        self.pdf_requests = 0
+        self.pdf_bytes_sent = 0
+        self._lock = threading.Lock()
+        for i in range(n_degrees):
+            self.set_pdf(i, self.pdf)
+
+    def set_pdf(self, i, content):
+        """Cambia el contenido de un díptico (nuevo ETag)."""
+        self.etags[i] = '"' + hashlib.md5(content + str(i).encode()).hexdigest() + '"'
+
+    def index(self):
+        links = "".join(
+            f'<li><a href="/grado/{i}" title="Grado en Fixture {i}">Grado {i}</a></li>' for i in range(self.n_degrees)
+        )
+        return f'<html><body><ul class="menu_pag">{links}</ul></body></html>'
+
+    def degree(self, i):
+        return (
+            f'<html><body><div class="titulo-estudio"><h2>Grado en Fixture {i}</h2></div>'
+            f'<a href="/dipticos/{i}.pdf">Díptico de la titulación</a></body></html>'
+        )
+
+
+def make_handler(site):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, body, content_type, extra=None):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(site.latency)
+            path = self.path.split("?")[0]
+
+            if path == "/estudios/grado":
+                return self.send_body(site.index().encode("utf-8"), "text/html; charset=utf-8")
+
+            if path.startswith("/grado/"):
+                return self.send_body(site.degree(int(path.rsplit("/", 1)[1])).encode("utf-8"), "text/html; charset=utf-8")
+
+            if path.startswith("/dipticos/") and path.endswith(".pdf"):
+                i = int(path.rsplit("/", 1)[1][:-4])
+                etag = site.etags[i]
+                if self.headers.get("If-None-Match") == etag or (
+                    not self.headers.get("If-None-Match")
+                    and self.headers.get("If-Modified-Since")
+                    and parsedate_to_datetime(self.headers["If-Modified-Since"]) >= parsedate_to_datetime(site.last_modified)
+                ):
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                with site._lock:
+                    site.pdf_requests += 1
+                    site.pdf_bytes_sent += len(site.pdf)
+                return self.send_body(site.pdf, "application/pdf", {"ETag": etag, "Last-Modified": site.last_modified})
+
+            self.send_error(404)
+
+    return Handler
+
+
+def serve(site):
+    """Arranca el servidor en un puerto libre en segundo plano. Devuelve (servidor, url base)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(site))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+import uuid
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+"""
+Sustitutos ligeros para los benchmarks: un LLM falso que decide llamar a una herramienta y después
+responde, y herramientas que simulan el coste del modelo de embeddings. Así se puede medir la API
+y el grafo sin llamar a OpenAI ni cargar Qwen3-Embedding-4B.
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "ingestion", "data")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class StubChatModel(BaseChatModel):
+    """
+    LLM de pega con latencia configurable.
+    - Si el último mensaje es del usuario, pide la herramienta `tool_name` con la pregunta como query.
+    - Si el último mensaje es el resultado de una herramienta (o tool_name está vacío), responde con `answer` token a token.
+    """
+    latency: float = 0.2        # segundos hasta el primer token
+    token_delay: float = 0.0    # segundos entre tokens al hacer streaming
+    tool_name: str = "retrieve_docs"
+    answer: str = "Según la información recuperada, estas son las opciones del grado."
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _decide(self, messages: List[BaseMessage]) -> AIMessage:
+        if isinstance(messages[-1], ToolMessage) or not self.tool_name:
+            return AIMessage(content=self.answer)
+        query = messages[-1].content
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": self.tool_name, "args": {"query": query}, "id": f"call_{uuid.uuid4().hex[:8]}"}],
+        )
+
+    def _chunks(self, message: AIMessage):
+        if message.tool_calls:
+            # como la API de OpenAI: primero el nombre de la herramienta y después los argumentos a trozos
+            for i, call in enumerate(message.tool_calls):
+                yield AIMessageChunk(
+                    content="", tool_call_chunks=[{"name": call["name"], "args": "", "id": call["id"], "index": i}],
+                )
+                args = json.dumps(call["args"])
+                for start in range(0, len(args), 8):
+                    yield AIMessageChunk(
+                        content="", tool_call_chunks=[{"name": None, "args": args[start:start + 8], "id": None, "index": i}],
+                    )
+            return
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            yield AIMessageChunk(content=word if i == 0 else " " + word)
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._decide(messages))])
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._decide(messages))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        time.sleep(self.latency)
+        for chunk in self._chunks(self._decide(messages)):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(self._decide(messages)):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
+
+
+class ScriptedChatModel(StubChatModel):
+    """
+    StubChatModel con guion: `script` asocia cada mensaje del usuario a sus tool calls ([{"name", "args"}]).
+    Los mensajes que no están en el guion se tratan como en StubChatModel.
+    """
+    script: dict = {}
+
+    def _decide(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and last.content in self.script:
+            calls = self.script[last.content]
+            return AIMessage(content="", tool_calls=[{**c, "id": f"call_{uuid.uuid4().hex[:8]}"} for c in calls])
+        return super()._decide(messages)
+
+
+def fake_embedding(text: str, dim: int = 64):
+    """Embedding determinista de bolsa de palabras con hashing: textos parecidos dan vectores parecidos."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dim] += 1.0
+    return vector
+
+
+class FakeEmbedder:
+    """Embedder local diminuto con la interfaz de SentenceTransformer.encode (vectores de fake_embedding normalizados)."""
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        vectors = np.stack([fake_embedding(t, self.dim) for t in texts])
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+
+
+def tiny_sentence_transformer(path, texts, hidden=384, layers=6, heads=12, vocab_size=3000, max_seq_length=128):
+    """
+    SentenceTransformer local con pesos aleatorios y el tamaño de un modelo pequeño para CPU (por defecto el de
+    all-MiniLM-L6-v2), sin descargas: el vocabulario WordPiece se entrena con `texts` y se guarda en `path`.
+    Los vectores no tienen significado, pero el coste de cada pasada es el de un modelo real de ese tamaño.
+    """
+    import contextlib
+    import io
+
+    import transformers
+    from sentence_transformers import SentenceTransformer, models
+    from tokenizers import BertWordPieceTokenizer
+
+    transformers.logging.set_verbosity_error()
+    transformers.logging.disable_progress_bar()
+    tokenizer = BertWordPieceTokenizer(lowercase=True)
+    tokenizer.train_from_iterator(texts, vocab_size=vocab_size, show_progress=False)
+    tokenizer.save_model(path)
+    transformers.BertTokenizerFast(vocab_file=os.path.join(path, "vocab.txt")).save_pretrained(path)
+    config = transformers.BertConfig(
+        vocab_size=tokenizer.get_vocab_size(), hidden_size=hidden, num_hidden_layers=layers,
+        num_attention_heads=heads, intermediate_size=4 * hidden, max_position_embeddings=512,
+    )
+    transformers.BertModel(config).save_pretrained(path)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        transformer = models.Transformer(path, max_seq_length=max_seq_length)
+        pooling = models.Pooling(transformer.get_word_embedding_dimension(), "mean")
+        return SentenceTransformer(modules=[transformer, pooling], device="cpu")
+
+
+def build_local_collection(path, embedder):
+    """
+    Colección chroma en `path` con los fragmentos de conocimientos/salidas de ingestion/data (como ingest_data)
+    y su índice BM25. Devuelve (colección, índice, textos, metadatos, ids).
+    """
+    import contextlib
+    import io
+
+    import chromadb
+    from ingestion import ingest_data
+    from tools.lexical_index import build_index
+
+    texts, metadatas, ids = [], [], []
+    ingest_data.JSON_DIR = DATA_DIR
+    with contextlib.redirect_stdout(io.StringIO()):
+        ingest_data.load_json_grados(texts, metadatas, ids)
+    client = chromadb.PersistentClient(path=path, settings=chromadb.Settings(anonymized_telemetry=False))
+    collection = client.create_collection("bench", metadata={"hnsw:space": "cosine"})
+    collection.add(ids=ids, documents=texts, metadatas=metadatas, embeddings=embedder.encode(texts).tolist())
+    return collection, build_index(texts, metadatas, ids), texts, metadatas, ids
+
+
+def install_local_retrieval(path, embedder):
+    """
+    El retrieve_docs real contra una colección temporal (build_local_collection) y el embedder indicado.
+    Se usa con install_stubs(..., retrieval=False). Devuelve (textos, metadatos, ids) del corpus.
+    """
+    os.environ["EMBED_CACHE_PATH"] = ""
+    os.environ.setdefault("PATH_DICT_SUBJECTS", DATA_DIR)
+    from tools.resources import registry
+
+    collection, index, texts, metadatas, ids = build_local_collection(path, embedder)
+    registry.override("embedder", embedder)
+    registry.override("collection", collection)
+    registry.override("lexical_index", index)
+    return texts, metadatas, ids
+
+
+def install_stubs(llm: Optional[BaseChatModel] = None, tool_latency: float = 0.05, retrieval: bool = True):
+    """
+    Registra módulos sustitutos de `agent.llm` y `tools.retrieval_tool` antes de importar la API.
+    retrieve_docs duerme `tool_latency` segundos de forma bloqueante para simular el encode del modelo.
+    Con retrieval=False solo se sustituye el LLM (ver install_local_retrieval).
+    El catálogo de asignaturas real se carga desde ingestion/data.
+    """
+    os.environ.setdefault("PATH_DICT_SUBJECTS", DATA_DIR)
+    os.environ.setdefault("CHECKPOINT_PATH", os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite"))
+
+    llm_module = types.ModuleType("agent.llm")
+    llm_module.llm = llm or StubChatModel()
+    llm_module.summary_llm = StubChatModel(
+        latency=getattr(llm_module.llm, "latency", 0.0), tool_name="", answer="Resumen de la conversación anterior."
+    )
+    sys.modules["agent.llm"] = llm_module
+    if not retrieval:
+        return llm_module.llm
+
+    def retrieve_docs(query: str, k: int = 5, degree: Optional[str] = None, section: Optional[str] = None,
+                      neighbours: int = 0, query_embedding=None):
+        time.sleep(tool_latency)
+        return [{"content": f"Documento {i} para: {query}", "metadata": {"section": "stub"}, "id": str(i)} for i in range(k)]
+
+    retrieval_module = types.ModuleType("tools.retrieval_tool")
+    retrieval_module.retrieve_docs = retrieve_docs
+    retrieval_module.embed_query = fake_embedding
+    retrieval_module.CHUNK_NEIGHBOURS = 0
+
+    async def aembed_query(query: str):
+        return fake_embedding(query)
+
+    retrieval_module.aembed_query = aembed_query
+    retrieval_module.collection_version = lambda: None
+    sys.modules["tools.retrieval_tool"] = retrieval_module
+
+    return llm_module.llm
+
+
+class ToneSpeech:
+    """
+    "Habla" sintética para probar la transcripción sin modelos: cada palabra del vocabulario es una ráfaga
+    de WORD_SECONDS con dos tonos (uno por banda de frecuencias) seguida de un silencio.
+    """
+    WORD_SECONDS = 0.4
+    GAP_SECONDS = 0.13   # 30 s no es múltiplo de la duración de una palabra: hay palabras cortadas
+    STEP_HZ = 40
+    BANDS = (300, 4000)   # inicio de cada banda; 90 frecuencias por banda -> 8100 palabras
+
+    def __init__(self, vocabulary, sample_rate=16_000):
+        self.words = list(dict.fromkeys(vocabulary))
+        self.ids = {w: i for i, w in enumerate(self.words)}
+        self.sample_rate = sample_rate
+
+    def _tones(self, word_id):
+        return self.BANDS[0] + (word_id // 90) * self.STEP_HZ, self.BANDS[1] + (word_id % 90) * self.STEP_HZ
+
+    def synthesize(self, words):
+        """PCM int16 mono con una ráfaga por palabra."""
+        n_word = int(self.WORD_SECONDS * self.sample_rate)
+        n_gap = int(self.GAP_SECONDS * self.sample_rate)
+        t = np.arange(n_word) / self.sample_rate
+        out = np.zeros(len(words) * (n_word + n_gap), dtype=np.float32)
+        for i, word in enumerate(words):
+            f1, f2 = self._tones(self.ids[word])
+            start = i * (n_word + n_gap)
+            out[start:start + n_word] = 0.4 * np.sin(2 * np.pi * f1 * t) + 0.4 * np.sin(2 * np.pi * f2 * t)
+        return (out * 32767).astype(np.int16)
+
+    def decode(self, window):
+        """Palabras de una ventana float32; las ráfagas cortadas por los bordes se pierden."""
+        frame = int(0.01 * self.sample_rate)
+        n_frames = len(window) // frame
+        if not n_frames:
+            return []
+        energy = np.abs(window[:n_frames * frame]).reshape(n_frames, frame).max(axis=1) > 0.05
+        words = []
+        i = 0
+        while i < n_frames:
+            if not energy[i]:
+                i += 1
+                continue
+            j = i
+            while j < n_frames and energy[j]:
+                j += 1
+            if (j - i) * frame >= 0.9 * self.WORD_SECONDS * self.sample_rate:
+                segment = window[i * frame:j * frame]
+                spectrum = np.abs(np.fft.rfft(segment))
+                freqs = np.fft.rfftfreq(len(segment), 1 / self.sample_rate)
+                f1 = freqs[np.argmax(np.where(freqs < self.BANDS[1] - self.STEP_HZ / 2, spectrum, 0))]
+                f2 = freqs[np.argmax(np.where(freqs >= self.BANDS[1] - self.STEP_HZ / 2, spectrum, 0))]
+                word_id = int(round((f1 - self.BANDS[0]) / self.STEP_HZ)) * 90 + int(round((f2 - self.BANDS[1]) / self.STEP_HZ))
+                if 0 <= word_id < len(self.words):
+                    words.append(self.words[word_id])
+            i = j
+        return words
+
+
+class StubASRModel:
+    """
+    Modelo de transcripción de pega para ingestion/transcribe.py: decodifica ToneSpeech y simula
+    el coste de un modelo real (carga, coste fijo por llamada y coste por ventana del lote).
+    """
+
+    def __init__(self, speech, load_seconds=0.0, call_overhead=0.0, per_window=0.0):
+        time.sleep(load_seconds)
+        self.speech = speech
+        self.call_overhead = call_overhead
+        self.per_window = per_window
+        self.calls = 0
+        self.windows = 0
+
+    def transcribe_batch(self, windows, sample_rate):
+        time.sleep(self.call_overhead + self.per_window * len(windows))
+        self.calls += 1
+        self.windows += len(windows)
+        return [" ".join(self.speech.decode(w)) for w in windows]
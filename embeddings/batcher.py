@@ -0,0 +1,120 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from dotenv import load_dotenv
+
+"""
+Micro-batching de los embeddings de consultas. Con varias peticiones a la vez, cada retrieve_docs hacía su propio
+model.encode([query]) sobre el mismo modelo, una consulta por pasada. Aquí un hilo recoge las consultas que llegan
+a la vez (hasta EMBED_BATCH_MAX_SIZE, esperando como mucho EMBED_BATCH_MAX_WAIT_MS desde la primera), las codifica
+en una sola pasada del modelo y devuelve a cada llamada su vector a través de un Future.
+Mientras el modelo está ocupado con un lote, las consultas nuevas se acumulan para el siguiente, así que con poca
+carga el lote es de una consulta y solo se añade la espera máxima.
+Desde el camino asíncrono de la API hay que usar aencode: encode bloquea el hilo que llama hasta que su lote
+termina, y si ese hilo es del pool de herramientas (TOOL_MAX_WORKERS) nunca habría más consultas esperando
+que hilos en el pool.
+"""
+load_dotenv()
+
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") == "1"                       #agrupar consultas concurrentes
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))           #consultas máximas por pasada
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "2"))    #espera máxima para completar un lote
+
+_CLOSE = object()
+
+
+class EmbeddingBatcher:
+    """
+    Misma interfaz que model.encode(texts) para quien la use (EmbeddingCache, embed_query), pero cada texto
+    se encola y se codifica junto con los de otras llamadas concurrentes.
+    """
+
+    def __init__(self, model, max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.texts = 0
+        self.largest_batch = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text) -> Future:
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, texts, **encode_kwargs):
+        """Vectores (n, dim) de `texts`; los argumentos de encode se ignoran (los fija el lote)."""
+        futures = [self.submit(text) for text in texts]
+        return np.vstack([future.result() for future in futures])
+
+    async def aencode(self, texts):
+        """Como encode, pero la espera del lote no ocupa ningún hilo (asyncio.wrap_future)."""
+        futures = [asyncio.wrap_future(self.submit(text)) for text in texts]
+        return np.vstack(await asyncio.gather(*futures))
+
+    def _collect(self, first):
+        batch = [first]
+        # lo que ya está en cola se toma sin esperar
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _CLOSE:
+                return
+            batch = self._collect(first)
+            closing = _CLOSE in batch
+            batch = [item for item in batch if item is not _CLOSE and item[1].set_running_or_notify_cancel()]
+            if batch:
+                self._encode(batch)
+            if closing:
+                return
+
+    def _encode(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            vectors = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.texts += len(texts)
+        self.largest_batch = max(self.largest_batch, len(texts))
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(np.asarray(vector, dtype=np.float32))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch": self.texts / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+    def close(self):
+        """Termina el hilo después de los lotes pendientes."""
+        self._queue.put(_CLOSE)
+        self._thread.join()
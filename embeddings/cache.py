@@ -0,0 +1,162 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from dotenv import load_dotenv
+
+"""
+Caché persistente de embeddings en disco (SQLite).
+La clave es (nombre del modelo, hash del texto normalizado), así las re-ingestas y las consultas repetidas
+de los usuarios no vuelven a pasar por el modelo de embeddings. Los vectores se guardan como float32.
+Tiene un tamaño máximo con expulsión LRU y contadores de aciertos/fallos para ver cuánto tiempo de modelo ahorra.
+"""
+load_dotenv()
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embedding_cache.sqlite") #fichero de la caché ("" la desactiva)
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000")) #máximo de vectores guardados
+
+
+def normalize_text(text: str) -> str:
+    """Normalización mínima para que variaciones de espacios/unicode compartan entrada (no cambia mayúsculas)."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings de un modelo concreto.
+    Es segura entre hilos (una conexión compartida protegida por un lock) y entre procesos (SQLite en modo WAL).
+    """
+
+    def __init__(self, model_name: str, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0  # tiempo de modelo gastado en los fallos
+        self.encoded = 0           # textos calculados por el modelo
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def get_many(self, texts):
+        """
+        Devuelve una lista alineada con `texts` con el vector cacheado o None si no está.
+        """
+        keys = [cache_key(self.model_name, t) for t in texts]
+        found = {}
+
+        with self._lock:
+            # sqlite limita el número de parámetros por consulta, se pregunta por trozos
+            for i in range(0, len(keys), 500):
+                chunk = keys[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, dim, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32, count=dim)
+
+            # se actualiza el último acceso de los aciertos (orden LRU)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+                self._conn.commit()
+
+            result = [found.get(k) for k in keys]
+            hits = sum(v is not None for v in result)
+            self.hits += hits
+            self.misses += len(result) - hits
+
+        return result
+
+    def put_many(self, texts, vectors):
+        """Guarda los vectores de `texts` y expulsa los menos usados si se supera el máximo."""
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((cache_key(self.model_name, text), self.model_name, vector.shape[0], vector.tobytes(), now))
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+
+    def store_encoded(self, texts, vectors, seconds):
+        """Guarda vectores recién calculados por el modelo y apunta el tiempo que costaron."""
+        with self._lock:
+            self.encode_seconds += seconds
+            self.encoded += len(texts)
+        self.put_many(texts, vectors)
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # se libera un 10% extra para no expulsar en cada inserción
+        excess = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)", (excess,)
+        )
+
+    def encode(self, model, texts, **encode_kwargs):
+        """
+        Equivalente a model.encode(texts) pero solo pasa por el modelo los textos que no están en la caché.
+        Devuelve un array float32 (n, dim) en el orden de `texts`.
+        """
+        cached = self.get_many(texts)
+        missing = [i for i, v in enumerate(cached) if v is None]
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            start = time.perf_counter()
+            new_vectors = model.encode(missing_texts, convert_to_numpy=True, **encode_kwargs)
+            self.store_encoded(missing_texts, new_vectors, time.perf_counter() - start)
+            for i, vector in zip(missing, new_vectors):
+                cached[i] = np.asarray(vector, dtype=np.float32)
+
+        return np.vstack(cached) if cached else np.empty((0, 0), dtype=np.float32)
+
+    def stats(self):
+        """Contadores de uso y estimación del tiempo de modelo ahorrado por los aciertos."""
+        with self._lock:
+            total = self.hits + self.misses
+            per_text = self.encode_seconds / self.encoded if self.encoded else 0.0
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)).fetchone()[0]
+            return {
+                "model": self.model_name,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "encode_seconds": round(self.encode_seconds, 3),
+                "estimated_saved_seconds": round(self.hits * per_text, 3),
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
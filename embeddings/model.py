@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+"""
+Modelo de embeddings de la ingesta y de retrieve_docs, configurado en un solo sitio: ingest_data y retrieval_tool
+importan EMBED_MODEL_NAME de aquí, así que la colección y las consultas siempre usan el mismo modelo.
+Qwen3-Embedding-4B necesita GPU para ir fluido; en servidores solo con CPU se puede usar Qwen/Qwen3-Embedding-0.6B
+(mismo entrenamiento, multilingüe) u otro modelo de sentence-transformers.
+EMBED_DIM trunca los vectores a sus primeras dimensiones (modelos entrenados con Matryoshka, como los Qwen3-Embedding)
+y los vuelve a normalizar: la colección ocupa menos y cada búsqueda es más barata.
+Cambiar el modelo o EMBED_DIM obliga a reindexar (ingest_data lo detecta y recrea la colección).
+"""
+load_dotenv()
+
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "Qwen/Qwen3-Embedding-4B")   #modelo de embeddings (ingesta y consultas)
+EMBED_DIM = int(os.getenv("EMBED_DIM", "0"))                                  #dimensiones que se guardan (0 = todas)
+
+
+def truncate(vectors, dim=EMBED_DIM):
+    """Primeras `dim` dimensiones de un vector o matriz de vectores, normalizadas (sin cambios con dim=0)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not dim or dim >= vectors.shape[-1]:
+        return vectors
+    vectors = vectors[..., :dim]
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def embedding_signature():
+    """Lo que determina los vectores guardados; se guarda en los metadatos de la colección."""
+    return {"embed_model": EMBED_MODEL_NAME, "embed_dim": EMBED_DIM}
@@ -0,0 +1,166 @@
+import json
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+"""
+Índice cuantizado de los embeddings para la búsqueda densa en servidores solo con CPU.
+- int8: cada dimensión se escala a [-128, 127] con el rango que tiene en la colección (4 veces menos que float32)
+- binary: un bit por dimensión (el signo) y distancia de Hamming (32 veces menos)
+En memoria solo están las codificaciones. Los vectores float32 se guardan al lado y se abren con mmap; de ellos solo
+se leen los EMBED_RESCORE_FACTOR * k mejores candidatos, que se re-puntúan con precisión completa.
+Lo escribe ingest_data en CHROMA_PATH al terminar (como el índice BM25) y, con EMBED_QUANTIZATION=int8|binary,
+retrieve_docs lo usa en lugar de collection.query (chroma solo se usa para leer el texto de los resultados).
+"""
+load_dotenv()
+
+EMBED_QUANTIZATION = os.getenv("EMBED_QUANTIZATION", "none")          #none | int8 | binary
+EMBED_RESCORE_FACTOR = int(os.getenv("EMBED_RESCORE_FACTOR", "10"))    #candidatos por resultado que se re-puntúan (0 = no)
+
+QUANTIZED_INDEX_DIR = "quantized_index"  # directorio dentro de CHROMA_PATH
+KINDS = ("int8", "binary")
+BLOCK_ROWS = 512  # filas por bloque al puntuar: la copia en float32 de un bloque int8 cabe en caché
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bits):
+    """Bits a 1 de cada fila (np.bitwise_count desde numpy 2.0; tabla por bytes en versiones anteriores)."""
+    if hasattr(np, "bitwise_count"):
+        if bits.shape[-1] % 8 == 0 and bits.flags.c_contiguous:
+            bits = bits.view(np.uint64)  # 8 veces menos operaciones
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int32)
+    return _POPCOUNT_TABLE[bits].sum(axis=-1, dtype=np.int32)
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def int8_ranges(vectors):
+    """(mínimo, paso) de cada dimensión para repartir su rango en 256 valores."""
+    lo = vectors.min(axis=0)
+    step = np.maximum(vectors.max(axis=0) - lo, 1e-12) / 255
+    return lo.astype(np.float32), step.astype(np.float32)
+
+
+def quantize(vectors, kind, ranges=None):
+    if kind == "int8":
+        lo, step = ranges
+        return (np.clip(np.round((vectors - lo) / step), 0, 255) - 128).astype(np.int8)
+    if kind == "binary":
+        return np.packbits(vectors > 0, axis=-1)
+    raise ValueError(f"Cuantización desconocida: {kind} (opciones: {', '.join(KINDS)})")
+
+
+class QuantizedIndex:
+    """
+    Codificaciones int8/binarias de los vectores de la colección, con el grado y la sección de cada fragmento
+    para aplicar los mismos filtros que el `where` de chroma.
+    """
+
+    def __init__(self, kind, codes, vectors, ids, degrees, sections, ranges=None, signature=None):
+        if kind not in KINDS:
+            raise ValueError(f"Cuantización desconocida: {kind} (opciones: {', '.join(KINDS)})")
+        self.kind = kind
+        self.codes = codes
+        self.vectors = vectors  # float32 normalizados (mmap al cargar desde disco)
+        self.ids = list(ids)
+        self.degrees = np.asarray(degrees, dtype=object)
+        self.sections = np.asarray(sections, dtype=object)
+        self.ranges = ranges
+        self.signature = signature or {}
+
+    @classmethod
+    def build(cls, kind, vectors, ids, metadatas, signature=None):
+        vectors = normalize(vectors)
+        ranges = int8_ranges(vectors) if kind == "int8" else None
+        metadatas = [m or {} for m in metadatas]
+        return cls(kind, quantize(vectors, kind, ranges), vectors, ids,
+                   [m.get("degree") for m in metadatas], [m.get("section") for m in metadatas], ranges, signature)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        """Memoria de las codificaciones, lo que el índice mantiene en RAM."""
+        return self.codes.nbytes
+
+    def _positions(self, degrees, section):
+        mask = None
+        if degrees:
+            mask = np.isin(self.degrees, list(degrees))
+        if section:
+            mask = self.sections == section if mask is None else mask & (self.sections == section)
+        return None if mask is None else np.flatnonzero(mask)
+
+    def approximate_scores(self, query, positions=None):
+        """Similitud aproximada de `query` con cada fragmento (o con los de `positions`)."""
+        codes = self.codes if positions is None else self.codes[positions]
+        scores = np.empty(len(codes), dtype=np.float32)
+        if self.kind == "int8":
+            # q · (lo + (c + 128) * paso) sin descuantizar la matriz entera
+            lo, step = self.ranges
+            scaled = query * step
+            offset = float(query @ lo + 128 * scaled.sum())
+            for start in range(0, len(codes), BLOCK_ROWS):
+                block = codes[start:start + BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32) @ scaled + offset
+        else:
+            # menos bits distintos = más parecido
+            scores[:] = -popcount(codes ^ np.packbits(query > 0))
+        return scores
+
+    def search(self, query, k=5, degrees=None, section=None, rescore=EMBED_RESCORE_FACTOR):
+        """
+        [(id, similitud)] de los k fragmentos más parecidos, opcionalmente filtrados por grado(s) y sección.
+        Con rescore > 0 se toman rescore * k candidatos y se ordenan por coseno con los vectores float32.
+        """
+        query = normalize(query)
+        positions = self._positions(degrees, section)
+        scores = self.approximate_scores(query, positions)
+        n = min(len(scores), k * rescore if rescore else k)
+        if n <= 0:
+            return []
+        top = np.argpartition(-scores, n - 1)[:n]
+        candidates = top if positions is None else positions[top]
+        if rescore:
+            order = np.argsort(candidates)  # lectura del mmap en orden
+            candidates = candidates[order]
+            scores = self.vectors[candidates] @ query
+        else:
+            scores = scores[top]
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in best]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        arrays = {"codes": self.codes, "vectors": np.asarray(self.vectors, dtype=np.float32)}
+        if self.ranges is not None:
+            arrays["lo"], arrays["step"] = self.ranges
+        for name, array in arrays.items():
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        # meta.json se escribe el último: es lo que se comprueba al cargar
+        meta = {"kind": self.kind, "ids": self.ids, "degrees": self.degrees.tolist(),
+                "sections": self.sections.tolist(), "signature": self.signature}
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        ranges = None
+        if meta["kind"] == "int8":
+            ranges = (np.load(os.path.join(path, "lo.npy")), np.load(os.path.join(path, "step.npy")))
+        return cls(
+            meta["kind"], np.load(os.path.join(path, "codes.npy")),
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+            meta["ids"], meta["degrees"], meta["sections"], ranges, meta.get("signature"),
+        )
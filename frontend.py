@@ -14,6 +14,17 @@ URL =os.getenv("STREAM_URL") #URL del endpoint
 
 STREAM_URL = URL
 
+# texto que se muestra mientras el agente usa cada herramienta (antes del primer token de la respuesta)
+TOOL_STATUS = {
+    "retrieve_docs": "Buscando en la información de los grados",
+    "retrieve_subjects": "Consultando el plan de estudios",
+}
+
+
+def tool_status(names):
+    labels = list(dict.fromkeys(TOOL_STATUS.get(name, name) for name in names))
+    return "_" + ", ".join(labels) + "..._"
+
 
 def respond(message: str, history: list, thread_id: str):
     """
@@ -21,6 +32,8 @@ def respond(message: str, history: list, thread_id: str):
 
     - Envía el mensaje al endpoint /chat/stream.
     - Recibe tokens en tiempo real mediante Server-Sent Events (SSE).
+    - Mientras el agente decide y ejecuta herramientas (tool_decision, tool_start, tool_end)
+      muestra qué está consultando, hasta que llega el primer token.
     - Va acumulando la respuesta parcial y la muestra progresivamente.
     - Mantiene el thread_id para conservar el contexto conversacional.
     """
@@ -30,6 +43,7 @@ def respond(message: str, history: list, thread_id: str):
         thread_id = str(uuid.uuid4())
 
     partial_reply = ""
+    running = {}  # herramientas en curso: id -> nombre
 
     # Realizamos la petición POST en modo streaming
     with requests.post(
@@ -39,23 +53,38 @@ def respond(message: str, history: list, thread_id: str):
     ) as response:
         response.raise_for_status()
 
-        for raw_line in response.iter_lines():
+        # chunk_size=None: cada línea se procesa en cuanto llega, sin esperar a llenar un bloque
+        for raw_line in response.iter_lines(chunk_size=None):
             if not raw_line:
                 continue  
 
             line = raw_line.decode("utf-8")
             if not line.startswith("data: "):
-                continue # solo se procesan eventos SSE válidos
+                continue # solo se procesan eventos SSE válidos (los heartbeats ": ping" se ignoran)
 
             data = json.loads(line[len("data: "):])
             # Primer mensaje: el servidor envía el thread_id
             if data["type"] == "thread_id":
                 thread_id = data["value"]  
+            # Progreso: el agente ha decidido usar una herramienta o la está ejecutando
+            elif data["type"] == "tool_decision" and not partial_reply:
+                yield tool_status([data["name"]]), thread_id
+            elif data["type"] == "tool_start":
+                running[data["id"]] = data["name"]
+                if not partial_reply:
+                    yield tool_status(running.values()), thread_id
+            elif data["type"] == "tool_end":
+                running.pop(data["id"], None)
+                if not partial_reply:
+                    yield (tool_status(running.values()) if running else "_Redactando la respuesta..._"), thread_id
             # Tokens generados por el modelo en tiempo real
             elif data["type"] == "token":
                 partial_reply += data["value"]
                 yield partial_reply, thread_id  
 
+            elif data["type"] == "error":
+                yield (partial_reply + "\n\n" if partial_reply else "") + data["value"], thread_id
+
             elif data["type"] == "done":
                 break
 
@@ -0,0 +1,329 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from dotenv import load_dotenv
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+"""
+Checkpointer del grafo. Antes se usaba MemorySaver: cada thread_id guardaba todo su historial en RAM
+durante toda la vida del proceso (memoria sin límite) y las conversaciones se perdían al reiniciar
+o al tener varios workers de uvicorn. Aquí se define un backend SQLite que:
+- funciona sin servicios externos y se comparte entre workers (un mismo fichero en modo WAL)
+- caduca los hilos sin actividad (TTL) y limita el número de hilos guardados (LRU)
+- guarda solo los últimos checkpoints de cada hilo, comprimidos con zlib. El historial (get_state_history)
+  y el replay desde un checkpoint solo llegan hasta el más antiguo conservado, que queda sin padre
+"""
+load_dotenv()
+
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")                 #sqlite | memory
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoints.sqlite")           #fichero de la bbdd de conversaciones
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", str(7 * 24 * 3600)))        #segundos sin actividad antes de borrar un hilo
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "10000"))     #máximo de hilos guardados (LRU)
+CHECKPOINT_HISTORY = int(os.getenv("CHECKPOINT_HISTORY", "3"))                 #checkpoints que se conservan por hilo
+PRUNE_EVERY_SECONDS = 30                                                        #frecuencia de la limpieza de hilos
+
+COMPRESS_MIN_BYTES = 512  # por debajo de esto no compensa comprimir
+COMPRESSED_PREFIX = "z:"
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer SQLite acotado. Los métodos asíncronos ejecutan los síncronos en un hilo
+    para no bloquear el event loop de la API.
+    """
+
+    def __init__(
+        self,
+        path=CHECKPOINT_PATH,
+        ttl=CHECKPOINT_TTL,
+        max_threads=CHECKPOINT_MAX_THREADS,
+        history=CHECKPOINT_HISTORY,
+        *,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.ttl = ttl
+        self.max_threads = max_threads
+        self.history = max(1, history)
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_threads_access ON threads(last_access);
+            """
+        )
+
+    # -- serialización compacta --
+    def _dumps(self, obj):
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return COMPRESSED_PREFIX + type_, zlib.compress(data, 1)
+        return type_, data
+
+    def _loads(self, type_, data):
+        if type_.startswith(COMPRESSED_PREFIX):
+            return self.serde.loads_typed((type_[len(COMPRESSED_PREFIX):], zlib.decompress(data)))
+        return self.serde.loads_typed((type_, data))
+
+    # -- hilos: TTL y LRU --
+    def _touch(self, thread_id):
+        self.conn.execute(
+            "INSERT INTO threads (thread_id, last_access) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET last_access = excluded.last_access",
+            (thread_id, time.time()),
+        )
+
+    def _delete_threads(self, thread_ids):
+        for thread_id in thread_ids:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+
+    def prune_threads(self, force=False):
+        """Borra los hilos caducados y, si se supera el máximo, los menos usados recientemente."""
+        now = time.time()
+        if not force and now - self._last_prune < PRUNE_EVERY_SECONDS:
+            return 0
+        self._last_prune = now
+
+        with self._lock:
+            expired = [r[0] for r in self.conn.execute("SELECT thread_id FROM threads WHERE last_access < ?", (now - self.ttl,))]
+            count = self.conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0] - len(expired)
+            overflow = []
+            if count > self.max_threads:
+                overflow = [
+                    r[0]
+                    for r in self.conn.execute(
+                        "SELECT thread_id FROM threads WHERE last_access >= ? ORDER BY last_access LIMIT ?",
+                        (now - self.ttl, count - self.max_threads),
+                    )
+                ]
+            self.conn.execute("BEGIN")
+            self._delete_threads(expired + overflow)
+            self.conn.execute("COMMIT")
+        return len(expired) + len(overflow)
+
+    def thread_count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    # -- API de BaseCheckpointSaver --
+    def _pending_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self._loads(type_, value)) for task_id, channel, type_, value in rows]
+
+    def _to_tuple(self, thread_id, checkpoint_ns, row):
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self._loads(type_, checkpoint),
+            metadata=self._loads(metadata_type, metadata),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=self._pending_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._to_tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+            results = []
+            for thread_id, checkpoint_ns, *row in rows:
+                item = self._to_tuple(thread_id, checkpoint_ns, row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(item)
+                if limit is not None and len(results) >= limit:
+                    break
+
+        yield from results
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, data = self._dumps(checkpoint)
+        metadata_type, metadata_data = self._dumps(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    metadata_type,
+                    metadata_data,
+                ),
+            )
+            # solo se conservan los últimos `history` checkpoints del hilo (y sus writes)
+            old = [
+                r[0]
+                for r in self.conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.history),
+                )
+            ]
+            for checkpoint_id in old:
+                self.conn.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+                self.conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            if old:
+                # el más antiguo que queda apuntaría a un checkpoint borrado: se deja sin padre
+                self.conn.execute(
+                    "UPDATE checkpoints SET parent_checkpoint_id = NULL WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "AND parent_checkpoint_id IS NOT NULL AND parent_checkpoint_id NOT IN "
+                    "(SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?)",
+                    (thread_id, checkpoint_ns, thread_id, checkpoint_ns),
+                )
+            self._touch(thread_id)
+            self.conn.execute("COMMIT")
+
+        self.prune_threads()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # los writes especiales (errores, interrupciones...) sobrescriben; los normales no se repiten
+        special, regular = [], []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dumps(value)
+            row = (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, data, task_path)
+            (special if channel in WRITES_IDX_MAP else regular).append(row)
+
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", special)
+            self.conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", regular)
+            self.conn.execute("COMMIT")
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self._delete_threads([thread_id])
+            self.conn.execute("COMMIT")
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def build_checkpointer(backend=CHECKPOINT_BACKEND):
+    """Devuelve el checkpointer configurado (sqlite por defecto; memory para el comportamiento anterior)."""
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        return SqliteCheckpointSaver()
+    raise ValueError(f"CHECKPOINT_BACKEND desconocido: {backend}")
@@ -0,0 +1,177 @@
+import os
+import threading
+from functools import lru_cache
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+"""
+Gestión del contexto que se envía al LLM. Antes agent_node enviaba todo state.messages en cada paso,
+incluidos los ToolMessage antiguos con listas completas de asignaturas y cinco documentos de chroma cada uno,
+así que los tokens del prompt (y la latencia y el coste) crecían linealmente con la conversación.
+Aquí se define:
+- una ventana de turnos recientes limitada por un presupuesto de tokens
+- el recorte de resultados de herramientas de turnos anteriores a una referencia corta
+- el resumen acumulado de los turnos antiguos (lo usa el nodo opcional `summarize` del grafo)
+- la contabilidad de tokens de prompt por llamada
+"""
+load_dotenv()
+
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))            #presupuesto de tokens del historial enviado al LLM
+TOOL_REFERENCE_CHARS = int(os.getenv("TOOL_REFERENCE_CHARS", "200"))         #caracteres que se conservan de resultados antiguos
+CONTEXT_SUMMARY = os.getenv("CONTEXT_SUMMARY", "0") == "1"                   #activar el nodo de resumen
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("SUMMARY_TRIGGER_TOKENS", "4000"))    #tokens de turnos antiguos a partir de los que se resume
+SUMMARY_KEEP_TURNS = int(os.getenv("SUMMARY_KEEP_TURNS", "2"))               #turnos recientes que nunca se resumen
+
+SUMMARY_PROMPT = """
+Resume la conversación entre un estudiante y un asistente de grados de la UCM.
+Conserva los grados, asignaturas, salidas y datos concretos que se han mencionado y lo que el usuario quería saber.
+Si hay un resumen anterior, intégralo. Responde solo con el resumen, en español y en menos de 200 palabras.
+"""
+
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # codificación de gpt-4o
+except Exception as e:
+    # sin tiktoken (o sin poder descargar la codificación) el presupuesto de tokens es aproximado
+    print(f"tiktoken no disponible ({type(e).__name__}): los tokens del contexto se estiman como caracteres / 4")
+    _encoding = None
+
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text: str) -> int:
+    if _encoding is None:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(messages) -> int:
+    """Estimación de los tokens de prompt de una lista de mensajes (contenido + tool calls + ~4 por mensaje)."""
+    total = 0
+    for m in messages:
+        total += 4 + count_text_tokens(str(m.content))
+        for call in getattr(m, "tool_calls", None) or []:
+            total += count_text_tokens(call["name"]) + count_text_tokens(str(call["args"]))
+    return total
+
+
+def split_turns(messages):
+    """Agrupa los mensajes en turnos; cada turno empieza con un HumanMessage."""
+    turns = []
+    for m in messages:
+        if isinstance(m, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(m)
+    return turns
+
+
+def collapse_tool_output(message: ToolMessage) -> ToolMessage:
+    """Sustituye el resultado de una herramienta por una referencia corta."""
+    content = str(message.content)
+    if len(content) <= TOOL_REFERENCE_CHARS:
+        return message
+    reference = (
+        f"{content[:TOOL_REFERENCE_CHARS]}… [resultado anterior de {message.name or 'la herramienta'} "
+        f"recortado, {len(content)} caracteres; vuelve a llamar a la herramienta si necesitas el detalle]"
+    )
+    return ToolMessage(content=reference, tool_call_id=message.tool_call_id, name=message.name, id=message.id)
+
+
+def collapse_old_tool_outputs(messages):
+    """Recorta los resultados de herramientas de todos los turnos salvo el actual."""
+    last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+    return [
+        collapse_tool_output(m) if i < last_human and isinstance(m, ToolMessage) else m
+        for i, m in enumerate(messages)
+    ]
+
+
+def build_context(messages, budget=None):
+    """
+    Devuelve los mensajes que se envían al LLM: resultados antiguos recortados y solo los turnos más
+    recientes que caben en el presupuesto. El turno actual siempre se envía completo y los turnos se
+    toman enteros para no separar una tool call de su ToolMessage.
+    """
+    budget = CONTEXT_MAX_TOKENS if budget is None else budget
+    turns = split_turns(collapse_old_tool_outputs(messages))
+    if not turns:
+        return []
+
+    kept = [turns[-1]]
+    used = count_tokens(turns[-1])
+    for turn in reversed(turns[:-1]):
+        tokens = count_tokens(turn)
+        if used + tokens > budget:
+            break
+        kept.insert(0, turn)
+        used += tokens
+
+    return [m for turn in kept for m in turn]
+
+
+def system_prompt(base: str, summary: str) -> SystemMessage:
+    if not summary:
+        return SystemMessage(content=base)
+    return SystemMessage(content=f"{base}\nResumen de la conversación anterior:\n{summary}")
+
+
+def messages_to_summarize(messages):
+    """
+    Turnos antiguos que conviene resumir: todos salvo los SUMMARY_KEEP_TURNS últimos,
+    y solo si ocupan más de SUMMARY_TRIGGER_TOKENS. Devuelve [] si no hace falta resumir.
+    """
+    turns = split_turns([m for m in messages if not isinstance(m, SystemMessage)])
+    old = [m for turn in turns[:-SUMMARY_KEEP_TURNS] for m in turn] if len(turns) > SUMMARY_KEEP_TURNS else []
+    if count_tokens(old) < SUMMARY_TRIGGER_TOKENS:
+        return []
+    return old
+
+
+def summary_request(previous_summary: str, old_messages):
+    """Mensajes para pedir al LLM el resumen acumulado."""
+    lines = []
+    if previous_summary:
+        lines.append(f"Resumen anterior:\n{previous_summary}\n")
+    lines.append("Conversación:")
+    for m in old_messages:
+        if isinstance(m, ToolMessage):
+            m = collapse_tool_output(m)
+            lines.append(f"Herramienta: {m.content}")
+        elif isinstance(m, AIMessage):
+            if m.content:
+                lines.append(f"Asistente: {m.content}")
+        else:
+            lines.append(f"Usuario: {m.content}")
+    return [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content="\n".join(lines))]
+
+
+class PromptTokenStats:
+    """Contabilidad de tokens de prompt por llamada al LLM (estimados antes de enviar)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total = 0
+        self.max = 0
+        self.last = 0
+
+    def record(self, tokens: int):
+        with self._lock:
+            self.calls += 1
+            self.total += tokens
+            self.max = max(self.max, tokens)
+            self.last = tokens
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "total": self.total,
+                "max": self.max,
+                "last": self.last,
+                "mean": self.total / self.calls if self.calls else 0.0,
+            }
+
+
+prompt_tokens = PromptTokenStats()
@@ -1,9 +1,18 @@
 from langchain_openai import ChatOpenAI
 from graph.state import AgentState
 from tools.tool_definition import tools
-from agent.llm import llm
+from agent.llm import llm, summary_llm
+from graph.context import (
+    build_context,
+    count_tokens,
+    messages_to_summarize,
+    prompt_tokens,
+    summary_request,
+    system_prompt,
+)
 
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import RemoveMessage, SystemMessage
+from tools.tracing import DEBUG_LOGS, debug, span
 
 #prompt general que se le pasará al LLM con las instrucciones básicas y sobre las herramientas que debe usar
 SYSTEM_PROMPT = """
@@ -18,6 +27,36 @@ REGLAS ESTRICTAS:
 - NUNCA digas que no tienes acceso a información sin haber llamado primero a una herramienta.
 """
 
+def _prepare_messages(state: AgentState):
+    """
+    Prepara la lista de mensajes que se enviará al LLM (común a la versión síncrona y asíncrona).
+    """
+    # Extraemos la lista de mensajes acumulados en el estado del agente.
+    messages = state.messages
+
+    # Log útil para depuración: muestra los mensajes recibidos y su tipo (solo con DEBUG_LOGS=1).
+    if DEBUG_LOGS:
+        print("AGENT NODE")
+        print("Messages:")
+        for i, m in enumerate(messages):
+            # Mostramos solo los primeros 300 caracteres ya que puede ser muy extenso y confundir más que ayudar.
+            print(f"{i}: {type(m).__name__}: {getattr(m, 'content', '')[:300]}")
+
+    # Ventana de contexto: resultados de herramientas antiguos recortados y solo los turnos
+    # recientes que caben en el presupuesto de tokens (ver graph/context.py).
+    messages = build_context([m for m in messages if not isinstance(m, SystemMessage)])
+
+    # El mensaje de sistema se inyecta solo una vez, con el resumen de la conversación si lo hay.
+    messages = [system_prompt(SYSTEM_PROMPT, state.summary)] + messages
+
+    # Contabilidad de tokens de prompt por llamada
+    tokens = count_tokens(messages)
+    prompt_tokens.record(tokens)
+    debug("PROMPT TOKENS:", tokens)
+
+    return messages
+
+
 def agent_node(state: AgentState):
     """
     Nodo principal del agente.  
@@ -25,30 +64,55 @@ def agent_node(state: AgentState):
     Envía los mensajes al LLM.  
     Devuelve la respuesta del modelo para que el grafo continúe.
     """
-    print("AGENT NODE")
+    with span("agent"):
+        messages = _prepare_messages(state)
 
-    # Extraemos la lista de mensajes acumulados en el estado del agente.
-    messages = state.messages
+        # Llamada al LLM con el historial de mensajes.
+        # Aquí el agente decide si responde directamente o invoca herramientas.
+        response = llm.invoke(messages)
 
-    # Log útil para depuración: muestra los mensajes recibidos y su tipo.
-    print("Messages:")
-    for i, m in enumerate(messages):
-        # Mostramos solo los primeros 300 caracteres ya que puede ser muy extenso y confundir más que ayudar.
-        print(f"{i}: {type(m).__name__}: {getattr(m, 'content', '')[:300]}")
+    # Log de depuración para ver si el modelo ha solicitado herramientas.
+    debug("DEBUG tool_calls:", response.tool_calls)
 
-    # Aseguramos que el mensaje de sistema se inyecta solo una vez.
-    # Esto evita duplicar instrucciones del sistema en cada paso del grafo.
-    if not any(isinstance(m, SystemMessage) for m in messages):
-        messages = [SystemMessage(content=SYSTEM_PROMPT)] + messages
+    # Devolvemos la respuesta como nuevo mensaje
+    return {"messages": [response]}
 
-    # Llamada al LLM con el historial de mensajes.
-    # Aquí el agente decide si responde directamente o invoca herramientas.
-    response = llm.invoke(messages)
 
-    # Log de depuración para ver si el modelo ha solicitado herramientas.
-    print("DEBUG tool_calls:", response.tool_calls)
+async def aagent_node(state: AgentState):
+    """
+    Versión asíncrona del nodo del agente. Es la que usa la API (graph.ainvoke / graph.astream):
+    la llamada al LLM se espera con llm.ainvoke y no bloquea el event loop mientras llega la respuesta.
+    """
+    with span("agent"):
+        messages = _prepare_messages(state)
+
+        response = await llm.ainvoke(messages)
+
+    debug("DEBUG tool_calls:", response.tool_calls)
 
-    # Devolvemos la respuesta como nuevo mensaje
     return {"messages": [response]}
 
 
+def summarize_node(state: AgentState):
+    """
+    Nodo opcional de resumen (CONTEXT_SUMMARY=1). Si los turnos antiguos ocupan demasiado,
+    los resume con el LLM, guarda el resumen acumulado en el estado y los elimina del historial.
+    """
+    old = messages_to_summarize(state.messages)
+    if not old:
+        return {}
+    debug("SUMMARIZE NODE:", len(old), "mensajes")
+    with span("summarize"):
+        response = summary_llm.invoke(summary_request(state.summary, old))
+    return {"summary": response.content, "messages": [RemoveMessage(id=m.id) for m in old]}
+
+
+async def asummarize_node(state: AgentState):
+    """Versión asíncrona del nodo de resumen."""
+    old = messages_to_summarize(state.messages)
+    if not old:
+        return {}
+    debug("SUMMARIZE NODE:", len(old), "mensajes")
+    with span("summarize"):
+        response = await summary_llm.ainvoke(summary_request(state.summary, old))
+    return {"summary": response.content, "messages": [RemoveMessage(id=m.id) for m in old]}
@@ -0,0 +1,185 @@
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from dotenv import load_dotenv
+
+from tools.subject_index import normalize
+from tools.tracing import debug
+
+"""
+Caché de respuestas delante del grafo del agente.
+La mayoría del tráfico son las mismas preguntas ("¿Qué asignaturas tiene enfermería?", "salidas de derecho")
+y cada una cuesta agent -> tools -> agent con dos llamadas a gpt-4o. Aquí se guardan las respuestas finales:
+- por pregunta normalizada
+- con búsqueda por similitud de embeddings, para que reformulaciones casi iguales también acierten
+- con TTL y expulsión LRU
+- invalidada cuando cambia la versión de los datos (re-ingesta de chroma o del catálogo de asignaturas)
+La clave no incluye los resultados de las herramientas: al buscar todavía no se han ejecutado. Que una respuesta
+no sobreviva a los datos con los que se generó depende solo de la versión de los datos (check_version) y del TTL.
+En su lugar, cada respuesta guarda los grados que nombra la pregunta (graph/router.find_degrees) y la búsqueda por
+similitud solo acierta con los mismos grados: "asignaturas de Biología" y "asignaturas de Bioquímica" se parecen
+más que el umbral, pero no comparten respuesta.
+"""
+load_dotenv()
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "1") == "1"                          #activar la caché de respuestas
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))                #segundos que vive una respuesta
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))  #máximo de respuestas (LRU)
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))    #similitud coseno mínima para acertar
+VERSION_CHECK_SECONDS = float(os.getenv("VERSION_CHECK_SECONDS", "5"))             #cada cuánto se mira si hubo re-ingesta
+
+
+def normalize_question(question: str) -> str:
+    """Minúsculas, sin tildes, sin signos de puntuación y con los espacios colapsados."""
+    text = normalize(question)
+    text = "".join(c if c.isalnum() else " " for c in text)
+    return " ".join(text.split())
+
+
+@dataclass
+class CachedResponse:
+    question: str          # pregunta normalizada
+    answer: str
+    embedding: np.ndarray  # embedding normalizado (norma 1) de la pregunta
+    degrees: frozenset     # títulos de los grados que nombra la pregunta
+    created: float
+
+
+class ResponseCache:
+    """
+    Caché en memoria del proceso. Se usa desde el event loop de la API (un solo hilo), el embedding
+    de la pregunta lo calcula el llamador fuera del loop.
+    """
+
+    def __init__(
+        self,
+        version_fn=None,
+        on_invalidate=None,
+        ttl=RESPONSE_CACHE_TTL,
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        threshold=RESPONSE_CACHE_THRESHOLD,
+    ):
+        self.version_fn = version_fn          # devuelve la versión actual de los datos
+        self.on_invalidate = on_invalidate    # se llama cuando la versión cambia (p.ej. recargar recursos)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.entries = OrderedDict()          # pregunta normalizada -> CachedResponse, en orden LRU
+        self.hits = 0
+        self.misses = 0
+        self._matrix = None                   # embeddings apilados para la búsqueda por similitud
+        self._keys = []
+        self._created = None                  # instante de creación de cada fila de _matrix
+        self._degrees = []                    # grados de cada fila de _matrix
+        self._version = version_fn() if version_fn else None
+        self._last_version_check = time.monotonic()
+
+    def clear(self):
+        self.entries.clear()
+        self._matrix = None
+        self._keys = []
+        self._created = None
+        self._degrees = []
+
+    def check_version(self):
+        """Vacía la caché si los datos se han re-ingerido desde la última comprobación."""
+        if self.version_fn is None or time.monotonic() - self._last_version_check < VERSION_CHECK_SECONDS:
+            return
+        self._last_version_check = time.monotonic()
+        version = self.version_fn()
+        if version != self._version:
+            debug("Datos re-ingeridos: se vacía la caché de respuestas")
+            self._version = version
+            self.clear()
+            if self.on_invalidate:
+                self.on_invalidate()
+
+    def _expired(self, entry):
+        return time.time() - entry.created > self.ttl
+
+    def _remove(self, key):
+        self.entries.pop(key, None)
+        self._matrix = None
+
+    def _similarity_index(self):
+        if self._matrix is None:
+            self._keys = list(self.entries)
+            self._matrix = np.vstack([self.entries[k].embedding for k in self._keys]) if self._keys else None
+            self._created = np.array([self.entries[k].created for k in self._keys])
+            self._degrees = [self.entries[k].degrees for k in self._keys]
+        return self._keys, self._matrix, self._created, self._degrees
+
+    def lookup_exact(self, question: str):
+        """
+        Solo por pregunta normalizada exacta, sin embedding: la API la prueba antes de calcularlo.
+        Devuelve la respuesta o None; un fallo no cuenta todavía (lo cuenta lookup_similar).
+        """
+        self.check_version()
+        key = normalize_question(question)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry.answer
+
+    def lookup_similar(self, embedding, degrees=frozenset()):
+        """
+        Después de fallar lookup_exact: la entrada no caducada y con los mismos grados (`degrees`) más parecida
+        a la pregunta, si su similitud coseno es >= threshold. Devuelve la respuesta o None.
+        """
+        best_key = None
+        if self.entries:
+            keys, matrix, created, entry_degrees = self._similarity_index()
+            scores = matrix @ _unit(embedding)
+            scores[time.time() - created > self.ttl] = -np.inf
+            scores[np.array([d != degrees for d in entry_degrees])] = -np.inf
+            i = int(np.argmax(scores))
+            if scores[i] >= self.threshold:
+                best_key = keys[i]
+
+        if best_key is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(best_key)
+        self.hits += 1
+        return self.entries[best_key].answer
+
+    def store(self, question: str, answer: str, embedding, degrees=frozenset()):
+        """Guarda la respuesta final de una pregunta con los grados que nombra."""
+        if not answer:
+            return
+        key = normalize_question(question)
+        self.entries[key] = CachedResponse(
+            question=key,
+            answer=answer,
+            embedding=_unit(embedding),
+            degrees=frozenset(degrees),
+            created=time.time(),
+        )
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._matrix = None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,161 @@
+import os
+import re
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from graph.state import AgentState
+from tools.degree_resolver import STOPWORDS, normalize
+from tools.executor import run_blocking
+from tools.tracing import debug, span
+from tools.resources import registry
+
+"""
+Enrutado determinista antes del agente (ROUTER=1). SYSTEM_PROMPT ya fija qué herramienta corresponde a cada
+pregunta (asignaturas -> retrieve_subjects, salidas/competencias -> retrieve_docs), así que la primera llamada al
+LLM solo sirve para elegir herramienta y argumentos. El router lo decide con reglas de palabras clave y el
+resolvedor de grados, y si está seguro emite él mismo la tool call: el grafo va directamente a "tools" y el LLM
+solo interviene para redactar la respuesta (una llamada menos por pregunta).
+
+Solo se enruta cuando no hay dudas: una sola intención reconocida y un único grado nombrado en el mensaje.
+Comparaciones, créditos, preguntas de seguimiento sin grado ("¿y sus salidas?") o mensajes con varias
+intenciones pasan al LLM como antes.
+"""
+
+ROUTER = os.getenv("ROUTER", "0") == "1"                            #activar el router antes del agente
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.8"))     #puntuación mínima del resolvedor para aceptar el grado
+ROUTER_MAX_SPAN = 6                                                 #palabras máximas de un nombre de grado en el mensaje
+
+# prefijos de palabra (sin tildes) de cada intención
+SUBJECT_PREFIXES = ("asignatura", "materia", "temario")
+SALIDAS_PREFIXES = ("salida", "trabaj", "empleo", "profesion", "oficio")
+CONOCIMIENTOS_PREFIXES = ("competencia", "conocimiento", "aprend", "habilidad")
+# preguntas que necesitan argumentos que el router no rellena (comparaciones, créditos)
+FALLBACK_PREFIXES = ("compar", "diferencia", "comun", "credito", "ects", "vs")
+
+ORDINALS = {
+    "primero": 1, "primer": 1, "1o": 1, "segundo": 2, "2o": 2, "tercero": 3, "tercer": 3, "3o": 3,
+    "cuarto": 4, "4o": 4, "quinto": 5, "5o": 5, "sexto": 6, "6o": 6,
+}
+
+# palabras que no pueden empezar ni terminar el nombre de un grado
+FILLER = STOPWORDS | {
+    "al", "ano", "carrera", "como", "cual", "cuales", "curso", "da", "dan", "estudia", "estudiar", "estudio",
+    "estudiando", "hay", "me", "mi", "o", "por", "puedo", "que", "quiero", "saber", "se", "si", "sobre", "son",
+    "su", "sus", "tiene", "tienen", "un", "una", "ve", "ven",
+}
+
+_word_re = re.compile(r"\w+")
+
+
+def _words(text):
+    """Palabras del mensaje: (original, normalizada)."""
+    return [(w, normalize(w)) for w in _word_re.findall(text)]
+
+
+def _has(words, prefixes):
+    return [i for i, (_, w) in enumerate(words) if w.startswith(prefixes)]
+
+
+def find_degree(words, resolver, skip=()):
+    """
+    Tramo de palabras más largo que el resolvedor reconoce como grado (todas sus palabras casan con
+    puntuación >= ROUTER_MIN_SCORE). Devuelve (inicio, fin) o None.
+    """
+    n = len(words)
+    for length in range(min(n, ROUTER_MAX_SPAN), 0, -1):
+        best = None
+        for start in range(n - length + 1):
+            end = start + length
+            if any(i in skip for i in range(start, end)):
+                continue
+            if words[start][1] in FILLER or words[end - 1][1] in FILLER:
+                continue
+            if any(w in ORDINALS for _, w in words[start:end]):
+                continue
+            matches = resolver.resolve(" ".join(w for w, _ in words[start:end]), allow_partial=False)
+            if matches and matches[0][1] >= ROUTER_MIN_SCORE and (best is None or matches[0][1] > best[0]):
+                best = (matches[0][1], start, end)
+        if best:
+            return best[1], best[2]
+    return None
+
+
+def find_degrees(message, resolver=None):
+    """Títulos de todos los grados que nombra el mensaje (cada tramo que reconoce find_degree)."""
+    words = _words(message)
+    resolver = resolver or registry.get("degree_resolver")
+    titles, skip = set(), set()
+    while (degree_span := find_degree(words, resolver, skip=skip)) is not None:
+        skip |= set(range(*degree_span))
+        degree = " ".join(w for w, _ in words[degree_span[0]:degree_span[1]])
+        titles.update(resolver.resolve_titles(degree, allow_partial=False))
+    return frozenset(titles)
+
+
+def route(message, resolver=None):
+    """Tool call ({"name", "args"}) para el mensaje si la intención y el grado están claros; None si no."""
+    words = _words(message)
+    if not words or _has(words, FALLBACK_PREFIXES):
+        return None
+    resolver = resolver or registry.get("degree_resolver")
+
+    degree_span = find_degree(words, resolver)
+    if degree_span is None:
+        return None
+    inside = set(range(*degree_span))
+    # otro grado en el mensaje (comparación implícita): mejor que decida el LLM
+    if find_degree(words, resolver, skip=inside):
+        return None
+    degree = " ".join(w for w, _ in words[degree_span[0]:degree_span[1]])
+
+    # las palabras del nombre del grado no cuentan como intención ("Trabajo Social")
+    intents = {
+        name: [i for i in _has(words, prefixes) if i not in inside]
+        for name, prefixes in [("subjects", SUBJECT_PREFIXES), ("salidas", SALIDAS_PREFIXES),
+                               ("conocimientos", CONOCIMIENTOS_PREFIXES)]
+    }
+    intents = [name for name, positions in intents.items() if positions]
+    if len(intents) != 1:
+        return None
+
+    if intents[0] == "subjects":
+        args = {"query": degree}
+        years = {ORDINALS[w] for _, w in words if w in ORDINALS}
+        if len(years) > 1:
+            return None
+        if years:
+            args["year"] = years.pop()
+        return {"name": "retrieve_subjects", "args": args}
+
+    section = "salidas_profesionales" if intents[0] == "salidas" else "conocimientos"
+    return {"name": "retrieve_docs", "args": {"query": message, "degree": degree, "section": section}}
+
+
+def _route_state(state: AgentState):
+    last = state.messages[-1]
+    if not isinstance(last, HumanMessage):
+        return {}
+    with span("router"):
+        call = route(str(last.content))
+    if call is None:
+        debug("ROUTER: sin decisión, pasa al LLM")
+        return {}
+    debug("ROUTER:", call)
+    return {"messages": [AIMessage(content="", tool_calls=[{**call, "id": f"call_{uuid.uuid4().hex[:24]}"}])]}
+
+
+def router_node(state: AgentState):
+    """Nodo router: emite la tool call si la pregunta es clara; si no, no cambia el estado."""
+    return _route_state(state)
+
+
+async def arouter_node(state: AgentState):
+    # el resolvedor se carga en el primer uso (catálogo, índice léxico): fuera del event loop
+    return await run_blocking(_route_state, state)
+
+
+def after_router(state: AgentState):
+    """Si el router ha emitido una tool call se ejecuta directamente; si no, decide el agente."""
+    last = state.messages[-1]
+    return "tools" if isinstance(last, AIMessage) and last.tool_calls else "agent"
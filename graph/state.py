@@ -15,6 +15,10 @@ class AgentState(BaseModel):
     cómo debe combinar este campo cuando varios nodos producen mensajes.
     En concreto, `add_messages` define que los mensajes nuevos se agregan
     a la lista existente en lugar de sobrescribirla.
+
+    `summary` guarda el resumen acumulado de los turnos antiguos que el nodo
+    `summarize` ha eliminado de `messages` (vacío si no se usa).
     """
     messages: Annotated[List[BaseMessage], add_messages]
+    summary: str = ""
 
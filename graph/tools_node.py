@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from langchain_core.messages import ToolMessage
+from langgraph.config import get_stream_writer
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE, msg_content_output
+
+from graph.state import AgentState
+from tools.degree_resolver import normalize
+from tools.executor import map_blocking
+from tools.tracing import span
+
+"""
+Nodo de herramientas propio en lugar del ToolNode prebuilt de langgraph. Mismo contrato: lee las tool calls del
+último AIMessage y devuelve un ToolMessage por llamada, en el mismo orden. Además:
+- las llamadas de un mismo paso se ejecutan a la vez en el pool acotado de tools/executor.py
+  (con varias tool calls, "asignaturas de A y de B + salidas de C", el tiempo es el de la más lenta)
+- los resultados se memorizan por hilo de conversación con la clave (herramienta, argumentos normalizados):
+  una llamada repetida en otro turno del mismo hilo, o dos iguales en el mismo paso, se ejecutan una vez
+- se registra la latencia de cada herramienta (tool_stats) y cada ejecución es un tramo de la traza (tools/tracing.py)
+Con stream_mode "custom" (/chat/stream) emite un evento tool_start al lanzar cada herramienta y tool_end al terminar.
+Un error en una herramienta se devuelve como ToolMessage con status="error" para que el resto de llamadas
+del paso sigan adelante y el LLM pueda corregir los argumentos.
+"""
+
+TOOL_MEMO = os.getenv("TOOL_MEMO", "1") == "1"                        #memorizar resultados por hilo de conversación
+TOOL_MEMO_THREADS = int(os.getenv("TOOL_MEMO_THREADS", "1000"))       #hilos con resultados memorizados (LRU)
+TOOL_MEMO_TTL = float(os.getenv("TOOL_MEMO_TTL", "900"))              #segundos que vale un resultado memorizado
+
+
+class ToolMemo:
+    """Resultados de herramientas por hilo: LRU de hilos y caducidad por entrada."""
+
+    def __init__(self, max_threads=TOOL_MEMO_THREADS, ttl=TOOL_MEMO_TTL):
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self._threads = OrderedDict()  # thread_id -> {clave: (instante, contenido)}
+        self._lock = threading.Lock()
+
+    def get(self, thread_id, key):
+        with self._lock:
+            entries = self._threads.get(thread_id)
+            if entries is None:
+                return None
+            self._threads.move_to_end(thread_id)
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del entries[key]
+                return None
+            return entry[1]
+
+    def put(self, thread_id, key, content):
+        with self._lock:
+            entries = self._threads.setdefault(thread_id, {})
+            self._threads.move_to_end(thread_id)
+            entries[key] = (time.monotonic(), content)
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+
+    def clear(self):
+        """Olvida todo (por ejemplo tras una re-ingesta)."""
+        with self._lock:
+            self._threads.clear()
+
+
+class ToolLatencyStats:
+    """Latencia por herramienta (solo ejecuciones reales) y aciertos de la memoización."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools = {}
+
+    def record(self, name, seconds=None, memo_hit=False, error=False):
+        with self._lock:
+            stats = self._tools.setdefault(name, {"calls": 0, "memo_hits": 0, "errors": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            if memo_hit:
+                stats["memo_hits"] += 1
+                return
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["last"] = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    "calls": s["calls"],
+                    "memo_hits": s["memo_hits"],
+                    "errors": s["errors"],
+                    "mean_ms": 1000 * s["total"] / s["calls"] if s["calls"] else 0.0,
+                    "max_ms": 1000 * s["max"],
+                    "last_ms": 1000 * s["last"],
+                }
+                for name, s in self._tools.items()
+            }
+
+
+tool_memo = ToolMemo()
+tool_stats = ToolLatencyStats()
+
+
+def _normalize_value(value):
+    if isinstance(value, str):
+        return " ".join(normalize(value).split())
+    if isinstance(value, dict):
+        return {k: _normalize_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(v) for v in value]
+    return value
+
+
+def _no_writer(event):
+    pass
+
+
+def stream_writer():
+    """Writer del modo "custom" de langgraph (eventos de progreso de /chat/stream); no hace nada fuera de un grafo."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return _no_writer
+
+
+def tool_event(kind, call, **extra):
+    return {"type": kind, "name": call["name"], "id": call["id"], **extra}
+
+
+class ToolsNode:
+    """Ejecuta las tool calls del último mensaje del agente (ver docstring del módulo)."""
+
+    def __init__(self, tools, memo=None, stats=None):
+        self.tools = {tool.name: tool for tool in tools}
+        self.memo = memo if memo is not None else (tool_memo if TOOL_MEMO else None)
+        self.stats = stats or tool_stats
+
+    def memo_key(self, call):
+        """(herramienta, argumentos con los valores por defecto del schema, sin tildes/mayúsculas/espacios de más)."""
+        args = call["args"]
+        tool = self.tools.get(call["name"])
+        schema = getattr(tool, "args_schema", None)
+        if isinstance(schema, type) and hasattr(schema, "model_validate"):
+            try:
+                args = schema.model_validate(args).model_dump()
+            except Exception:
+                pass
+        return call["name"] + ":" + json.dumps(_normalize_value(args), sort_keys=True, ensure_ascii=False, default=str)
+
+    def _plan(self, state, config, writer):
+        """Llamadas del último mensaje, cuáles hay que ejecutar (una por clave) y cuáles ya están memorizadas."""
+        calls = state.messages[-1].tool_calls
+        thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+        keys = [self.memo_key(call) for call in calls]
+
+        results = {}   # clave -> (contenido, status)
+        pending = {}   # clave -> primera llamada con esa clave
+        for call, key in zip(calls, keys):
+            if key in results or key in pending:
+                continue
+            cached = self.memo.get(thread_id, key) if self.memo is not None and thread_id else None
+            if cached is not None:
+                results[key] = (cached, "success")
+                self.stats.record(call["name"], memo_hit=True)
+                writer(tool_event("tool_start", call, args=call["args"]))
+                writer(tool_event("tool_end", call, status="success", ms=0.0, cached=True))
+            else:
+                pending[key] = call
+                writer(tool_event("tool_start", call, args=call["args"]))
+        return calls, keys, thread_id, results, pending
+
+    def _finish(self, call, key, thread_id, output, seconds, results):
+        if isinstance(output, Exception):
+            self.stats.record(call["name"], seconds, error=True)
+            results[key] = (TOOL_CALL_ERROR_TEMPLATE.format(error=repr(output)), "error")
+            return
+        self.stats.record(call["name"], seconds)
+        content = msg_content_output(output)
+        results[key] = (content, "success")
+        if self.memo is not None and thread_id:
+            self.memo.put(thread_id, key, content)
+
+    def _messages(self, calls, keys, results):
+        return {"messages": [
+            ToolMessage(content=results[key][0], name=call["name"], tool_call_id=call["id"], status=results[key][1])
+            for call, key in zip(calls, keys)
+        ]}
+
+    def _invoke(self, call, writer=_no_writer):
+        start = time.perf_counter()
+        tool = self.tools.get(call["name"])
+        try:
+            if tool is None:
+                raise ValueError(f"{call['name']} is not a valid tool, try one of [{', '.join(self.tools)}].")
+            with span(f"tool.{call['name']}"):
+                output = tool.invoke(call["args"])
+        except Exception as e:
+            output = e
+        return self._done(call, output, time.perf_counter() - start, writer)
+
+    async def _ainvoke(self, call, writer=_no_writer):
+        start = time.perf_counter()
+        tool = self.tools.get(call["name"])
+        try:
+            if tool is None:
+                raise ValueError(f"{call['name']} is not a valid tool, try one of [{', '.join(self.tools)}].")
+            # la coroutine de cada herramienta lanza el trabajo bloqueante en el pool acotado
+            with span(f"tool.{call['name']}"):
+                output = await tool.ainvoke(call["args"])
+        except Exception as e:
+            output = e
+        return self._done(call, output, time.perf_counter() - start, writer)
+
+    @staticmethod
+    def _done(call, output, seconds, writer):
+        status = "error" if isinstance(output, Exception) else "success"
+        writer(tool_event("tool_end", call, status=status, ms=round(1000 * seconds, 1), cached=False))
+        return output, seconds
+
+    def invoke(self, state: AgentState, config=None):
+        with span("tools"):
+            writer = stream_writer()
+            calls, keys, thread_id, results, pending = self._plan(state, config, writer)
+            items = list(pending.items())
+            if len(items) == 1:
+                outputs = [self._invoke(items[0][1], writer)]
+            else:
+                outputs = map_blocking(partial(self._invoke, writer=writer), [call for _, call in items])
+            for (key, call), (output, seconds) in zip(items, outputs):
+                self._finish(call, key, thread_id, output, seconds, results)
+            return self._messages(calls, keys, results)
+
+    async def ainvoke(self, state: AgentState, config=None):
+        with span("tools"):
+            writer = stream_writer()
+            calls, keys, thread_id, results, pending = self._plan(state, config, writer)
+            items = list(pending.items())
+            outputs = await asyncio.gather(*[self._ainvoke(call, writer) for _, call in items])
+            for (key, call), (output, seconds) in zip(items, outputs):
+                self._finish(call, key, thread_id, output, seconds, results)
+            return self._messages(calls, keys, results)
@@ -1,8 +1,11 @@
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableLambda
 from graph.state import AgentState
-from graph.nodes import agent_node
+from graph.checkpointer import build_checkpointer
+from graph.nodes import agent_node, aagent_node, summarize_node, asummarize_node
+from graph.context import CONTEXT_SUMMARY
+from graph.tools_node import ToolsNode
+from graph.router import ROUTER, router_node, arouter_node, after_router
 from tools.tool_definition import tools
 
 def build_graph():
@@ -14,14 +17,34 @@ def build_graph():
     workflow = StateGraph(AgentState)
 
     # Nodo principal del agente: llama al LLM y decide qué hacer.
-    workflow.add_node("agent", agent_node)
+    # Se registra con su versión síncrona y asíncrona: invoke/stream usan agent_node
+    # y ainvoke/astream (los que usa la API) usan aagent_node.
+    workflow.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node, name="agent"))
 
     # Nodo de herramientas: ejecuta las tool calls que el LLM solicite.
-    # ToolNode es un nodo pre-generado que proporcionalanggraph que sabe cómo invocar herramientas.
-    workflow.add_node("tools", ToolNode(tools))
+    # Sustituye al ToolNode prebuilt de langgraph con el mismo formato de mensajes: ejecuta las llamadas
+    # de un paso en paralelo, memoriza resultados por hilo y mide la latencia de cada herramienta
+    # (ver graph/tools_node.py). En modo asíncrono usa la coroutine de cada herramienta (ver tool_definition.py).
+    tools_node = ToolsNode(tools)
+    workflow.add_node("tools", RunnableLambda(tools_node.invoke, afunc=tools_node.ainvoke, name="tools"))
 
     # El punto de entrada del grafo es el nodo "agent".
-    workflow.set_entry_point("agent")
+    # Con ROUTER=1 se pasa antes por "router", que con preguntas claras emite la tool call sin llamar al LLM
+    # y salta directamente a "tools" (ver graph/router.py); si no está seguro sigue hacia "agent".
+    entry = "agent"
+    if ROUTER:
+        workflow.add_node("router", RunnableLambda(router_node, afunc=arouter_node, name="router"))
+        workflow.add_conditional_edges("router", after_router)
+        entry = "router"
+
+    # Con CONTEXT_SUMMARY=1 se pasa antes por "summarize", que resume los turnos antiguos
+    # cuando la conversación es larga (solo al entrar un mensaje nuevo, no tras cada herramienta).
+    if CONTEXT_SUMMARY:
+        workflow.add_node("summarize", RunnableLambda(summarize_node, afunc=asummarize_node, name="summarize"))
+        workflow.set_entry_point("summarize")
+        workflow.add_edge("summarize", entry)
+    else:
+        workflow.set_entry_point(entry)
 
     # Condición que decide si el flujo va a herramientas o termina.
     # Si el último mensaje del agente contiene tool_calls → ir a "tools".
@@ -36,9 +59,10 @@ def build_graph():
     # Después de ejecutar herramientas, volvemos al agente para procesar la respuesta.
     workflow.add_edge("tools", "agent")
 
-    # MemorySaver permite que el grafo mantenga checkpoints del estado.
+    # El checkpointer permite que el grafo mantenga checkpoints del estado.
     # Esto permite reanudar conversaciones o inspeccionar pasos previos.
-    checkpointer = MemorySaver()
+    # Por defecto es SQLite (acotado y compartido entre workers), ver graph/checkpointer.py.
+    checkpointer = build_checkpointer()
 
     # Compilamos el grafo con el checkpointer activado.
     return workflow.compile(checkpointer=checkpointer)
@@ -0,0 +1,47 @@
+import os
+import json
+import time
+import argparse
+from glob import glob
+
+from dotenv import load_dotenv
+
+from tools.catalogue import write_catalogue, CATALOGUE_FILE
+
+"""
+Compila los JSON de grados (salida de extract_pdf_data) en el catálogo binario que abre retrieve_subjects
+con mmap (tools/catalogue.py). Solo se guardan títulos, cursos, asignaturas y créditos.
+
+Uso (desde la raíz del repositorio):
+    python -m ingestion.compile_catalogue
+    python -m ingestion.compile_catalogue --json-dir filtered_output --output filtered_output/subjects_catalogue.bin
+"""
+
+load_dotenv()
+
+JSON_DIR = os.getenv("PATH_DICT_SUBJECTS", "filtered_output")  # carpeta con los JSON de grados
+
+
+def main(json_dir=JSON_DIR, output=None):
+    output = output or os.getenv("CATALOGUE_PATH") or os.path.join(json_dir, CATALOGUE_FILE)
+    start = time.perf_counter()
+
+    data_list = []
+    for path in sorted(glob(f"{json_dir}/*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # solo lo que usa retrieve_subjects
+        data_list.append({"degree_title": data["degree_title"], "plan_estudios": data["plan_estudios"]})
+
+    write_catalogue(data_list, output)
+    size = os.path.getsize(output)
+    print(f"Catálogo compilado: {len(data_list)} grados, {size / 1024:.1f} KB en {output} "
+          f"({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compila el catálogo de asignaturas")
+    parser.add_argument("--json-dir", default=JSON_DIR)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    main(args.json_dir, args.output)
@@ -1,9 +1,12 @@
 import os
 import json
 import re
+import time
+import argparse
+import hashlib
 import pdfplumber
-import tabula
 from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 """
 extraer información de los pdfs de modo que se guarde un json por pdf con la estructura:
@@ -23,7 +26,7 @@ extraer información de los pdfs de modo que se guarde un json por pdf con la es
 # ---------------------------------------------------------
 PDF_DIR = "filtered"              # Carpeta donde están los PDFs filtrados
 OUTPUT_DIR = "filtered_output"    # Carpeta donde guardaremos los JSON
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+MANIFEST_FILE = ".extract_manifest.json"  # mtime/tamaño/hash de cada PDF ya procesado (dentro de OUTPUT_DIR)
 
 
 # ---------------------------------------------------------
@@ -34,14 +37,42 @@ def clean(text):
     return text.replace("\n", " ").strip()
 
 
+class PageLayout:
+    """
+    Caracteres de una página leídos una sola vez y agrupados por línea (coordenada Y redondeada).
+    Los extractores de secciones reutilizan esta agrupación en lugar de recorrer page.chars cada uno.
+    """
+
+    def __init__(self, page):
+        self.width = page.width
+        self.chars = page.chars
+        self._rows = {}
+
+    def rows(self, precision=1):
+        """Lista de (y, caracteres ordenados por x0) de arriba a abajo. Se calcula una vez por precisión."""
+        if precision not in self._rows:
+            lines = {}
+            for c in self.chars:
+                lines.setdefault(round(c["top"], precision), []).append(c)
+            self._rows[precision] = [
+                (y, sorted(lines[y], key=lambda c: c["x0"])) for y in sorted(lines.keys())
+            ]
+        return self._rows[precision]
+
+
+def as_layout(page):
+    return page if isinstance(page, PageLayout) else PageLayout(page)
+
+
 # ---------------------------------------------------------
 # 1. EXTRAER LÍNEAS DE TEXTO AGRUPADAS POR ALTURA (Y)
 # ---------------------------------------------------------
 def extract_lines(page):
     """
     Agrupa caracteres por su posición vertical (top) para reconstruir líneas.
+    Respeta el orden en que aparecen los caracteres en el PDF.
     """
-    chars = page.chars
+    chars = as_layout(page).chars
     lines = []
 
     for y, line_chars in groupby(chars, key=lambda c: round(c["top"], 1)):
@@ -62,17 +93,8 @@ def extract_lines_with_font_sizes(page):
     Devuelve una lista de tuplas (texto, tamaño de fuente promedio)
     ordenadas de arriba a abajo.
     """
-    chars = page.chars
-    lines = {}
-
-    # Agrupar por coordenada Y
-    for c in chars:
-        y = round(c["top"], 1)
-        lines.setdefault(y, []).append(c)
-
     results = []
-    for y in sorted(lines.keys()):
-        line_chars = sorted(lines[y], key=lambda c: c["x0"])
+    for y, line_chars in as_layout(page).rows(1):
         text = "".join(c["text"] for c in line_chars).strip()
         if not text:
             continue
@@ -179,31 +201,22 @@ def extract_lines_two_columns(page):
     """
     Divide la página en dos columnas y reconstruye las líneas de cada una.
     """
-    width = page.width
-    mid_x = width / 2
+    layout = as_layout(page)
+    mid_x = layout.width / 2
 
-    left_chars = []
-    right_chars = []
+    left_lines = []
+    right_lines = []
 
-    # Separar caracteres por columna
-    for c in page.chars:
-        (left_chars if c["x0"] < mid_x else right_chars).append(c)
+    # Separar cada línea por columna
+    for y, line_chars in layout.rows(2):
+        left = "".join(c["text"] for c in line_chars if c["x0"] < mid_x).strip()
+        right = "".join(c["text"] for c in line_chars if c["x0"] >= mid_x).strip()
+        if left:
+            left_lines.append(left)
+        if right:
+            right_lines.append(right)
 
-    def build_lines(chars):
-        lines = {}
-        for c in chars:
-            y = round(c["top"], 2)
-            lines.setdefault(y, []).append(c)
-
-        ordered = []
-        for y in sorted(lines.keys()):
-            line_chars = sorted(lines[y], key=lambda c: c["x0"])
-            text = "".join(c["text"] for c in line_chars).strip()
-            if text:
-                ordered.append(text)
-        return ordered
-
-    return build_lines(left_chars) + build_lines(right_chars)
+    return left_lines + right_lines
 
 
 def remove_heading_line(text, phrase):
@@ -235,37 +248,23 @@ def extract_sections(page):
 
 
 # ---------------------------------------------------------
-# 5. BUCLE PRINCIPAL: PROCESAR TODOS LOS PDFs
+# 5. PROCESAR UN PDF
 # ---------------------------------------------------------
-for pdf_file in os.listdir(PDF_DIR):
-    if not pdf_file.endswith(".pdf"):
-        continue
-
-    pdf_path = os.path.join(PDF_DIR, pdf_file)
-    print(f"Processing {pdf_file}")
-
+def extract_pdf(pdf_path):
+    """Devuelve el diccionario con la información de un díptico."""
     with pdfplumber.open(pdf_path) as pdf:
-        page1 = pdf.pages[0]
-        page2 = pdf.pages[1]
-        page3 = pdf.pages[2]
-
-        # Extraer líneas con tamaños de fuente
-        lines_page1 = extract_lines_with_font_sizes(page1)
-        lines_page3 = extract_lines_with_font_sizes(page3)
-
-        # Extraer texto normal
-        page2_text = page2.extract_text()
-        page3_text = page3.extract_text()
+        page1 = PageLayout(pdf.pages[0])
+        page2 = PageLayout(pdf.pages[1])
+        page3 = PageLayout(pdf.pages[2])
 
     # Extraer información del grado
-    degree_title, degree_type, faculties = extract_degree_info(lines_page1)
+    degree_title, degree_type, faculties = extract_degree_info(extract_lines_with_font_sizes(page1))
     conocimientos, salidas = extract_sections(page3)
 
     # Extraer plan de estudios
     plan_estudios = extract_plan_estudios(page2)
 
-    # Construir JSON final
-    data = {
+    return {
         "degree_title": degree_title,
         "degree_type": degree_type,
         "faculties": faculties,
@@ -274,9 +273,117 @@ for pdf_file in os.listdir(PDF_DIR):
         "salidas_profesionales": salidas
     }
 
-    # Guardar JSON
-    json_path = os.path.join(OUTPUT_DIR, pdf_file.replace(".pdf", ".json"))
+
+def process_pdf(pdf_path, json_path):
+    """Extrae un PDF y guarda su JSON. Se ejecuta en los procesos del pool."""
+    start = time.perf_counter()
+    data = extract_pdf(pdf_path)
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
+    return time.perf_counter() - start
 
-print("Done! JSON files saved.")
+
+# ---------------------------------------------------------
+# 6. DETECTAR PDFs SIN CAMBIOS
+# ---------------------------------------------------------
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def is_unchanged(pdf_path, json_path, entry):
+    """
+    Un PDF no se vuelve a procesar si su JSON existe y el PDF no ha cambiado desde que se escribió:
+    primero se compara mtime y tamaño (barato); si difieren, se compara el hash del contenido.
+    Devuelve (sin_cambios, entrada_actualizada).
+    """
+    stat = os.stat(pdf_path)
+    current = {"mtime": stat.st_mtime, "size": stat.st_size}
+    if not os.path.exists(json_path) or not entry:
+        return False, current
+    if entry.get("mtime") == current["mtime"] and entry.get("size") == current["size"]:
+        return True, entry
+    current["sha256"] = file_hash(pdf_path)
+    return entry.get("sha256") == current["sha256"], current
+
+
+# ---------------------------------------------------------
+# 7. PROCESAR TODOS LOS PDFs
+# ---------------------------------------------------------
+def extract_all(pdf_dir=PDF_DIR, output_dir=OUTPUT_DIR, workers=None, force=False):
+    """
+    Procesa todos los PDFs de pdf_dir en un pool de procesos y guarda un JSON por PDF en output_dir.
+    Los PDFs sin cambios desde la última ejecución se saltan (salvo force=True).
+    Devuelve un diccionario con los contadores de procesados, saltados y errores.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(output_dir)
+    new_manifest = {}
+
+    pending = []
+    skipped = 0
+    for pdf_file in sorted(os.listdir(pdf_dir)):
+        if not pdf_file.endswith(".pdf"):
+            continue
+        pdf_path = os.path.join(pdf_dir, pdf_file)
+        json_path = os.path.join(output_dir, pdf_file.replace(".pdf", ".json"))
+
+        unchanged, entry = is_unchanged(pdf_path, json_path, manifest.get(pdf_file))
+        if unchanged:
+            new_manifest[pdf_file] = entry
+            skipped += 1
+            continue
+        pending.append((pdf_file, pdf_path, json_path, entry))
+
+    print(f"{len(pending)} PDFs to process, {skipped} unchanged")
+
+    errors = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_pdf, pdf_path, json_path): (pdf_file, pdf_path, entry)
+                   for pdf_file, pdf_path, json_path, entry in pending}
+        for future in as_completed(futures):
+            pdf_file, pdf_path, entry = futures[future]
+            try:
+                seconds = future.result()
+            except Exception as e:
+                errors += 1
+                print(f"Error processing {pdf_file}: {e}")
+                continue
+            print(f"Processed {pdf_file} ({seconds:.2f}s)")
+            entry.setdefault("sha256", file_hash(pdf_path))
+            new_manifest[pdf_file] = entry
+
+    save_manifest(output_dir, new_manifest)
+    elapsed = time.perf_counter() - start
+    print(f"Done! {len(pending) - errors} JSON files saved in {elapsed:.1f}s ({errors} errors).")
+    return {"processed": len(pending) - errors, "skipped": skipped, "errors": errors, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrae la información de los dípticos en PDF a JSON.")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="procesos del pool (por defecto, núcleos de la CPU)")
+    parser.add_argument("--force", action="store_true", help="reprocesar aunque el PDF no haya cambiado")
+    args = parser.parse_args()
+    extract_all(args.pdf_dir, args.output_dir, args.workers, args.force)
@@ -1,46 +1,260 @@
-from openai import OpenAI
-from dotenv import load_dotenv 
+import argparse
+import asyncio
+import json
 import os
+import random
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from tools.chunking import chunk_spans
+
+"""
+Generación de pares pregunta-respuesta a partir de la transcripción de un audio, en formato qa.json (el que lee
+ingest_data.load_qa). Antes se mandaba la transcripción entera en una sola llamada a gpt-4o-mini y se devolvía
+el texto tal cual, que no siempre era JSON válido; con transcripciones largas la respuesta se cortaba.
+
+Ahora es un map-reduce:
+- map: la transcripción se parte en ventanas con solape y cada ventana se manda en una llamada asíncrona,
+  con un máximo de llamadas simultáneas, un límite de peticiones por minuto y reintentos con espera exponencial
+- cada respuesta está restringida a un JSON schema (response_format) y se valida; si no cumple se reintenta
+- reduce: los pares de todas las ventanas se deduplican por similitud de embeddings de la pregunta
+  (las ventanas se solapan y el vídeo repite preguntas) y se escriben en qa.json
+
+Funciona con cualquier servidor compatible con la API de OpenAI (OPENAI_BASE_URL); en benchmarks/fake_openai.py
+hay uno local para probarlo sin clave.
+"""
 
 load_dotenv()
-OPEN_AI_KEY =os.getenv("OPENAI_API_KEY")
+OPEN_AI_KEY = os.getenv("OPENAI_API_KEY")
 
-client = OpenAI(api_key=OPEN_AI_KEY)
+QA_MODEL = os.getenv("QA_MODEL", "gpt-4o-mini")                              # modelo que genera los pares
+QA_EMBED_MODEL = os.getenv("QA_EMBED_MODEL", "text-embedding-3-small")       # embeddings para deduplicar
+QA_WINDOW_TOKENS = int(os.getenv("QA_WINDOW_TOKENS", "800"))                 # tokens de transcripción por llamada
+QA_WINDOW_OVERLAP = int(os.getenv("QA_WINDOW_OVERLAP", "80"))                # solape entre ventanas
+QA_CONCURRENCY = int(os.getenv("QA_CONCURRENCY", "8"))                       # llamadas simultáneas
+QA_REQUESTS_PER_MINUTE = int(os.getenv("QA_REQUESTS_PER_MINUTE", "300"))     # límite de peticiones por minuto
+QA_MAX_RETRIES = int(os.getenv("QA_MAX_RETRIES", "5"))                       # reintentos por ventana
+QA_DEDUP_THRESHOLD = float(os.getenv("QA_DEDUP_THRESHOLD", "0.9"))           # similitud coseno a partir de la que dos preguntas son la misma
 
+SYSTEM_PROMPT = "You extract clear questions and answers from transcripts."
 
-def generate_qa_from_transcript(file_path):
-    # Load the transcription text
-    with open(file_path, "r", encoding="utf-8") as f:
-        transcript = f.read()
+USER_PROMPT = """
+Here is a fragment of the transcription of a Q&A video about the degree "{degree}".
+Generate the questions that are answered in this fragment with their answers, in Spanish.
+Only include questions that are actually answered in the fragment.
+
+TRANSCRIPT FRAGMENT:
+{window}
+"""
 
-    # Send to OpenAI
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "You extract clear questions and answers from transcripts."
+QA_SCHEMA = {
+    "name": "qa_pairs",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "pairs": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "question": {"type": "string"},
+                        "answer": {"type": "string"},
+                    },
+                    "required": ["question", "answer"],
+                    "additionalProperties": False,
+                },
             },
-            {
-                "role": "user",
-                "content": f"""
-                Here is a transcription of a Q&A video.
-                Please generate a clean list of questions and answers based on the content.
-                give the output in JSON fotmat {{"question": "", "answer":""\}}
+        },
+        "required": ["pairs"],
+        "additionalProperties": False,
+    },
+}
+
+
+class InvalidOutput(Exception):
+    """La respuesta del modelo no cumple el schema."""
+
+
+def get_client(**kwargs):
+    # import local: el cliente asíncrono solo hace falta al generar preguntas.
+    # Los reintentos del SDK se desactivan: los gestiona generate_window junto con el límite de peticiones
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(**{"api_key": OPEN_AI_KEY, "max_retries": 0, **kwargs})
+
+
+def split_windows(transcript, window_tokens=QA_WINDOW_TOKENS, overlap=QA_WINDOW_OVERLAP):
+    """Ventanas de la transcripción, cortadas por frases (ver tools/chunking.py)."""
+    return [transcript[start:end] for start, end in chunk_spans(transcript, "sentence", window_tokens, overlap)]
+
+
+def parse_pairs(content):
+    """Valida la respuesta contra QA_SCHEMA y devuelve [{"question", "answer"}]."""
+    try:
+        data = json.loads(content or "")
+    except json.JSONDecodeError as e:
+        raise InvalidOutput(f"JSON no válido: {e}")
+    pairs = data.get("pairs") if isinstance(data, dict) else None
+    if not isinstance(pairs, list):
+        raise InvalidOutput("falta la lista 'pairs'")
+    result = []
+    for pair in pairs:
+        if not isinstance(pair, dict) or not isinstance(pair.get("question"), str) or not isinstance(pair.get("answer"), str):
+            raise InvalidOutput(f"par no válido: {pair!r}")
+        if pair["question"].strip() and pair["answer"].strip():
+            result.append({"question": pair["question"].strip(), "answer": pair["answer"].strip()})
+    return result
+
+
+class RateLimiter:
+    """Como mucho `per_minute` peticiones por minuto, repartidas de forma uniforme."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
 
-                TRANSCRIPT:
-                {transcript}
-                """
-            }
-        ],
-        temperature=0.3
-    )
 
-    return response.choices[0].message.content
+def _retryable(error):
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+    if isinstance(error, (InvalidOutput, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+async def generate_window(client, window, degree, limiter, semaphore, model=QA_MODEL,
+                          max_retries=QA_MAX_RETRIES, stats=None):
+    """Pares de una ventana; reintenta errores de red, 429, 5xx y respuestas fuera del schema."""
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PROMPT.format(degree=degree, window=window)},
+    ]
+    for attempt in range(max_retries + 1):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    response_format={"type": "json_schema", "json_schema": QA_SCHEMA},
+                )
+                return parse_pairs(response.choices[0].message.content)
+            except Exception as e:
+                if not _retryable(e) or attempt == max_retries:
+                    raise
+                if stats is not None:
+                    stats["retries"] = stats.get("retries", 0) + 1
+                error = e
+        # espera exponencial con jitter, fuera del semáforo para no bloquear otras ventanas
+        delay = min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+        print(f"  reintento {attempt + 1}/{max_retries} en {delay:.1f}s ({type(error).__name__})")
+        await asyncio.sleep(delay)
+
+
+async def embed_texts(client, texts, model=QA_EMBED_MODEL, batch_size=256):
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        response = await client.embeddings.create(model=model, input=texts[i:i + batch_size])
+        vectors.extend(item.embedding for item in response.data)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def deduplicate(pairs, embeddings, threshold=QA_DEDUP_THRESHOLD):
+    """Se queda con el primer par de cada grupo de preguntas con similitud coseno >= threshold."""
+    if not pairs:
+        return []
+    normed = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9)
+    kept = []
+    for i in range(len(pairs)):
+        if kept and float(np.max(normed[kept] @ normed[i])) >= threshold:
+            continue
+        kept.append(i)
+    return [pairs[i] for i in kept]
+
+
+async def agenerate_qa(transcript, degree, client=None, window_tokens=QA_WINDOW_TOKENS, overlap=QA_WINDOW_OVERLAP,
+                       concurrency=QA_CONCURRENCY, requests_per_minute=QA_REQUESTS_PER_MINUTE,
+                       threshold=QA_DEDUP_THRESHOLD, stats=None):
+    """
+    Map-reduce sobre la transcripción: devuelve pares {"question", "answer", "degree"} sin duplicados.
+    Una ventana que falla después de sus reintentos se anota y se omite; los pares del resto se devuelven igual.
+    """
+    client = client or get_client()
+    windows = split_windows(transcript, window_tokens, overlap)
+    limiter = RateLimiter(requests_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    print(f"Generando preguntas de {len(windows)} ventanas ({concurrency} llamadas simultáneas)...")
+
+    # map
+    results = await asyncio.gather(*[
+        generate_window(client, window, degree, limiter, semaphore, stats=stats) for window in windows
+    ], return_exceptions=True)
+    pairs, failed = [], 0
+    for i, result in enumerate(results):
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f"  ventana {i + 1}/{len(windows)} omitida ({type(result).__name__}: {result})")
+            continue
+        pairs.extend(result)
+
+    # reduce
+    unique = deduplicate(pairs, await embed_texts(client, [p["question"] for p in pairs]), threshold) if pairs else []
+    print(f"Pares generados: {len(pairs)} | sin duplicados: {len(unique)} | ventanas fallidas: {failed}")
+    if stats is not None:
+        stats.update(windows=len(windows), failed_windows=failed, pairs=len(pairs), unique=len(unique))
+    return [{**pair, "degree": degree} for pair in unique]
+
+
+def write_qa(pairs, path, append=True):
+    """
+    Escribe los pares en qa.json. Con append=True se conservan los pares que ya había y no se añaden
+    preguntas que ya existen (load_qa se quedaría con la primera de todos modos).
+    """
+    existing = []
+    if append and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            existing = json.load(f)
+    seen = {pair.get("question") for pair in existing}
+    merged = existing + [pair for pair in pairs if pair["question"] not in seen]
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return len(merged) - len(existing)
+
+
+def generate_qa_from_transcript(file_path, degree="Enfermería", **kwargs):
+    """Pares pregunta-respuesta de una transcripción (versión síncrona de agenerate_qa)."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        transcript = f.read()
+    return asyncio.run(agenerate_qa(transcript, degree, **kwargs))
 
 
 if __name__ == "__main__":
-    file_path = ""
-    qa_output = generate_qa_from_transcript(file_path)
-    print("\n=== GENERATED Q&A ===\n")
-    print(qa_output)
+    from ingestion.ingest_data import QA_FILE
+
+    parser = argparse.ArgumentParser(description="Genera pares pregunta-respuesta de una transcripción")
+    parser.add_argument("transcript", help="fichero de texto con la transcripción")
+    parser.add_argument("--degree", default="Enfermería", help="grado del que trata el audio")
+    parser.add_argument("--output", default=QA_FILE)
+    parser.add_argument("--concurrency", type=int, default=QA_CONCURRENCY)
+    parser.add_argument("--overwrite", action="store_true", help="sustituye el fichero en lugar de añadir")
+    args = parser.parse_args()
+
+    # Ejemplo de uso:
+    # python -m ingestion.generate_questions ingestion/data/transcription.txt --degree Enfermería
+    qa_pairs = generate_qa_from_transcript(args.transcript, args.degree, concurrency=args.concurrency)
+    added = write_qa(qa_pairs, args.output, append=not args.overwrite)
+    print(f"{added} pares nuevos escritos en {args.output}")
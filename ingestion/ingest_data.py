@@ -1,54 +1,74 @@
 import os
 import json
-import uuid
-import math
+import hashlib
+import argparse
+import time
 import chromadb
+import numpy as np
 from tqdm import tqdm
 from sentence_transformers import SentenceTransformer
 
-from pydub import AudioSegment
 import torch
-from qwen_asr import Qwen3ASRModel
+
+from embeddings.cache import EmbeddingCache, EMBED_CACHE_PATH
+from embeddings.model import EMBED_MODEL_NAME, embedding_signature, truncate
+from embeddings.quantization import EMBED_QUANTIZATION, KINDS, QUANTIZED_INDEX_DIR, QuantizedIndex
+from ingestion.transcribe import transcribe
+from tools.lexical_index import build_index, LEXICAL_INDEX_FILE
+from tools.chunking import chunk_spans, chunk_id, chunk_metadata
 
 
 # Rutas y nombres de archivos
 JSON_DIR = "filtered_output"      # Carpeta con los JSON generados desde los PDFs
 QA_FILE = "qa.json"               # Archivo con pares pregunta–respuesta
 CHROMA_PATH = "chroma_ucm"        # Carpeta donde se guardará la base vectorial
+INGEST_MARKER = "ingest_version.json"  # Marca de versión que lee la API para invalidar su caché de respuestas
 COLLECTION_NAME = "ucm_grados"    # Nombre de la colección en ChromaDB
 
-# Modelos utilizados
-AUDIO_MODEL_NAME = "Qwen/Qwen3-ASR-1.7B"          # Modelo de transcripción
-EMBED_MODEL_NAME = "Qwen/Qwen3-Embedding-4B"      # Modelo de embeddings
+# Modelos utilizados: el de embeddings (EMBED_MODEL_NAME, EMBED_DIM) se configura en embeddings/model.py
+LEGACY_EMBED_MODEL = "Qwen/Qwen3-Embedding-4B"    # modelo de las colecciones creadas antes de guardar la configuración
 
+# Configuración del cálculo de embeddings (se puede ajustar por variables de entorno)
+EMBED_DEVICE = os.getenv("EMBED_DEVICE", "auto")                  # auto | cuda | cuda:N | mps | cpu
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))       # textos por lote
+EMBED_MAX_BATCH_CHARS = int(os.getenv("EMBED_MAX_BATCH_CHARS", "60000"))  # tope de caracteres por lote (textos largos -> lotes pequeños)
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "0"))              # >1 lanza un pool multiproceso en CPU
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "512"))    # documentos por llamada a chroma
 
-def transcribe_audio(audio_path):
+
+def make_id(source_file, section, key=""):
     """
-    Divide el audio en fragmentos de 30 segundos, los transcribe con Qwen ASR
-    y devuelve un único texto concatenado.
+    Id determinista de un fragmento a partir de su fichero de origen y su sección
+    (y una clave extra cuando un mismo fichero/sección genera varios fragmentos).
+    Así una nueva ingesta actualiza el mismo documento en lugar de crear otro.
     """
-    audio = AudioSegment.from_file(audio_path)
-    chunk_ms = 30_000
-    chunks = math.ceil(len(audio) / chunk_ms)
+    raw = f"{source_file}::{section}::{key}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
-    model = Qwen3ASRModel.from_pretrained(
-        AUDIO_MODEL_NAME,
-        dtype=torch.bfloat16,
-        device_map="cuda:1",
-        max_new_tokens=512,
-    )
 
-    full_text = []
+def content_hash(text):
+    """Hash del contenido que se embebe; si no cambia, no hace falta recalcular el embedding."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
 
-    for i in range(chunks):
-        chunk = audio[i * chunk_ms : (i + 1) * chunk_ms]
-        chunk_path = f"/tmp/chunk_{i}.wav"
-        chunk.export(chunk_path, format="wav")
+def add_document(texts, metadatas, ids, doc_id, header, body, metadata):
+    """
+    Añade un documento partido en fragmentos (ver tools/chunking.py). Todos los fragmentos empiezan con la
+    cabecera (grado y sección) y guardan en los metadatos el id del documento, su posición y sus offsets en `body`.
+    """
+    spans = chunk_spans(body)
+    for i, (start, end) in enumerate(spans):
+        texts.append(header + body[start:end])
+        metadatas.append({**metadata, **chunk_metadata(doc_id, i, len(spans), start, end)})
+        ids.append(chunk_id(doc_id, i, len(spans)))
 
-        result = model.transcribe(chunk_path, language=None)
-        full_text.append(result[0].text)
 
-    return " ".join(full_text)
+def transcribe_audio(audio_path):
+    """
+    Transcribe el audio por ventanas solapadas de ASR_CHUNK_SECONDS, por lotes y con checkpoint
+    (ver ingestion/transcribe.py), y devuelve un único texto.
+    """
+    return transcribe(audio_path)
 
 
 def load_json_grados(texts, metadatas, ids):
@@ -73,28 +93,24 @@ def load_json_grados(texts, metadatas, ids):
         salidas = data.get("salidas_profesionales", "")
 
         # Texto para conocimientos
-        t1 = f"Conocimientos para el grado de {degree}: {conocimientos}"
-        texts.append(t1)
-        metadatas.append({
-            "degree": degree,
-            "type": degree_type,
-            "faculties": faculties,
-            "section": "conocimientos",
-            "source_file": file
-        })
-        ids.append(str(uuid.uuid4()))
+        add_document(texts, metadatas, ids, make_id(file, "conocimientos"),
+                     f"Conocimientos para el grado de {degree}: ", conocimientos, {
+                         "degree": degree,
+                         "type": degree_type,
+                         "faculties": faculties,
+                         "section": "conocimientos",
+                         "source_file": file
+                     })
 
         # Texto para salidas profesionales
-        t2 = f"Salidas profesionales para el grado de {degree}: {salidas}"
-        texts.append(t2)
-        metadatas.append({
-            "degree": degree,
-            "type": degree_type,
-            "faculties": faculties,
-            "section": "salidas_profesionales",
-            "source_file": file
-        })
-        ids.append(str(uuid.uuid4()))
+        add_document(texts, metadatas, ids, make_id(file, "salidas_profesionales"),
+                     f"Salidas profesionales para el grado de {degree}: ", salidas, {
+                         "degree": degree,
+                         "type": degree_type,
+                         "faculties": faculties,
+                         "section": "salidas_profesionales",
+                         "source_file": file
+                     })
 
 
 def load_qa(texts, metadatas, ids):
@@ -110,11 +126,17 @@ def load_qa(texts, metadatas, ids):
     with open(QA_FILE, "r", encoding="utf-8") as f:
         qa_pairs = json.load(f)
 
+    seen = set()
     for pair in qa_pairs:
         question = pair.get("question", "")
         answer = pair.get("answer", "")
         degree = pair.get("degree", "Enfermería")
 
+        # preguntas repetidas tendrían el mismo id; nos quedamos con la primera
+        if question in seen:
+            continue
+        seen.add(question)
+
         page = (
             f"Pregunta: {question}\n"
             f"Respuesta: {answer}\n"
@@ -124,83 +146,294 @@ def load_qa(texts, metadatas, ids):
         texts.append(page)
         metadatas.append({
             "degree": degree,
-            "section": "qa"
+            "section": "qa",
+            "source_file": QA_FILE
         })
-        ids.append(str(uuid.uuid4()))
+        # la pregunta identifica al par: si solo cambia la respuesta se actualiza el mismo documento
+        ids.append(make_id(QA_FILE, "qa", question))
 
 
 def load_audio(texts, metadatas, ids, audio_path):
     """
-    Transcribe un archivo de audio y lo añade como documento.
+    Transcribe un archivo de audio y lo añade como documento (en fragmentos).
     """
     print("Transcribiendo audio...")
     transcript = transcribe_audio(audio_path)
 
-    texts.append(f"Transcripción de audio: {transcript}")
-    metadatas.append({
+    add_document(texts, metadatas, ids, make_id(audio_path, "audio_transcript"), "Transcripción de audio: ", transcript, {
         "section": "audio_transcript",
         "source_file": audio_path
     })
-    ids.append(str(uuid.uuid4()))
 
 
-def generate_embeddings(texts):
+def pick_device(device=EMBED_DEVICE):
     """
-    Genera embeddings para todos los textos usando Qwen Embeddings.
+    Elige el dispositivo para el modelo de embeddings. Con "auto" usa la GPU si existe
+    (cuda o mps) y si no, CPU.
     """
-    print("Cargando modelo de embeddings...")
-    model = SentenceTransformer(EMBED_MODEL_NAME, device="cuda")
+    if device != "auto":
+        return device
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
 
-    embeddings = []
-    batch_size = 1
 
-    for i in tqdm(range(0, len(texts), batch_size), desc="Embedding"):
-        batch = texts[i : i + batch_size]
-        batch_embeddings = model.encode(batch)
-        embeddings.extend(batch_embeddings)
+def load_embedding_model(model_name=EMBED_MODEL_NAME, device=EMBED_DEVICE):
+    """
+    Carga el modelo de embeddings en el dispositivo elegido.
+    """
+    device = pick_device(device)
+    print(f"Cargando modelo de embeddings {model_name} en {device}...")
+    return SentenceTransformer(model_name, device=device)
 
-    return embeddings
 
+def make_batches(texts, batch_size=EMBED_BATCH_SIZE, max_batch_chars=EMBED_MAX_BATCH_CHARS):
+    """
+    Ordena los textos por longitud y los agrupa en lotes de longitud parecida para reducir el padding.
+    Cada lote tiene como mucho batch_size textos y max_batch_chars caracteres (salvo que un solo texto
+    ya los supere). Devuelve listas de índices sobre `texts`.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+
+    batches = []
+    current = []
+    current_chars = 0
+    for i in order:
+        length = len(texts[i])
+        if current and (len(current) >= batch_size or current_chars + length > max_batch_chars):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(i)
+        current_chars += length
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def iter_embeddings(texts, model, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS, cache=None):
+    """
+    Genera los embeddings por lotes y los va devolviendo (índices, embeddings) según se calculan,
+    para que el llamador los inserte en la base vectorial sin acumularlos todos en memoria.
+    Con workers > 1 reparte cada lote entre varios procesos de CPU.
+    Si se pasa una caché, los vectores calculados se guardan en ella.
+    """
+    pool = None
+    if workers > 1:
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
 
-def save_to_chroma(texts, metadatas, ids, embeddings):
+    try:
+        for indices in tqdm(make_batches(texts, batch_size), desc="Embedding"):
+            batch = [texts[i] for i in indices]
+            start = time.perf_counter()
+            if pool is not None:
+                batch_embeddings = model.encode(batch, pool=pool, batch_size=max(1, batch_size // workers))
+            else:
+                batch_embeddings = model.encode(batch, batch_size=batch_size, convert_to_numpy=True)
+            if cache is not None:
+                cache.store_encoded(batch, batch_embeddings, time.perf_counter() - start)
+            yield indices, batch_embeddings
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+
+def open_collection(reset=False):
     """
-    Crea una colección persistente en ChromaDB y añade todos los documentos.
+    Abre la colección persistente en ChromaDB, creándola si no existe.
+    Con reset=True se borra y se crea de cero (ingesta completa).
     """
-    print(f"Creando base de datos persistente en: {CHROMA_PATH}")
+    print(f"Abriendo base de datos persistente en: {CHROMA_PATH}")
     client = chromadb.PersistentClient(path=CHROMA_PATH)
+    signature = embedding_signature()
+
+    # los vectores de otro modelo o de otra dimensión no se pueden mezclar con los nuevos
+    if not reset:
+        try:
+            existing = client.get_collection(COLLECTION_NAME)
+        except Exception:
+            existing = None
+        if existing is not None:
+            metadata = existing.metadata or {}
+            stored = {"embed_model": metadata.get("embed_model", LEGACY_EMBED_MODEL),
+                      "embed_dim": metadata.get("embed_dim", 0)}
+            if stored != signature:
+                print(f"La colección se creó con {stored} y la configuración actual es {signature}: se reindexa todo")
+                reset = True
+
+    if reset:
+        try:
+            client.delete_collection(COLLECTION_NAME)
+        except:
+            pass
+
+    return client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata={"hnsw:space": "cosine", **signature}
+    )
 
-    try:
-        client.delete_collection(COLLECTION_NAME)
-    except:
-        pass
 
-    collection = client.create_collection(
-        name=COLLECTION_NAME,
-        metadata={"hnsw:space": "cosine"}
+def get_existing_hashes(collection, page_size=UPSERT_BATCH_SIZE):
+    """
+    Devuelve {id: content_hash} de todos los documentos ya guardados (sin traer embeddings ni textos).
+    """
+    existing = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+            existing[doc_id] = (metadata or {}).get("content_hash")
+        if len(page["ids"]) < page_size:
+            return existing
+        offset += page_size
+
+
+def diff_collection(collection, texts, metadatas, ids):
+    """
+    Compara los fragmentos actuales con los de la colección.
+    Devuelve (índices a embeber, ids obsoletos a borrar):
+    - nuevos o con contenido distinto -> se recalcula el embedding
+    - iguales -> no se tocan
+    - en la colección pero ya no en los datos -> se borran
+    """
+    existing = get_existing_hashes(collection)
+
+    pending = [i for i, doc_id in enumerate(ids) if existing.get(doc_id) != metadatas[i]["content_hash"]]
+    current = set(ids)
+    stale = [doc_id for doc_id in existing if doc_id not in current]
+
+    return pending, stale
+
+
+def delete_ids(collection, doc_ids):
+    """Borra documentos de la colección en lotes."""
+    for i in range(0, len(doc_ids), UPSERT_BATCH_SIZE):
+        collection.delete(ids=doc_ids[i : i + UPSERT_BATCH_SIZE])
+
+
+def upsert_batch(collection, texts, metadatas, ids, indices, embeddings):
+    """
+    Inserta o actualiza en la colección un lote de documentos ya embebidos (una sola llamada a chroma por lote).
+    Los vectores se truncan aquí a EMBED_DIM, así la caché de embeddings guarda siempre los completos.
+    """
+    collection.upsert(
+        embeddings=truncate(np.asarray(embeddings, dtype=np.float32)).tolist(),
+        documents=[texts[i] for i in indices],
+        metadatas=[metadatas[i] for i in indices],
+        ids=[ids[i] for i in indices]
     )
 
-    print("Insertando documentos...")
 
-    for i in tqdm(range(len(texts)), desc="Insertando"):
-        collection.add(
-            embeddings=[embeddings[i]],
-            documents=[texts[i]],
-            metadatas=[metadatas[i]],
-            ids=[ids[i]]
-        )
+def upsert_cached(collection, cache, texts, metadatas, ids, pending):
+    """
+    Sube directamente los fragmentos pendientes cuyo embedding ya está en la caché.
+    Devuelve los índices que siguen necesitando pasar por el modelo.
+    """
+    misses = []
+    for start in range(0, len(pending), UPSERT_BATCH_SIZE):
+        chunk = pending[start : start + UPSERT_BATCH_SIZE]
+        cached = cache.get_many([texts[i] for i in chunk])
+        hits = [(i, v) for i, v in zip(chunk, cached) if v is not None]
+        misses.extend(i for i, v in zip(chunk, cached) if v is None)
+        if hits:
+            upsert_batch(collection, texts, metadatas, ids, [i for i, _ in hits], [v for _, v in hits])
+    return misses
+
+
+def upsert_embeddings(collection, model, texts, metadatas, ids, pending, cache=None):
+    """
+    Calcula los embeddings de los fragmentos pendientes y los va subiendo a chroma en lotes grandes
+    (UPSERT_BATCH_SIZE) según se generan, sin acumularlos todos en memoria.
+    """
+    pending_texts = [texts[i] for i in pending]
+    buffer_indices, buffer_embeddings = [], []
 
-    print("Ingesta completada.")
-    print(f"Base de datos guardada en: {os.path.abspath(CHROMA_PATH)}")
+    for batch_indices, batch_embeddings in iter_embeddings(pending_texts, model, cache=cache):
+        buffer_indices.extend(pending[i] for i in batch_indices)
+        buffer_embeddings.extend(batch_embeddings)
+        if len(buffer_indices) >= UPSERT_BATCH_SIZE:
+            upsert_batch(collection, texts, metadatas, ids, buffer_indices, buffer_embeddings)
+            buffer_indices, buffer_embeddings = [], []
+
+    if buffer_indices:
+        upsert_batch(collection, texts, metadatas, ids, buffer_indices, buffer_embeddings)
 
 
-def main(audio=False, audio_path=None):
+def save_lexical_index(texts, metadatas, ids, updated, deleted):
+    """
+    Índice BM25 sobre los mismos fragmentos que chroma (retrieve_docs lo usa en la búsqueda híbrida).
+    Se reconstruye entero porque es barato; solo si la colección ha cambiado o el índice no existe.
+    """
+    path = os.path.join(CHROMA_PATH, LEXICAL_INDEX_FILE)
+    if not updated and not deleted and os.path.exists(path):
+        return
+    build_index(texts, metadatas, ids).save(path)
+    print(f"Índice léxico guardado en: {path}")
+
+
+def read_embeddings(collection, page_size=UPSERT_BATCH_SIZE):
+    """(ids, metadatos, vectores) de todos los documentos de la colección, leídos por páginas."""
+    ids, metadatas, vectors = [], [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        ids.extend(page["ids"])
+        metadatas.extend(page["metadatas"])
+        vectors.extend(page["embeddings"])
+        if len(page["ids"]) < page_size:
+            return ids, metadatas, np.asarray(vectors, dtype=np.float32)
+        offset += page_size
+
+
+def save_quantized_index(collection, updated, deleted):
+    """
+    Índice int8/binario de los vectores de la colección (embeddings/quantization.py), que retrieve_docs usa
+    con EMBED_QUANTIZATION=int8|binary. Se reconstruye entero si la colección ha cambiado o el índice no existe.
+    """
+    if EMBED_QUANTIZATION not in KINDS:
+        return
+    path = os.path.join(CHROMA_PATH, QUANTIZED_INDEX_DIR)
+    if not updated and not deleted and os.path.exists(os.path.join(path, "meta.json")):
+        return
+    ids, metadatas, vectors = read_embeddings(collection)
+    if not ids:
+        return
+    index = QuantizedIndex.build(EMBED_QUANTIZATION, vectors, ids, metadatas, embedding_signature())
+    index.save(path)
+    print(f"Índice {EMBED_QUANTIZATION} guardado en: {path} ({index.nbytes() / 2**20:.1f} MB en memoria)")
+
+
+def write_ingest_marker(collection, updated, deleted):
+    """
+    Deja constancia de la ingesta en CHROMA_PATH. La API vigila este fichero para vaciar su caché de
+    respuestas y recargar la colección cuando los datos cambian.
+    """
+    if not updated and not deleted:
+        return
+    marker = {
+        "ingested_at": time.time(),
+        "documents": collection.count(),
+        "updated": updated,
+        "deleted": deleted,
+    }
+    with open(os.path.join(CHROMA_PATH, INGEST_MARKER), "w", encoding="utf-8") as f:
+        json.dump(marker, f)
+
+
+def main(audio=False, audio_path=None, incremental=True):
     """
     Orquesta todo el proceso de ingesta:
     - JSONs de grados
     - QA
     - Audio opcional
-    - Embeddings
-    - Inserción en ChromaDB
+    - Troceado de los textos largos en fragmentos con solape (tools/chunking.py)
+    - Embeddings (solo de los fragmentos nuevos o modificados en modo incremental)
+    - Inserción/actualización en ChromaDB y borrado de fragmentos obsoletos
+    - Índice léxico BM25 para la búsqueda híbrida
+    - Índice cuantizado de los vectores (con EMBED_QUANTIZATION=int8|binary)
     """
     texts = []
     metadatas = []
@@ -214,12 +447,46 @@ def main(audio=False, audio_path=None):
 
     print(f"Total de fragmentos a indexar: {len(texts)}")
 
-    embeddings = generate_embeddings(texts)
-    save_to_chroma(texts, metadatas, ids, embeddings)
+    for text, metadata in zip(texts, metadatas):
+        metadata["content_hash"] = content_hash(text)
+
+    # en modo completo se recrea la colección y por tanto todo queda pendiente
+    collection = open_collection(reset=not incremental)
+    pending, stale = diff_collection(collection, texts, metadatas, ids)
+    print(f"Nuevos o modificados: {len(pending)} | sin cambios: {len(texts) - len(pending)} | obsoletos: {len(stale)}")
+    updated = len(pending)
+
+    delete_ids(collection, stale)
+
+    # primero lo que ya está en la caché de embeddings; el modelo solo se carga si queda algo por embeber
+    cache = EmbeddingCache(EMBED_MODEL_NAME) if EMBED_CACHE_PATH else None
+    if cache is not None and pending:
+        pending = upsert_cached(collection, cache, texts, metadatas, ids, pending)
+
+    if pending:
+        model = load_embedding_model()
+        upsert_embeddings(collection, model, texts, metadatas, ids, pending, cache=cache)
+
+    if cache is not None:
+        print("Caché de embeddings:", cache.stats())
+
+    # los índices se escriben antes de la marca para que la API los recargue con la nueva versión
+    save_lexical_index(texts, metadatas, ids, updated, len(stale))
+    save_quantized_index(collection, updated, len(stale))
+    write_ingest_marker(collection, updated, len(stale))
+
+    print("Ingesta completada.")
+    print(f"Base de datos guardada en: {os.path.abspath(CHROMA_PATH)}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta de datos en ChromaDB")
+    parser.add_argument("--full", action="store_true", help="borra la colección y reindexa todo")
+    parser.add_argument("--audio-path", default=None, help="audio opcional a transcribir e indexar")
+    args = parser.parse_args()
+
     # Ejemplos de uso:
-    # main()
-    # main(audio=True, audio_path="/ruta/audio.m4a")
-    main()
+    # python -m ingestion.ingest_data
+    # python -m ingestion.ingest_data --full
+    # python -m ingestion.ingest_data --audio-path /ruta/audio.m4a
+    main(audio=bool(args.audio_path), audio_path=args.audio_path, incremental=not args.full)
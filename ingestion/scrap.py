@@ -1,8 +1,21 @@
 import os
+import json
 import time
+import threading
+import argparse
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+"""
+Descarga los dípticos de las titulaciones de la web de la UCM.
+Las páginas y los PDFs se piden en paralelo con una sesión HTTP compartida (conexiones reutilizadas),
+limitando las peticiones por host. Los PDFs se guardan en disco por streaming y en un manifiesto se anotan
+ETag y Last-Modified, de modo que en la siguiente ejecución se hacen peticiones condicionales y los
+PDFs que no han cambiado (304) no se vuelven a descargar.
+"""
 
 # URL base de la UCM
 BASE_URL = "https://www.ucm.es"
@@ -11,54 +24,111 @@ START_URL = "https://www.ucm.es/estudios/grado"
 
 # Carpeta donde se guardarán los PDFs
 OUTPUT_DIR = "dipticos_all"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+MANIFEST_FILE = ".scrap_manifest.json"   # url, ETag y Last-Modified de cada PDF descargado
+
+MAX_WORKERS = 8         # peticiones simultáneas
+MIN_INTERVAL = 0.25     # segundos mínimos entre peticiones al mismo host
+TIMEOUT = 30            # segundos por petición
+CHUNK_SIZE = 64 * 1024  # bytes por bloque al guardar los PDFs
 
 # Cabeceras para evitar bloqueos del servidor
 headers = {
     "User-Agent": "Mozilla/5.0 (compatible; UCM-PDF-Scraper/1.0)"
 }
 
-def get_soup(url):
+
+class HostRateLimiter:
+    """Garantiza al menos `min_interval` segundos entre el inicio de dos peticiones al mismo host."""
+
+    def __init__(self, min_interval=MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(pool_size=MAX_WORKERS):
+    """Sesión con un pool de conexiones del tamaño del número de workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers)
+    return session
+
+
+def get_soup(session, limiter, url):
     """
     Descarga una página y devuelve un objeto BeautifulSoup.
     """
-    resp = requests.get(url, headers=headers)
+    limiter.wait(url)
+    resp = session.get(url, timeout=TIMEOUT)
     resp.raise_for_status()
     return BeautifulSoup(resp.text, "html.parser")
 
+
 def sanitize_filename(name):
     """
     Limpia un nombre para que sea válido como nombre de archivo.
     """
     return "".join(c for c in name if c.isalnum() or c in " -_").rstrip()
 
-print("Cargando página principal...")
-soup = get_soup(START_URL)
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+_manifest_lock = threading.Lock()
+
+
+def save_manifest(output_dir, manifest):
+    """Escribe el manifiesto en un temporal y lo sustituye de golpe: una interrupción deja el anterior o el nuevo."""
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with _manifest_lock:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
 
 # -------------------------------------------------------------------
 # PASO 1 — Extraer todos los enlaces a los grados y sus títulos
 # -------------------------------------------------------------------
-degree_links = []
+def find_degree_links(soup, base_url):
+    degree_links = []
 
-for ul in soup.select("ul.menu_pag"):
-    for a in ul.select("a"):
-        href = a.get("href", "")
-        title = a.get("title", "").strip()
+    for ul in soup.select("ul.menu_pag"):
+        for a in ul.select("a"):
+            href = a.get("href", "")
+            title = a.get("title", "").strip()
+
+            # Convertir enlaces relativos a absolutos
+            if href.startswith("http"):
+                degree_links.append((href, title))
+            else:
+                degree_links.append((urljoin(base_url, href), title))
 
-        # Convertir enlaces relativos a absolutos
-        if href.startswith("http"):
-            degree_links.append((href, title))
-        else:
-            degree_links.append((urljoin(BASE_URL, href), title))
+    return degree_links
 
-print(f"Encontradas {len(degree_links)} páginas de grados.")
 
 # -------------------------------------------------------------------
-# PASO 2 — Visitar cada página de grado y descargar el PDF del díptico
+# PASO 2 — Visitar cada página de grado y localizar el PDF del díptico
 # -------------------------------------------------------------------
-for link, title in degree_links:
-    print(f"\nVisitando: {link}")
-    soup = get_soup(link)
+def find_diptico(session, limiter, link, title, base_url):
+    """Devuelve (url del PDF, nombre de archivo) o (None, None) si la página no tiene díptico."""
+    soup = get_soup(session, limiter, link)
 
     # Intentar obtener el nombre del grado desde el encabezado
     title_block = soup.select_one(".titulo-estudio h2")
@@ -75,12 +145,11 @@ for link, title in degree_links:
         href = a.get("href", "")
         # Buscar enlaces que contengan "díptico" y terminen en .pdf
         if "díptico" in text and href.endswith(".pdf"):
-            pdf_link = urljoin(BASE_URL, href)
+            pdf_link = urljoin(base_url, href)
             break
 
     if not pdf_link:
-        print("  No se encontró el 'Díptico de la titulación'.")
-        continue
+        return None, None
 
     # Elegir nombre del archivo: preferir el atributo title del enlace
     if title:
@@ -88,17 +157,111 @@ for link, title in degree_links:
     else:
         filename = sanitize_filename(degree_name) + ".pdf"
 
-    filepath = os.path.join(OUTPUT_DIR, filename)
+    return pdf_link, filename
+
+
+# -------------------------------------------------------------------
+# PASO 3 — Descargar el PDF (condicional y por streaming)
+# -------------------------------------------------------------------
+def download_pdf(session, limiter, pdf_link, filepath, entry):
+    """
+    Descarga el PDF si ha cambiado. Si ya existe en disco y tenemos ETag/Last-Modified de la
+    descarga anterior, se envían If-None-Match/If-Modified-Since y un 304 evita la descarga.
+    Devuelve (estado, entrada del manifiesto) con estado "downloaded" o "unchanged".
+    """
+    conditional = {}
+    if entry and entry.get("url") == pdf_link and os.path.exists(filepath):
+        if entry.get("etag"):
+            conditional["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            conditional["If-Modified-Since"] = entry["last_modified"]
+
+    limiter.wait(pdf_link)
+    with session.get(pdf_link, headers=conditional, stream=True, timeout=TIMEOUT) as resp:
+        if resp.status_code == 304:
+            return "unchanged", entry
+        resp.raise_for_status()
+
+        # Guardar el PDF por bloques en un temporal y sustituir al final
+        tmp = filepath + ".part"
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp, filepath)
+        finally:
+            # si la descarga se corta no queda el .part a medias
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        return "downloaded", {
+            "url": pdf_link,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "size": size,
+        }
+
+
+def scrape_degree(session, limiter, link, title, base_url, output_dir, manifest):
+    pdf_link, filename = find_diptico(session, limiter, link, title, base_url)
+    if not pdf_link:
+        return link, None, "missing", None
+    filepath = os.path.join(output_dir, filename)
+    status, entry = download_pdf(session, limiter, pdf_link, filepath, manifest.get(filename))
+    return link, filename, status, entry
+
+
+def scrape(start_url=START_URL, base_url=BASE_URL, output_dir=OUTPUT_DIR, workers=MAX_WORKERS, min_interval=MIN_INTERVAL):
+    """
+    Descarga todos los dípticos enlazados desde start_url en output_dir.
+    El manifiesto se guarda tras cada grado: si la ejecución se interrumpe, la siguiente no repite lo ya descargado.
+    Un fallo en un grado (red, disco, HTML inesperado) se cuenta como error y no detiene los demás.
+    Devuelve los contadores de descargados, sin cambios, sin díptico y errores.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    session = make_session(workers)
+    limiter = HostRateLimiter(min_interval)
+    manifest = load_manifest(output_dir)
+
+    print("Cargando página principal...")
+    degree_links = find_degree_links(get_soup(session, limiter, start_url), base_url)
+    print(f"Encontradas {len(degree_links)} páginas de grados.")
 
-    print(f"  Descargando: {filename}")
-    pdf_resp = requests.get(pdf_link, headers=headers)
-    pdf_resp.raise_for_status()
+    counts = {"downloaded": 0, "unchanged": 0, "missing": 0, "errors": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(scrape_degree, session, limiter, link, title, base_url, output_dir, manifest): link
+            for link, title in degree_links
+        }
+        for future in as_completed(futures):
+            try:
+                link, filename, status, entry = future.result()
+            except Exception as e:
+                counts["errors"] += 1
+                print(f"  Error en {futures[future]}: {e!r}")
+                continue
+            counts[status] += 1
+            if status == "missing":
+                print(f"  No se encontró el 'Díptico de la titulación' en {link}")
+                continue
+            print(f"  {'Descargado' if status == 'downloaded' else 'Sin cambios'}: {filename}")
+            if status == "downloaded":
+                manifest[filename] = entry
+                save_manifest(output_dir, manifest)
 
-    # Guardar el PDF
-    with open(filepath, "wb") as f:
-        f.write(pdf_resp.content)
+    session.close()
+    print(f"\n¡Listo! {counts} PDFs en la carpeta '{output_dir}'.")
+    return counts
 
-    # Pausa para no saturar el servidor
-    time.sleep(1)
 
-print("\n¡Listo! Todos los PDFs están en la carpeta 'dipticos_all'.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Descarga los dípticos de las titulaciones de la UCM.")
+    parser.add_argument("--start-url", default=START_URL)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL, help="segundos entre peticiones al mismo host")
+    args = parser.parse_args()
+    scrape(args.start_url, args.base_url, args.output_dir, args.workers, args.min_interval)
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+from functools import lru_cache
+
+import numpy as np
+
+"""
+Transcripción de audio por streaming para la ingesta.
+Antes transcribe_audio cargaba Qwen3-ASR en cada llamada (fijado a cuda:1), exportaba cada trozo de 30 s a
+/tmp/chunk_{i}.wav y lo transcribía de uno en uno. Ahora:
+- el modelo se carga una sola vez por proceso y usa CPU si no hay GPU
+- el audio se decodifica una vez a un buffer en memoria (PCM mono 16 kHz)
+- las ventanas se generan de forma perezosa, se solapan unos segundos para no perder palabras cortadas
+  en los bordes y se transcriben por lotes
+- el texto parcial se guarda en un checkpoint tras cada lote, así una grabación larga se puede reanudar
+
+Cualquier objeto con `transcribe_batch(ventanas, sample_rate) -> [texto]` sirve como modelo; en
+benchmarks/stubs.py hay uno diminuto que no necesita GPU ni descargas.
+"""
+
+AUDIO_MODEL_NAME = "Qwen/Qwen3-ASR-1.7B"  # Modelo de transcripción
+
+ASR_DEVICE = os.getenv("ASR_DEVICE", "auto")                               # auto | cuda | cuda:N | cpu
+ASR_SAMPLE_RATE = 16_000                                                   # Hz, lo que espera el modelo
+ASR_CHUNK_SECONDS = float(os.getenv("ASR_CHUNK_SECONDS", "30"))            # duración de cada ventana
+ASR_OVERLAP_SECONDS = float(os.getenv("ASR_OVERLAP_SECONDS", "2"))         # solape entre ventanas consecutivas
+ASR_BATCH_SIZE = int(os.getenv("ASR_BATCH_SIZE", "4"))                     # ventanas por llamada al modelo
+ASR_MAX_OVERLAP_WORDS = 12                                                 # palabras máximas repetidas por el solape
+
+
+def pick_asr_device(device=ASR_DEVICE):
+    """GPU si hay (o la indicada), CPU en otro caso."""
+    import torch
+    if device != "auto":
+        if device.startswith("cuda") and not torch.cuda.is_available():
+            print(f"{device} no disponible, se usa CPU para la transcripción")
+            return "cpu"
+        return device
+    return "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+class QwenASR:
+    """Adaptador de Qwen3-ASR: transcribe varias ventanas (arrays de PCM) en una sola llamada."""
+
+    def __init__(self, model_name=AUDIO_MODEL_NAME, device=ASR_DEVICE):
+        import torch
+        # import local: qwen_asr solo hace falta si se ingiere audio
+        from qwen_asr import Qwen3ASRModel
+
+        device = pick_asr_device(device)
+        self.model = Qwen3ASRModel.from_pretrained(
+            model_name,
+            dtype=torch.bfloat16 if device.startswith("cuda") else torch.float32,
+            device_map=device,
+            max_new_tokens=512,
+        )
+
+    def transcribe_batch(self, windows, sample_rate):
+        results = self.model.transcribe([(w, sample_rate) for w in windows], language=None)
+        return [r.text for r in results]
+
+
+@lru_cache(maxsize=1)
+def get_asr_model(model_name=AUDIO_MODEL_NAME, device=ASR_DEVICE):
+    """El modelo se carga una vez por proceso."""
+    return QwenASR(model_name, device)
+
+
+def decode_audio(audio_path, sample_rate=ASR_SAMPLE_RATE):
+    """Decodifica el audio a PCM mono int16 en memoria (sin ficheros intermedios)."""
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(audio_path).set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
+    return np.frombuffer(audio.raw_data, dtype=np.int16)
+
+
+def iter_windows(samples, sample_rate=ASR_SAMPLE_RATE, chunk_seconds=ASR_CHUNK_SECONDS,
+                 overlap_seconds=ASR_OVERLAP_SECONDS, start_window=0):
+    """
+    Genera (índice, ventana float32) de forma perezosa. Cada ventana empieza `chunk - overlap` segundos
+    después de la anterior; la última puede ser más corta.
+    """
+    size = int(chunk_seconds * sample_rate)
+    stride = size - int(overlap_seconds * sample_rate)
+    if stride <= 0:
+        raise ValueError("El solape debe ser menor que la duración de la ventana")
+    i = start_window
+    while True:
+        start = i * stride
+        if start >= len(samples) or (i > 0 and start + size - stride >= len(samples)):
+            # la ventana solo contendría audio ya cubierto por el solape de la anterior
+            return
+        yield i, samples[start:start + size].astype(np.float32) / 32768.0
+        i += 1
+
+
+def batched(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _norm_word(word):
+    return "".join(c for c in word.lower() if c.isalnum())
+
+
+def merge_overlap(previous_words, text, max_words=ASR_MAX_OVERLAP_WORDS):
+    """
+    Palabras nuevas de `text` quitando las que repiten el final de la ventana anterior (por el solape):
+    se busca el sufijo más largo de previous_words que coincide con un prefijo de text.
+    """
+    words = text.split()
+    tail = [_norm_word(w) for w in previous_words[-max_words:]]
+    head = [_norm_word(w) for w in words[:max_words]]
+    for n in range(min(len(tail), len(head)), 0, -1):
+        if tail[-n:] == head[:n]:
+            return words[n:]
+    return words
+
+
+class TranscriptCheckpoint:
+    """
+    Progreso de una transcripción en un JSON junto al audio: siguiente ventana y texto acumulado.
+    Solo se reutiliza si el audio (tamaño y mtime) y los parámetros de ventana no han cambiado.
+    """
+
+    def __init__(self, audio_path, path=None, **params):
+        stat = os.stat(audio_path)
+        self.path = path or f"{audio_path}.transcript.json"
+        self.key = {"size": stat.st_size, "mtime": stat.st_mtime, **params}
+        self.next_window = 0
+        self.words = []
+        self.done = False
+
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("key") == self.key:
+                self.next_window = saved["next_window"]
+                self.words = saved["text"].split()
+                self.done = saved.get("done", False)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "next_window": self.next_window, "text": " ".join(self.words),
+                       "done": self.done}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def transcribe(audio_path, model=None, chunk_seconds=ASR_CHUNK_SECONDS, overlap_seconds=ASR_OVERLAP_SECONDS,
+               batch_size=ASR_BATCH_SIZE, checkpoint=True, samples=None, sample_rate=ASR_SAMPLE_RATE):
+    """
+    Transcribe un audio completo y devuelve el texto. Con checkpoint=True retoma la transcripción
+    desde la última ventana guardada si un intento anterior se interrumpió.
+    `samples` permite pasar el PCM ya decodificado (int16, mono).
+    """
+    state = None
+    if checkpoint:
+        state = TranscriptCheckpoint(audio_path, chunk_seconds=chunk_seconds, overlap_seconds=overlap_seconds,
+                                     sample_rate=sample_rate)
+        if state.done:
+            print(f"Transcripción ya completada ({state.path})")
+            return " ".join(state.words)
+        if state.next_window:
+            print(f"Reanudando la transcripción desde la ventana {state.next_window}")
+
+    model = model or get_asr_model()
+    if samples is None:
+        samples = decode_audio(audio_path, sample_rate)
+    words = state.words if state else []
+
+    start = time.perf_counter()
+    windows = iter_windows(samples, sample_rate, chunk_seconds, overlap_seconds,
+                           start_window=state.next_window if state else 0)
+    for batch in batched(windows, batch_size):
+        texts = model.transcribe_batch([w for _, w in batch], sample_rate)
+        for text in texts:
+            words.extend(merge_overlap(words, text) if overlap_seconds else text.split())
+        if state:
+            state.next_window = batch[-1][0] + 1
+            state.save()
+        print(f"  ventanas transcritas: {batch[-1][0] + 1} ({time.perf_counter() - start:.1f}s)")
+
+    if state:
+        state.done = True
+        state.save()
+    return " ".join(words)
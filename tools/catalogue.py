@@ -0,0 +1,205 @@
+import json
+import math
+import mmap
+import os
+import re
+
+import numpy as np
+
+"""
+Catálogo de asignaturas compilado en un único fichero binario por columnas, pensado para abrirse con mmap.
+Antes get_subjects cargaba todos los JSON como listas de diccionarios anidados, incluidos los textos de
+conocimientos y salidas profesionales que retrieve_subjects nunca usa. El fichero solo guarda lo necesario:
+- tabla de cadenas internadas (cada título, curso, asignatura o créditos aparece una sola vez)
+- grado -> cursos -> asignaturas como arrays de offsets (formato CSR)
+- créditos de cada asignatura como texto original ("6 + 6") y como número (12.0)
+
+Estructura del fichero:
+    MAGIC | uint32 longitud de la cabecera | cabecera JSON | secciones alineadas a 8 bytes
+La cabecera indica el offset, tipo y longitud de cada sección; al abrir el fichero cada sección es una vista
+numpy sobre el mmap, así que no se copia nada en memoria hasta que se lee.
+"""
+
+MAGIC = b"UCMCAT01"
+CATALOGUE_FILE = "subjects_catalogue.bin"  # nombre por defecto, dentro de PATH_DICT_SUBJECTS
+MAX_SUBJECT_ECTS = 90                      # créditos máximos plausibles de una asignatura
+
+_ects_number = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def parse_ects(text):
+    """
+    Créditos de una asignatura: '6' -> 6.0, '6 + 6' -> 12.0, '4,5' -> 4.5.
+    nan si no hay números o el valor no es plausible (la extracción a veces deja un año, '2026.').
+    """
+    numbers = _ects_number.findall(text or "")
+    if not numbers:
+        return math.nan
+    value = float(sum(float(n.replace(",", ".")) for n in numbers))
+    return value if value <= MAX_SUBJECT_ECTS else math.nan
+
+
+class _StringTable:
+    """Interna cadenas: cada cadena distinta recibe un id y se guarda una sola vez."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, text):
+        text = text or ""
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+
+def compile_catalogue(data_list):
+    """
+    Devuelve el contenido del fichero binario para una lista de grados (formato de los JSON).
+    Se guardan todos los grados en el orden de data_list, también los que comparten título (planes de distintos
+    años), como hacía la carga de los JSON: la posición de cada grado es su índice en data_list.
+    """
+    strings = _StringTable()
+    columns = {name: [] for name in [
+        "degree_title", "degree_year_start", "year_label", "year_subject_start",
+        "subject_name", "subject_ects", "subject_ects_value",
+    ]}
+    for degree in data_list:
+        columns["degree_title"].append(strings.intern(degree["degree_title"]))
+        columns["degree_year_start"].append(len(columns["year_label"]))
+        for year, items in degree["plan_estudios"].items():
+            columns["year_label"].append(strings.intern(year))
+            columns["year_subject_start"].append(len(columns["subject_name"]))
+            for item in items:
+                columns["subject_name"].append(strings.intern(item["subject"]))
+                columns["subject_ects"].append(strings.intern(item.get("ects", "")))
+                columns["subject_ects_value"].append(parse_ects(item.get("ects", "")))
+    # offsets finales (n + 1 entradas)
+    columns["degree_year_start"].append(len(columns["year_label"]))
+    columns["year_subject_start"].append(len(columns["subject_name"]))
+
+    encoded = [s.encode("utf-8") for s in strings.strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    np.cumsum([len(b) for b in encoded], out=string_offsets[1:])
+
+    sections = {
+        "string_offsets": string_offsets,
+        "string_blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+    for name, values in columns.items():
+        dtype = np.float32 if name == "subject_ects_value" else np.uint32
+        sections[name] = np.asarray(values, dtype=dtype)
+
+    # la cabecera se calcula dos veces: los offsets dependen de su propia longitud
+    header_len = 0
+    while True:
+        offset = _align(len(MAGIC) + 4 + header_len)
+        layout = {}
+        for name, array in sections.items():
+            layout[name] = [offset, array.dtype.str, int(array.size)]
+            offset = _align(offset + array.nbytes)
+        header = json.dumps({"degrees": len(data_list), "sections": layout}).encode("utf-8")
+        if len(header) == header_len:
+            break
+        header_len = len(header)
+
+    out = bytearray(offset)
+    out[:len(MAGIC)] = MAGIC
+    out[len(MAGIC):len(MAGIC) + 4] = np.uint32(header_len).tobytes()
+    out[len(MAGIC) + 4:len(MAGIC) + 4 + header_len] = header
+    for name, array in sections.items():
+        start = layout[name][0]
+        out[start:start + array.nbytes] = array.tobytes()
+    return bytes(out)
+
+
+def write_catalogue(data_list, path):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(compile_catalogue(data_list))
+    os.replace(tmp, path)
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class Catalogue:
+    """
+    Lector del catálogo compilado. Las secciones son vistas numpy sobre el buffer (mmap o bytes);
+    las cadenas se decodifican al pedirlas.
+    """
+
+    def __init__(self, buffer, mmap_obj=None):
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError("No es un catálogo de asignaturas compilado")
+        header_len = int(np.frombuffer(buffer, dtype=np.uint32, count=1, offset=len(MAGIC))[0])
+        header = json.loads(bytes(buffer[len(MAGIC) + 4:len(MAGIC) + 4 + header_len]))
+
+        self._buffer = buffer
+        self._mmap = mmap_obj
+        self.sections = {
+            name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=offset)
+            for name, (offset, dtype, count) in header["sections"].items()
+        }
+        self._strings = {}  # id -> cadena ya decodificada
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    @classmethod
+    def from_data_list(cls, data_list):
+        return cls(compile_catalogue(data_list))
+
+    def close(self):
+        self.sections = {}
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __len__(self):
+        return len(self.sections["degree_title"])
+
+    def string(self, string_id):
+        text = self._strings.get(string_id)
+        if text is None:
+            offsets = self.sections["string_offsets"]
+            start, end = int(offsets[string_id]), int(offsets[string_id + 1])
+            text = self._strings[string_id] = self.sections["string_blob"][start:end].tobytes().decode("utf-8")
+        return text
+
+    def title(self, pos):
+        return self.string(int(self.sections["degree_title"][pos]))
+
+    def titles(self):
+        return [self.string(int(i)) for i in self.sections["degree_title"]]
+
+    def years(self, pos):
+        """Cursos de un grado: lista de (etiqueta, primera asignatura, última asignatura + 1)."""
+        year_start = self.sections["degree_year_start"]
+        subject_start = self.sections["year_subject_start"]
+        labels = self.sections["year_label"]
+        return [
+            (self.string(int(labels[y])), int(subject_start[y]), int(subject_start[y + 1]))
+            for y in range(int(year_start[pos]), int(year_start[pos + 1]))
+        ]
+
+    def subject_range(self, pos):
+        """Rango [inicio, fin) de las asignaturas de un grado en las columnas subject_*."""
+        year_start = self.sections["degree_year_start"]
+        subject_start = self.sections["year_subject_start"]
+        return int(subject_start[year_start[pos]]), int(subject_start[year_start[pos + 1]])
+
+    def subjects(self, pos):
+        """Lista plana de asignaturas de un grado, en el orden del plan de estudios."""
+        names = self.sections["subject_name"]
+        start, end = self.subject_range(pos)
+        return [self.string(int(i)) for i in names[start:end]]
+
+    def ects(self, subject):
+        """Créditos de la asignatura `subject` (índice global): (texto original, valor numérico)."""
+        return self.string(int(self.sections["subject_ects"][subject])), float(self.sections["subject_ects_value"][subject])
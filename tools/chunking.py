@@ -0,0 +1,193 @@
+import os
+import re
+
+"""
+Troceado de documentos largos antes de embeberlos y reconstrucción de los trozos al recuperarlos.
+Antes cada sección de un díptico (conocimientos, salidas) y cada transcripción de audio era un único documento:
+el modelo de embeddings truncaba los textos largos y retrieve_docs devolvía bloques enteros que inflaban el prompt.
+
+Ahora ingest_data parte cada documento en fragmentos de como mucho CHUNK_MAX_TOKENS tokens con un solape de
+CHUNK_OVERLAP_TOKENS, por frases (sin cortar una frase salvo que sola supere el máximo) o por ventanas de tokens.
+Cada fragmento guarda en sus metadatos:
+- parent_id: id del documento completo (el que tenía antes de trocear)
+- chunk / n_chunks: posición del fragmento y número de fragmentos del documento
+- start / end: offsets en caracteres del fragmento dentro del cuerpo del documento
+Con eso retrieve_docs puede unir fragmentos contiguos del mismo documento y, si se pide, añadir los vecinos.
+Los tokens se aproximan como palabras y signos de puntuación sueltos, sin depender del tokenizador del modelo.
+"""
+
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "sentence")                # sentence | tokens | none
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))            # tokens máximos por fragmento
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))     # tokens repetidos entre fragmentos consecutivos
+
+_token_re = re.compile(r"\w+|[^\w\s]")
+# una frase termina en . ! ? seguidos de espacio, en un salto de línea o al final del texto
+_sentence_re = re.compile(r"\S.*?(?:[.!?…]+(?=\s|$)|(?=\n)|$)", re.S)
+
+
+def token_spans(text):
+    return [m.span() for m in _token_re.finditer(text)]
+
+
+def count_tokens(text):
+    return len(_token_re.findall(text))
+
+
+def _token_windows(tokens, max_tokens, overlap):
+    """Ventanas de max_tokens tokens que avanzan max_tokens - overlap; devuelve (primer token, último + 1)."""
+    stride = max(1, max_tokens - overlap)
+    windows = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, len(tokens))
+        windows.append((start, end))
+        if end == len(tokens):
+            return windows
+        start += stride
+
+
+def _sentence_units(text, max_tokens, overlap):
+    """Frases como (start, end, tokens); las que superan max_tokens se parten en ventanas de tokens."""
+    units = []
+    for m in _sentence_re.finditer(text):
+        start, end = m.start(), m.end()
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        tokens = [(start + a, start + b) for a, b in token_spans(text[start:end])]
+        if not tokens:
+            continue
+        if len(tokens) <= max_tokens:
+            units.append((start, end, len(tokens)))
+        else:
+            for first, last in _token_windows(tokens, max_tokens, overlap):
+                units.append((tokens[first][0], tokens[last - 1][1], last - first))
+    return units
+
+
+def chunk_spans(text, strategy=None, max_tokens=None, overlap=None):
+    """
+    Offsets (start, end) de los fragmentos de `text`. Un texto que cabe en un fragmento (o strategy="none")
+    devuelve un solo fragmento con el texto entero.
+    """
+    strategy = strategy or CHUNK_STRATEGY
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    overlap = CHUNK_OVERLAP_TOKENS if overlap is None else overlap
+    if overlap >= max_tokens:
+        raise ValueError("El solape debe ser menor que el tamaño del fragmento")
+
+    tokens = token_spans(text)
+    if strategy == "none" or len(tokens) <= max_tokens:
+        return [(0, len(text))]
+
+    if strategy == "tokens":
+        return [(tokens[first][0], tokens[last - 1][1]) for first, last in _token_windows(tokens, max_tokens, overlap)]
+    if strategy != "sentence":
+        raise ValueError(f"Estrategia de troceado desconocida: {strategy}")
+
+    spans = []
+    current = []  # frases del fragmento en curso
+    size = 0
+    for unit in _sentence_units(text, max_tokens, overlap):
+        if current and size + unit[2] > max_tokens:
+            spans.append((current[0][0], current[-1][1]))
+            # el siguiente fragmento empieza con las últimas frases del anterior que quepan en el solape
+            carry = []
+            carried = 0
+            for prev in reversed(current):
+                if carried + prev[2] > overlap:
+                    break
+                carry.insert(0, prev)
+                carried += prev[2]
+            if carried + unit[2] > max_tokens:
+                carry, carried = [], 0
+            current, size = carry, carried
+        current.append(unit)
+        size += unit[2]
+    if current:
+        spans.append((current[0][0], current[-1][1]))
+    return spans
+
+
+def chunk_id(parent_id, chunk, n_chunks):
+    """Un documento de un solo fragmento conserva el id que tenía sin trocear."""
+    return parent_id if n_chunks == 1 else f"{parent_id}:{chunk}"
+
+
+def chunk_metadata(parent_id, chunk, n_chunks, start, end):
+    return {"parent_id": parent_id, "chunk": chunk, "n_chunks": n_chunks, "start": start, "end": end}
+
+
+def neighbour_ids(metadata, window):
+    """Ids de los `window` fragmentos anteriores y posteriores (incluido el propio)."""
+    n_chunks = metadata.get("n_chunks", 1)
+    if n_chunks == 1 or "parent_id" not in metadata:
+        return []
+    chunk = metadata["chunk"]
+    return [chunk_id(metadata["parent_id"], j, n_chunks)
+            for j in range(max(0, chunk - window), min(n_chunks, chunk + window + 1))]
+
+
+def _body(doc):
+    # el texto del fragmento es cabecera + cuerpo[start:end]
+    metadata = doc["metadata"]
+    length = metadata["end"] - metadata["start"]
+    text = doc["content"]
+    return text[:len(text) - length], text[len(text) - length:]
+
+
+def merge_chunks(docs, extra=()):
+    """
+    Une los fragmentos contiguos del mismo documento padre en un único resultado (cabecera una sola vez y sin
+    repetir el solape). `extra` son fragmentos vecinos que solo se usan para rellenar.
+    Se conserva el orden de `docs`: cada grupo ocupa la posición de su fragmento mejor situado.
+    """
+    by_id = {}
+    for doc in list(docs) + list(extra):
+        by_id.setdefault(doc["id"], doc)
+
+    groups = {}  # id del primer fragmento de cada tramo contiguo -> fragmentos del tramo, en orden
+    by_parent = {}
+    for doc in by_id.values():
+        metadata = doc["metadata"] or {}
+        if metadata.get("n_chunks", 1) > 1 and "parent_id" in metadata:
+            by_parent.setdefault(metadata["parent_id"], []).append(doc)
+    for chunks in by_parent.values():
+        chunks.sort(key=lambda d: d["metadata"]["chunk"])
+        run = [chunks[0]]
+        for doc in chunks[1:]:
+            if doc["metadata"]["chunk"] == run[-1]["metadata"]["chunk"] + 1:
+                run.append(doc)
+            else:
+                groups[run[0]["id"]] = run
+                run = [doc]
+        groups[run[0]["id"]] = run
+    group_of = {doc["id"]: first for first, run in groups.items() for doc in run}
+
+    merged = []
+    seen = set()
+    for doc in docs:
+        first = group_of.get(doc["id"])
+        if first is None:
+            merged.append(doc)
+            continue
+        if first in seen:
+            continue
+        seen.add(first)
+        run = groups[first]
+        if len(run) == 1:
+            merged.append(doc)
+            continue
+
+        header, body = _body(run[0])
+        end = run[0]["metadata"]["end"]
+        for chunk in run[1:]:
+            _, text = _body(chunk)
+            start = chunk["metadata"]["start"]
+            # solape: se omite lo que ya está; hueco (espacios entre frases): se une con un espacio
+            body += text[end - start:] if start < end else " " + text
+            end = max(end, chunk["metadata"]["end"])
+        metadata = dict(doc["metadata"])
+        metadata.update(chunk=run[0]["metadata"]["chunk"], start=run[0]["metadata"]["start"], end=end,
+                        chunks=len(run))
+        merged.append({"content": header + body, "metadata": metadata, "id": doc["id"]})
+    return merged
@@ -0,0 +1,266 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from tools.resources import registry
+
+"""
+Resolución de nombres de grado aproximados ("enfermeria", "ADE", "criminologa", "ciencias politica")
+a los títulos del catálogo. La usan retrieve_subjects y el filtro por grado de retrieve_docs.
+Antes cada palabra de la consulta tenía que ser subcadena del título: las erratas, los plurales y las
+abreviaturas no encontraban nada (y el LLM repetía la llamada) o encontraban grados de más.
+
+Todo se precalcula al construir el índice:
+- vocabulario de tokens normalizados (sin tildes, sin palabras vacías, plural simple) -> grados
+- trie de tokens para las coincidencias por prefijo ("admin", "econ")
+- índice de trigramas de caracteres para las erratas
+- tabla de alias: abreviaturas entre paréntesis, iniciales de cada parte de los dobles grados y unas pocas fijas
+Cada palabra de la consulta se resuelve por niveles (exacta/alias, prefijo, errata) y solo se usa el mejor
+nivel que encuentre algo, para no mezclar coincidencias buenas con otras dudosas.
+"""
+
+STOPWORDS = {"a", "con", "de", "del", "doble", "e", "el", "en", "grado", "la", "las", "los", "para", "y"}
+
+# abreviaturas habituales que no aparecen en los títulos
+EXTRA_ALIASES = {
+    "ade": "administracion direccion empresas",
+    "rrhh": "recursos humanos",
+    "rrll": "relaciones laborales",
+    "cav": "comunicacion audiovisual",
+    "teleco": "telecomunicacion",
+}
+
+PREFIX_MIN_CHARS = 3     # longitud mínima de una palabra para buscarla como prefijo
+ALIAS_MIN_CHARS = 3      # longitud mínima de los alias generados con las iniciales
+FUZZY_MIN_RATIO = 0.8    # similitud mínima (difflib) para aceptar una errata
+FUZZY_CANDIDATES = 20    # tokens con más trigramas en común que se comparan con difflib
+PARTIAL_LIMIT = 5        # resultados cuando ningún grado casa con todas las palabras
+PARTIAL_MIN_SCORE = 0.5  # puntuación mínima de esos resultados parciales
+TOKEN_CACHE_SIZE = 4096  # palabras de consulta cacheadas
+
+_token_re = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=4096)
+def normalize(text: str) -> str:
+    """
+    Para asegurarnos de que el nombre de los grados puede ir con tildes, sin tildes, mayusculas etc, se normaliza el texto
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.lower().strip()
+
+
+def stem(token):
+    """Plural simple: 'politicas' -> 'politica'. Se aplica igual a títulos y consultas."""
+    return token[:-1] if len(token) > 4 and token.endswith("s") else token
+
+
+def tokenize(text):
+    return [stem(t) for t in _token_re.findall(normalize(text)) if t not in STOPWORDS]
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def title_aliases(title):
+    """
+    Abreviaturas entre paréntesis ("(ADE)") e iniciales de cada parte del título ("ade", "cta").
+    Las iniciales de menos de ALIAS_MIN_CHARS letras se descartan porque chocan con palabras normales ("es").
+    """
+    aliases = {normalize(a) for a in re.findall(r"\(([^)]+)\)", title)}
+    for part in re.split(r"\s*/\s*|\s+-\s+", re.sub(r"\([^)]*\)", "", title)):
+        words = [w for w in _token_re.findall(normalize(part)) if w not in STOPWORDS and w.isalpha()]
+        if len(words) >= ALIAS_MIN_CHARS:
+            aliases.add("".join(w[0] for w in words))
+    return {a for a in aliases if _token_re.fullmatch(a)}
+
+
+class DegreeResolver:
+    """
+    Índice de títulos de grado con búsqueda aproximada.
+    resolve() devuelve (posición, puntuación) ordenado de mejor a peor: todos los grados que casan con
+    todas las palabras de la consulta (como antes: "derecho" devuelve todos los grados de derecho),
+    o, si no hay ninguno, los mejores que casan con parte de ellas.
+    Las posiciones son índices de `titles`, la lista en el orden en que se añadieron. Un título repetido
+    (el mismo grado con dos planes) se indexa una vez y resolve() devuelve todas sus posiciones.
+    """
+
+    def __init__(self, titles=()):
+        self.titles = []       # títulos originales, por posición (con repetidos)
+        self.title_ids = {}    # título -> id interno (cada título distinto se indexa una sola vez)
+        self.occurrences = []  # id -> posiciones de `titles` con ese título
+        self.lengths = []      # id -> número de tokens del título
+        self.postings = {}     # token -> set de ids
+        self.aliases = {}      # alias -> set de ids
+        self.trie = {}        # carácter -> nodo; cada nodo guarda en "#" los tokens que pasan por él
+        self.trigram_index = {}  # trigrama -> set de tokens del vocabulario
+        self._token_cache = {}   # palabra de la consulta -> {id: puntuación}
+
+        for title in titles:
+            self.add(title)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, title):
+        """Añade un título en la siguiente posición y devuelve todas las posiciones que tiene ese título."""
+        pos = len(self.titles)
+        self.titles.append(title)
+        title_id = self.title_ids.get(title)
+        if title_id is not None:
+            self.occurrences[title_id].append(pos)
+            return list(self.occurrences[title_id])
+        title_id = self.title_ids[title] = len(self.occurrences)
+        self.occurrences.append([pos])
+
+        tokens = tokenize(title)
+        self.lengths.append(max(len(set(tokens)), 1))
+        for token in set(tokens):
+            if token not in self.postings:
+                self._add_vocabulary(token)
+            self.postings[token].add(title_id)
+
+        for alias in title_aliases(title):
+            self.aliases.setdefault(alias, set()).add(title_id)
+        for alias, expansion in EXTRA_ALIASES.items():
+            if set(tokenize(expansion)) <= set(tokens):
+                self.aliases.setdefault(alias, set()).add(title_id)
+
+        # un título nuevo invalida las palabras cacheadas
+        self._token_cache.clear()
+        return [pos]
+
+    def _add_vocabulary(self, token):
+        self.postings[token] = set()
+        node = self.trie
+        for ch in token:
+            node = node.setdefault(ch, {"#": set()})
+            node["#"].add(token)
+        for gram in trigrams(token):
+            self.trigram_index.setdefault(gram, set()).add(token)
+
+    def _prefix_tokens(self, token):
+        node = self.trie
+        for ch in token:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        return node["#"]
+
+    def _fuzzy_tokens(self, token):
+        """Tokens del vocabulario que contienen la palabra o se parecen a ella (erratas), con su similitud."""
+        shared = {}
+        for gram in trigrams(token):
+            for candidate in self.trigram_index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        best = sorted(shared, key=shared.get, reverse=True)[:FUZZY_CANDIDATES]
+
+        matches = {}
+        for candidate in best:
+            if token in candidate:
+                matches[candidate] = 0.8
+                continue
+            ratio = SequenceMatcher(None, token, candidate).ratio()
+            if ratio >= FUZZY_MIN_RATIO:
+                matches[candidate] = 0.85 * ratio
+        return matches
+
+    def _match_token(self, token):
+        """{id: puntuación} de una palabra de la consulta, usando solo el mejor nivel con resultados."""
+        cached = self._token_cache.get(token)
+        if cached is not None:
+            return cached
+
+        # 1. token exacto o alias
+        positions = set(self.postings.get(token, ())) | self.aliases.get(token, set())
+        if positions:
+            result = dict.fromkeys(positions, 1.0)
+        else:
+            # 2. prefijo de algún token ("admin" -> administracion)
+            vocabulary = {t: 0.9 for t in self._prefix_tokens(token)} if len(token) >= PREFIX_MIN_CHARS else {}
+            # 3. subcadena o errata
+            if not vocabulary:
+                vocabulary = self._fuzzy_tokens(token)
+            result = {}
+            for t, score in vocabulary.items():
+                for title_id in self.postings[t]:
+                    if score > result.get(title_id, 0.0):
+                        result[title_id] = score
+
+        if len(self._token_cache) >= TOKEN_CACHE_SIZE:
+            self._token_cache.clear()
+        self._token_cache[token] = result
+        return result
+
+    def _score(self, title_id, matches):
+        # media de las palabras, con un pequeño extra para los títulos sin palabras de sobra
+        # ("derecho" -> primero Derecho, después los dobles grados con derecho)
+        n = len(matches)
+        base = sum(m.get(title_id, 0.0) for m in matches) / n
+        return base * (0.85 + 0.15 * min(1.0, n / self.lengths[title_id]))
+
+    def resolve(self, query, allow_partial=True):
+        """Lista de (posición, puntuación) de los grados que corresponden a la consulta."""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        matches = [self._match_token(w) for w in words]
+
+        # empezamos por la palabra más selectiva para que la intersección sea mínima
+        ordered = sorted(matches, key=len)
+        full = set(ordered[0])
+        for m in ordered[1:]:
+            full &= m.keys()
+            if not full:
+                break
+
+        if full:
+            scored = [(title_id, self._score(title_id, matches)) for title_id in full]
+        elif allow_partial:
+            candidates = set().union(*matches)
+            scored = [(title_id, self._score(title_id, matches)) for title_id in candidates]
+            scored = [item for item in scored if item[1] >= PARTIAL_MIN_SCORE]
+            scored = sorted(scored, key=lambda item: (-item[1], item[0]))[:PARTIAL_LIMIT]
+        else:
+            return []
+        # cada título, en todas sus posiciones
+        return [(pos, score) for title_id, score in sorted(scored, key=lambda item: (-item[1], item[0]))
+                for pos in self.occurrences[title_id]]
+
+    def resolve_titles(self, query, allow_partial=True):
+        """Títulos distintos que corresponden a la consulta, de mejor a peor."""
+        return list(dict.fromkeys(self.titles[pos] for pos, _ in self.resolve(query, allow_partial)))
+
+
+def collection_degrees(collection, page_size=1000):
+    """Valores distintos del metadato `degree` en una colección de chroma."""
+    degrees = set()
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        for metadata in page["metadatas"]:
+            if metadata and metadata.get("degree"):
+                degrees.add(metadata["degree"])
+        if len(page["ids"]) < page_size:
+            return sorted(degrees)
+        offset += page_size
+
+
+def load_degree_resolver():
+    # títulos del catálogo de asignaturas + grados presentes en chroma (del índice léxico si existe,
+    # que ya los tiene en memoria; si no, recorriendo los metadatos de la colección)
+    titles = []
+    if registry.is_registered("subject_index"):
+        titles += registry.get("subject_index").titles
+    if registry.is_registered("lexical_index"):
+        titles += registry.get("lexical_index").degrees()
+    elif registry.is_registered("collection"):
+        titles += collection_degrees(registry.get("collection"))
+    return DegreeResolver(titles)
+
+
+registry.register("degree_resolver", load_degree_resolver)
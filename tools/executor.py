@@ -0,0 +1,34 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+
+"""
+Ejecutor acotado para el trabajo bloqueante de las herramientas (embeddings, consultas a chroma...).
+Las herramientas son síncronas, así que desde el camino asíncrono de la API se lanzan en este pool
+para no bloquear el event loop de uvicorn. El tamaño es fijo para no saturar la CPU con el modelo de embeddings.
+"""
+load_dotenv()
+
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "4")) #número máximo de hilos para herramientas
+
+executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Ejecuta una función bloqueante en el pool de herramientas y espera su resultado
+    sin bloquear el event loop. Se copia el contexto (traza de la petición, ver tools/tracing.py).
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(ctx.run, func, *args, **kwargs))
+
+
+def map_blocking(func, items):
+    """executor.map que conserva el contexto del que llama en cada elemento (traza de la petición)."""
+    contexts = [contextvars.copy_context() for _ in items]
+    return list(executor.map(lambda ctx, item: ctx.run(func, item), contexts, items))
@@ -1,8 +1,18 @@
 import json
 from glob import glob
-import unicodedata
 from dotenv import load_dotenv 
 import os
+from tools.subject_index import (
+    SubjectIndex,
+    YEAR_LABELS,
+    normalize,
+    render_comparison,
+    render_totals,
+    render_year,
+)
+from tools.catalogue import Catalogue, CATALOGUE_FILE
+from tools.resources import registry
+from tools.tracing import debug
 
 """
 Aquí se define la función de get_subjects. Idealmente se guarfaría en una base de datos, sin embargo por hacerlo de manera muy
@@ -11,60 +21,89 @@ simple usamos un diccionario que se carga en memoria y se consulta cuando es nec
 load_dotenv()
 
 folder_path = os.getenv("PATH_DICT_SUBJECTS") #path a los jsons
-data_list = []
+CATALOGUE_PATH = os.getenv("CATALOGUE_PATH") or os.path.join(folder_path or "", CATALOGUE_FILE) #catálogo compilado
 
-#Se leen todos los jsons del path y se guardan en una lista
-for file_path in glob(f"{folder_path}/*.json"):
-    with open(file_path, "r", encoding="utf-8") as f:
-        data_list.append(json.load(f))
 
+def load_data_list():
+    """Se leen todos los jsons del path y se guardan en una lista"""
+    data_list = []
+    for file_path in sorted(glob(f"{folder_path}/*.json")):
+        with open(file_path, "r", encoding="utf-8") as f:
+            data_list.append(json.load(f))
+    return data_list
 
-def normalize(text: str) -> str:
-    """
-    Para asegurarnos de que el nombre de los grados puede ir con tildes, sin tildes, mayusculas etc, se normaliza el texto
-    """
-    text = unicodedata.normalize("NFKD", text)
-    text = "".join(c for c in text if not unicodedata.combining(c))
-    return text.lower().strip()
 
-def degree_matches(query, title):
-    print("AQUI", query)
-    q = normalize(query).split()
-    print(q)
-    t = normalize(title)
-
-    return all(word in t for word in q)
+def catalogue_is_fresh():
+    """True si existe el catálogo compilado y es posterior a todos los JSON."""
+    if not os.path.exists(CATALOGUE_PATH):
+        return False
+    compiled = os.stat(CATALOGUE_PATH).st_mtime_ns
+    return all(os.stat(p).st_mtime_ns <= compiled for p in glob(f"{folder_path}/*.json"))
 
-def retrieve_subjects(query):
-    
-    print("TOOL RETRIEVE_SUBJECT") #log
-    print(query)
-    matches = []
 
-    for degree in data_list:
-        if degree_matches(query, degree["degree_title"]):
-            subjects = []
-            for year, items in degree["plan_estudios"].items():
-                for item in items:
-                    subjects.append(item["subject"])
+def load_subject_index():
+    # índice construido una sola vez (en el primer uso): las consultas no recorren data_list.
+    # Si hay catálogo compilado se abre con mmap; si no, se cargan los JSON como antes
+    if catalogue_is_fresh():
+        return SubjectIndex.from_catalogue(Catalogue.open(CATALOGUE_PATH))
+    print(f"Catálogo compilado no encontrado o desactualizado ({CATALOGUE_PATH}); cargando los JSON."
+          " Para compilarlo: python -m ingestion.compile_catalogue")
+    return SubjectIndex(load_data_list())
 
-            matches.append({
-                "degree_title": degree["degree_title"],
-                "subjects": subjects
-            })
-    # se aplana la info ya que el LLM se confundía al ver el dict y tendía a llamar la tool varias veces
-    lines= [] 
-    for match in matches:
-        lines.append(f"Grado: {match['degree_title']}")
-        lines.append("Asignaturas:")
-        for subject in match["subjects"]:
-            lines.append(f"  - {subject}")
-        lines.append("") 
 
-    return "\n".join(lines)
+registry.register("subject_index", load_subject_index)
 
-print(retrieve_subjects("turismo"))
 
+def catalogue_version():
+    """Versión del catálogo: ficheros presentes y su última modificación (cambia al re-ingerir o recompilar)."""
+    paths = glob(f"{folder_path}/*.json") + ([CATALOGUE_PATH] if os.path.exists(CATALOGUE_PATH) else [])
+    return (len(paths), max((os.stat(p).st_mtime_ns for p in paths), default=0))
 
+def degree_matches(query, title):
+    q = normalize(query).split()
+    t = normalize(title)
 
+    return all(word in t for word in q)
 
+def retrieve_subjects(query, year=None, totals=False, compare_with=None, operation="intersection"):
+    """
+    Sin más argumentos devuelve todas las asignaturas de los grados que casan con `query`.
+    - year: solo ese curso (1 = PRIMER CURSO ... 6 = SEXTO CURSO), con los créditos de cada asignatura
+    - totals: suma de créditos de las asignaturas listadas en cada curso (optativas incluidas) en lugar de la lista
+    - compare_with + operation: asignaturas comunes (intersection) o solo del primer grado (difference)
+    """
+    debug("TOOL RETRIEVE_SUBJECT") #log
+    debug(query, "| year:", year, "| totals:", totals, "| compare_with:", compare_with, operation)
+
+    subject_index = registry.get("subject_index")
+    positions = subject_index.search(query)
+    if not positions:
+        return f"No se ha encontrado ningún grado para '{query}'."
+
+    if compare_with:
+        # se compara el grado que mejor casa con cada nombre
+        others = subject_index.search(compare_with)
+        if not others:
+            return f"No se ha encontrado ningún grado para '{compare_with}'."
+        pos_a, pos_b = positions[0], others[0]
+        subjects = subject_index.compare(pos_a, pos_b, operation)
+        return render_comparison(subject_index.titles[pos_a], subject_index.titles[pos_b], operation, subjects)
+
+    if year:
+        if not 1 <= year <= len(YEAR_LABELS):
+            return f"Curso no válido: {year}. Los cursos van de 1 a {len(YEAR_LABELS)}."
+        label = YEAR_LABELS[year - 1]
+        texts = []
+        for pos in positions:
+            found = subject_index.year_subjects(pos, label)
+            if found is None:
+                texts.append(f"Grado: {subject_index.titles[pos]}\nNo tiene {label}.\n")
+            else:
+                texts.append(render_year(subject_index.titles[pos], label, *found))
+        return "\n".join(texts)
+
+    if totals:
+        return "\n".join(render_totals(subject_index.titles[pos], subject_index.year_totals(pos)) for pos in positions)
+
+    # el texto de cada grado se renderiza una vez y queda cacheado
+    return subject_index.render(positions)
@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import re
+
+from tools.subject_index import normalize
+
+"""
+Índice léxico BM25 sobre los mismos fragmentos que se guardan en chroma. Lo construye ingest_data al terminar
+cada ingesta y se guarda junto a la base vectorial; retrieve_docs lo combina con la búsqueda densa (RRF).
+La búsqueda densa sola confunde grados con textos parecidos ("salidas de criminología" devolvía salidas de
+otros grados); con BM25 los términos exactos del nombre del grado pesan en el ranking.
+"""
+
+LEXICAL_INDEX_FILE = "bm25_index.json"  # fichero dentro de CHROMA_PATH
+
+# palabras vacías más frecuentes en las preguntas; no aportan nada al ranking
+STOPWORDS = {
+    "a", "al", "como", "con", "cual", "cuales", "de", "del", "el", "en", "es", "esta", "este", "grado",
+    "hay", "la", "las", "lo", "los", "mas", "me", "mi", "o", "para", "por", "puedo", "que", "se", "si",
+    "sobre", "son", "su", "sus", "tiene", "un", "una", "y",
+}
+
+_token_re = re.compile(r"[a-z0-9ñ]+")
+
+
+def tokenize(text):
+    """Tokens normalizados (sin tildes ni mayúsculas) sin palabras vacías."""
+    return [t for t in _token_re.findall(normalize(text)) if t not in STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    """
+    Índice invertido con puntuación BM25 (Okapi).
+    Guarda también el texto y los metadatos de cada fragmento para poder devolver resultados
+    que solo aparecen en la búsqueda léxica sin volver a consultar chroma.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.lengths = []
+        self.postings = {}  # token -> [[posición, frecuencia], ...]
+
+    def add(self, doc_id, text, metadata):
+        pos = len(self.ids)
+        self.ids.append(doc_id)
+        self.documents.append(text)
+        self.metadatas.append(metadata or {})
+        tokens = tokenize(text)
+        self.lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, []).append([pos, tf])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def degrees(self):
+        return sorted({m["degree"] for m in self.metadatas if m.get("degree")})
+
+    def _allowed(self, pos, degrees, section):
+        metadata = self.metadatas[pos]
+        if degrees and metadata.get("degree") not in degrees:
+            return False
+        if section and metadata.get("section") != section:
+            return False
+        return True
+
+    def search(self, query, k=5, degrees=None, section=None):
+        """Top-k fragmentos por BM25, opcionalmente filtrados por grado(s) y sección."""
+        n = len(self.ids)
+        if not n:
+            return []
+        avg_length = sum(self.lengths) / n
+
+        scores = {}
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pos, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[pos] / avg_length)
+                scores[pos] = scores.get(pos, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        if degrees or section:
+            scores = {pos: s for pos, s in scores.items() if self._allowed(pos, degrees, section)}
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            {"content": self.documents[pos], "metadata": self.metadatas[pos], "id": self.ids[pos], "score": score}
+            for pos, score in ranked
+        ]
+
+    def save(self, path):
+        data = {
+            "k1": self.k1, "b": self.b, "ids": self.ids, "documents": self.documents,
+            "metadatas": self.metadatas, "lengths": self.lengths, "postings": self.postings,
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data["k1"], b=data["b"])
+        index.ids = data["ids"]
+        index.documents = data["documents"]
+        index.metadatas = data["metadatas"]
+        index.lengths = data["lengths"]
+        index.postings = data["postings"]
+        return index
+
+
+def build_index(texts, metadatas, ids):
+    index = BM25Index()
+    for text, metadata, doc_id in zip(texts, metadatas, ids):
+        index.add(doc_id, text, metadata)
+    return index
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """
+    Fusiona varias listas de documentos ordenadas (RRF): cada documento suma 1 / (rrf_k + posición)
+    por cada lista en la que aparece. Devuelve los k mejores, sin la puntuación parcial de cada lista.
+    """
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc["id"]] = scores.get(doc["id"], 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(doc["id"], doc)
+
+    fused = sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)[:k]
+    return [
+        {"content": docs[doc_id]["content"], "metadata": docs[doc_id]["metadata"], "id": doc_id}
+        for doc_id in fused
+    ]
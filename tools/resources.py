@@ -0,0 +1,110 @@
+import threading
+import time
+
+"""
+Registro de recursos pesados (modelo de embeddings, colección de chroma, catálogo de asignaturas...).
+Antes se cargaban al importar los módulos de herramientas, de modo que importar api.py tardaba mucho
+y consumía mucha memoria antes de que /health pudiera responder. Ahora cada módulo solo registra
+cómo cargar su recurso, y este se carga la primera vez que se usa o en un calentamiento en segundo plano.
+"""
+
+
+class ResourceRegistry:
+    """
+    Registro perezoso y seguro entre hilos: cada recurso se carga una sola vez aunque varias
+    peticiones lo pidan a la vez (lock por recurso).
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._values = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._warm_up_thread = None
+
+    def register(self, name, loader):
+        """Registra la función que construye el recurso `name` (no la ejecuta)."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """Devuelve el recurso, cargándolo si es la primera vez."""
+        value = self._values.get(name)
+        if value is not None:
+            return value
+
+        with self._locks[name]:
+            # otro hilo puede haberlo cargado mientras esperábamos el lock
+            if name in self._values:
+                return self._values[name]
+
+            start = time.perf_counter()
+            try:
+                value = self._loaders[name]()
+            except Exception as e:
+                self._errors[name] = repr(e)
+                raise
+            self._values[name] = value
+            self._errors.pop(name, None)
+            self._load_seconds[name] = round(time.perf_counter() - start, 3)
+            return value
+
+    def override(self, name, value):
+        """Fija el valor de un recurso sin ejecutar su loader (benchmarks, pruebas)."""
+        with self._lock:
+            self._locks.setdefault(name, threading.Lock())
+            self._loaders.setdefault(name, lambda: value)
+        self._values[name] = value
+
+    def reset(self, name):
+        """Descarta el recurso cargado; se volverá a cargar en el siguiente uso."""
+        if name not in self._locks:
+            return
+        with self._locks[name]:
+            self._values.pop(name, None)
+            self._load_seconds.pop(name, None)
+
+    def is_registered(self, name):
+        return name in self._loaders
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def ready(self):
+        """True si todos los recursos registrados están cargados."""
+        return all(name in self._values for name in self._loaders)
+
+    def status(self):
+        """Estado de cada recurso: ready, error o pending, con el tiempo de carga."""
+        status = {}
+        for name in self._loaders:
+            if name in self._values:
+                status[name] = {"state": "ready", "load_seconds": self._load_seconds.get(name)}
+            elif name in self._errors:
+                status[name] = {"state": "error", "error": self._errors[name]}
+            else:
+                status[name] = {"state": "pending"}
+        return status
+
+    def warm_up(self, names=None):
+        """Carga (de forma síncrona) los recursos indicados o todos. Los errores quedan en status()."""
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Error cargando el recurso {name}: {e!r}")
+
+    def start_warm_up(self, names=None):
+        """Lanza warm_up en un hilo en segundo plano (una sola vez)."""
+        with self._lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(target=self.warm_up, args=(names,), name="warm-up", daemon=True)
+                self._warm_up_thread.start()
+        return self._warm_up_thread
+
+
+# registro global compartido por las herramientas y la API
+registry = ResourceRegistry()
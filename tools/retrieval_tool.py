@@ -1,9 +1,18 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from dotenv import load_dotenv 
 import os
+import time
+from embeddings.batcher import EmbeddingBatcher, EMBED_BATCHING
+from embeddings.cache import EmbeddingCache, EMBED_CACHE_PATH
+from embeddings.model import EMBED_MODEL_NAME, embedding_signature, truncate
+from embeddings.quantization import EMBED_QUANTIZATION, QUANTIZED_INDEX_DIR, QuantizedIndex
+from tools.resources import registry
+from tools.executor import run_blocking
+from tools.lexical_index import BM25Index, LEXICAL_INDEX_FILE, reciprocal_rank_fusion
+from tools.chunking import merge_chunks, neighbour_ids
+from tools.tracing import debug, span
+import tools.degree_resolver  # registra "degree_resolver"
 
 """
 se utiliza la librería gradio para hacer el front de una demo rápida 
@@ -12,6 +21,10 @@ se utiliza la librería gradio para hacer el front de una demo rápida
 load_dotenv()
 CHROMA_PATH =os.getenv("CHROMA_PATH") #PATH A LA BBDD
 COLLECTION=os.getenv("COLLECTION") #Nombre de la colección
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"             #combinar BM25 y búsqueda densa
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))      #candidatos de cada búsqueda antes de fusionar
+RRF_K = int(os.getenv("RRF_K", "60"))                              #constante de reciprocal rank fusion
+CHUNK_NEIGHBOURS = int(os.getenv("CHUNK_NEIGHBOURS", "0"))         #fragmentos vecinos que se añaden a cada resultado
 
 """
 La recuperación de docs de la bbdd chroma se hace como una herramienta.
@@ -21,25 +34,169 @@ la bbdd vectorial no se debería cargar en memoria, pero al ser una prueba simpl
 CHROMA_PATH = CHROMA_PATH #path a la bbdd
 COLLECTION_NAME = COLLECTION
 
-# Cargamos el modelo de embeddings en este caso Qwen3-Embedding-4B
-model = SentenceTransformer("Qwen/Qwen3-Embedding-4B")
+INGEST_MARKER = "ingest_version.json" #fichero que escribe ingest_data al terminar una ingesta
 
-# Cargamos chroma, la base de datos vectorial
-client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = client.get_collection(COLLECTION_NAME)
 
+# Los recursos pesados no se cargan al importar el módulo: se registran y se cargan en el primer uso
+# (o en el calentamiento en segundo plano de la API). Los imports de torch/chroma también van dentro.
+def load_embedder():
+    # modelo de embeddings, el mismo que en la ingesta (embeddings/model.py)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL_NAME)
 
-# función de la tool
-def retrieve_docs(query: str, k: int = 5) -> List[Dict[str, Any]]:
-    print("\n===== TOOL: retrieve_docs =====") #log
-    print("Query:", query)
 
-    query_embedding = model.encode([query]).tolist()
+def load_collection():
+    # chroma, la base de datos vectorial
+    import chromadb
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return client.get_collection(COLLECTION_NAME)
+
+
+def load_lexical_index():
+    # índice BM25 que escribe ingest_data junto a chroma; si no existe se usa solo la búsqueda densa
+    path = os.path.join(CHROMA_PATH or "", LEXICAL_INDEX_FILE)
+    if not os.path.exists(path):
+        print(f"Índice léxico no encontrado en {path}; retrieve_docs usará solo búsqueda densa")
+        return BM25Index()
+    return BM25Index.load(path)
+
+
+def load_quantized_index():
+    # índice int8/binario que escribe ingest_data; si no existe o es de otra configuración se consulta chroma
+    path = os.path.join(CHROMA_PATH or "", QUANTIZED_INDEX_DIR)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        print(f"Índice cuantizado no encontrado en {path}; retrieve_docs consultará chroma")
+        return None
+    index = QuantizedIndex.load(path)
+    if index.kind != EMBED_QUANTIZATION or index.signature != embedding_signature():
+        print(f"El índice de {path} es {index.kind} con {index.signature}; retrieve_docs consultará chroma")
+        return None
+    return index
+
+
+def load_embedding_cache():
+    # caché persistente de embeddings: las consultas repetidas no vuelven a pasar por el modelo
+    return EmbeddingCache(EMBED_MODEL_NAME)
+
+
+def load_query_encoder():
+    # las consultas concurrentes se codifican juntas en una sola pasada del modelo (embeddings/batcher.py)
+    return EmbeddingBatcher(registry.get("embedder"))
+
+
+registry.register("embedder", load_embedder)
+registry.register("collection", load_collection)
+if HYBRID_SEARCH:
+    registry.register("lexical_index", load_lexical_index)
+if EMBED_QUANTIZATION != "none":
+    registry.register("quantized_index", load_quantized_index)
+if EMBED_CACHE_PATH:
+    registry.register("embedding_cache", load_embedding_cache)
+if EMBED_BATCHING:
+    registry.register("query_encoder", load_query_encoder)
+
+
+def embed_query(query: str):
+    """
+    Embedding de una consulta (pasando por la caché de embeddings y el micro-batching si están activos),
+    truncado a EMBED_DIM como los de la colección.
+    """
+    model = registry.get("query_encoder" if EMBED_BATCHING else "embedder")
+    with span("embed"):
+        if EMBED_CACHE_PATH:
+            vector = registry.get("embedding_cache").encode(model, [query])[0]
+        else:
+            vector = model.encode([query])[0]
+    return truncate(vector)
+
+
+async def aembed_query(query: str):
+    """
+    embed_query para el camino asíncrono: con micro-batching, la consulta espera su lote sin ocupar un hilo
+    del pool de herramientas, así que pueden juntarse hasta EMBED_BATCH_MAX_SIZE consultas y no solo TOOL_MAX_WORKERS.
+    La caché de embeddings (SQLite) y la carga del modelo sí se hacen en el pool.
+    """
+    if not EMBED_BATCHING:
+        return await run_blocking(embed_query, query)
+    if not registry.is_loaded("query_encoder"):
+        await run_blocking(registry.get, "query_encoder")
+    cache = registry.get("embedding_cache") if EMBED_CACHE_PATH else None
+    with span("embed"):
+        if cache is not None:
+            cached = (await run_blocking(cache.get_many, [query]))[0]
+            if cached is not None:
+                return truncate(cached)
+        start = time.perf_counter()
+        vector = (await registry.get("query_encoder").aencode([query]))[0]
+        if cache is not None:
+            await run_blocking(cache.store_encoded, [query], [vector], time.perf_counter() - start)
+    return truncate(vector)
+
+
+def collection_version():
+    """
+    Versión de la colección: la ingesta escribe un fichero de marca en CHROMA_PATH al terminar,
+    así la API sabe cuándo se ha re-ingerido sin tener que consultar chroma.
+    """
+    try:
+        return os.stat(os.path.join(CHROMA_PATH, INGEST_MARKER)).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
 
-    results = collection.query(
-        query_embeddings=query_embedding,
-        n_results=k
-    )
+def build_where(degrees, section=None):
+    """Filtro de metadatos de chroma para los grados y la sección indicados (None si no hay filtro)."""
+    clauses = []
+    if degrees:
+        clauses.append({"degree": degrees[0]} if len(degrees) == 1 else {"degree": {"$in": list(degrees)}})
+    if section:
+        clauses.append({"section": section})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def resolve_degrees(degree):
+    """Nombre de grado aproximado -> valores exactos del metadato `degree` (solo coincidencias con todas las palabras)."""
+    if not degree:
+        return []
+    degrees = registry.get("degree_resolver").resolve_titles(degree, allow_partial=False)
+    if not degrees:
+        debug(f"Grado '{degree}' no reconocido; se busca sin filtro de grado")
+    return degrees
+
+
+def quantized_search(index, query_embedding, k, degrees=None, section=None):
+    """Búsqueda en el índice cuantizado; el texto y los metadatos de los resultados se leen de chroma por id."""
+    with span("quantized_search", k=k, kind=index.kind):
+        hits = index.search(query_embedding, k, degrees=degrees, section=section)
+    if not hits:
+        return []
+    ids = [doc_id for doc_id, _ in hits]
+    page = registry.get("collection").get(ids=ids, include=["documents", "metadatas"])
+    found = {doc_id: (text, metadata) for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])}
+    return [{"content": found[doc_id][0], "metadata": found[doc_id][1], "id": doc_id} for doc_id in ids if doc_id in found]
+
+
+def dense_search(query, k, where=None, degrees=None, section=None, query_embedding=None):
+    """
+    Búsqueda densa: en el índice cuantizado si está activo (filtrando por `degrees` y `section`)
+    y si no en chroma (filtrando con `where`). `query_embedding` evita volver a calcular el embedding.
+    """
+    if query_embedding is None:
+        query_embedding = embed_query(query)
+    index = registry.get("quantized_index") if EMBED_QUANTIZATION != "none" else None
+    if index is not None:
+        return quantized_search(index, query_embedding, k, degrees, section)
+
+    query_embedding = [query_embedding.tolist()]
+    collection = registry.get("collection")
+    with span("chroma_query", k=k):
+        results = collection.query(
+            query_embeddings=query_embedding,
+            n_results=k,
+            where=where,
+        )
 
     # aplanamos el output
     docs = []
@@ -49,7 +206,55 @@ def retrieve_docs(query: str, k: int = 5) -> List[Dict[str, Any]]:
             "metadata": results["metadatas"][0][i],
             "id": results["ids"][0][i]
         })
-    print("Retrieved docs:", len(docs))
-    print("Preview:", docs[0]["content"][:200] if docs else "EMPTY")
+    return docs
+
+
+def fetch_neighbours(docs, window):
+    """Fragmentos vecinos (mismo documento, hasta `window` posiciones) que no están ya en `docs`."""
+    have = {d["id"] for d in docs}
+    wanted = []
+    for doc in docs:
+        for doc_id in neighbour_ids(doc["metadata"] or {}, window):
+            if doc_id not in have:
+                have.add(doc_id)
+                wanted.append(doc_id)
+    if not wanted:
+        return []
+    page = registry.get("collection").get(ids=wanted, include=["documents", "metadatas"])
+    return [
+        {"content": text, "metadata": metadata, "id": doc_id}
+        for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+    ]
+
+
+# función de la tool
+def retrieve_docs(query: str, k: int = 5, degree: Optional[str] = None, section: Optional[str] = None,
+                  neighbours: int = CHUNK_NEIGHBOURS, query_embedding=None) -> List[Dict[str, Any]]:
+    """
+    Búsqueda híbrida: densa (chroma) + BM25, fusionadas con RRF. El grado y la sección, si se indican,
+    se aplican como filtro de metadatos en ambas búsquedas (en chroma a través de `where`).
+    Los fragmentos contiguos de un mismo documento se devuelven unidos; con neighbours > 0 cada fragmento
+    se amplía con sus vecinos. `query_embedding` (aretrieve_docs) evita calcular aquí el embedding de la consulta.
+    """
+    debug("\n===== TOOL: retrieve_docs =====") #log
+    debug("Query:", query, "| degree:", degree, "| section:", section)
+
+    degrees = resolve_degrees(degree)
+    where = build_where(degrees, section)
+
+    if not HYBRID_SEARCH:
+        docs = dense_search(query, k, where, degrees, section, query_embedding)
+    else:
+        candidates = max(k, HYBRID_CANDIDATES)
+        dense = dense_search(query, candidates, where, degrees, section, query_embedding)
+        lexical_index = registry.get("lexical_index")
+        with span("bm25"):
+            lexical = lexical_index.search(query, candidates, degrees=degrees, section=section)
+        docs = reciprocal_rank_fusion([dense, lexical], k, rrf_k=RRF_K)
+
+    docs = merge_chunks(docs, fetch_neighbours(docs, neighbours) if neighbours else ())
+
+    debug("Retrieved docs:", len(docs))
+    debug("Preview:", docs[0]["content"][:200] if docs else "EMPTY")
 
     return docs
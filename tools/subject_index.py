@@ -0,0 +1,166 @@
+import math
+import re
+
+import numpy as np
+
+from tools.catalogue import Catalogue
+from tools.degree_resolver import DegreeResolver, normalize
+
+"""
+Índice del catálogo de asignaturas. Se construye una sola vez y sustituye al recorrido lineal de data_list
+en cada llamada a retrieve_subjects:
+- resolución del nombre del grado (DegreeResolver: exacta, prefijo, alias y erratas)
+- asignaturas leídas del catálogo compilado (tools/catalogue.py), normalmente abierto con mmap
+- texto de cada grado renderizado en el formato plano que espera el LLM la primera vez que se pide
+- créditos por curso precalculados y asignaturas normalizadas por grado, para las consultas
+  estructuradas (un curso, totales de ECTS, asignaturas comunes o exclusivas entre dos grados)
+"""
+
+RENDER_CACHE_SIZE = 1024 # máximo de grados renderizados en memoria
+YEAR_LABELS = ["PRIMER CURSO", "SEGUNDO CURSO", "TERCER CURSO", "CUARTO CURSO", "QUINTO CURSO", "SEXTO CURSO"]
+
+# la extracción de los PDFs deja el semestre pegado al nombre de algunas asignaturas
+_semester_prefix = re.compile(r"^(continuaci[oó]n\s+)?(primer|segundo)\s+semestre\s+", re.IGNORECASE)
+
+
+def clean_subject(name):
+    """Nombre de la asignatura sin el prefijo de semestre."""
+    return _semester_prefix.sub("", name).strip()
+
+
+def subject_key(name):
+    """Clave para comparar asignaturas entre grados (sin semestre, tildes ni mayúsculas)."""
+    return " ".join(normalize(clean_subject(name)).split()).rstrip(" .")
+
+
+def format_ects(value):
+    return "?" if math.isnan(value) else f"{value:g}"
+
+
+def render_degree(degree_title, subjects):
+    """
+    Aplana la info de un grado ya que el LLM se confundía al ver el dict y tendía a llamar la tool varias veces
+    """
+    lines = [f"Grado: {degree_title}", "Asignaturas:"]
+    for subject in subjects:
+        lines.append(f"  - {subject}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def render_year(degree_title, label, subjects, total):
+    # la suma incluye todas las optativas listadas: no son los créditos que cursa el alumno
+    lines = [f"Grado: {degree_title}", f"{label} (suma de las asignaturas listadas: {format_ects(total)} ECTS):"]
+    for name, ects in subjects:
+        lines.append(f"  - {clean_subject(name)} ({ects} ECTS)")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def render_totals(degree_title, totals):
+    lines = [f"Grado: {degree_title}", "Créditos de las asignaturas listadas por curso (optativas incluidas):"]
+    for label, total, count in totals:
+        lines.append(f"  - {label}: {format_ects(total)} ECTS ({count} asignaturas)")
+    lines.append(f"Suma de créditos de las asignaturas listadas: {format_ects(sum(t for _, t, _ in totals))} ECTS "
+                 "(incluye todas las optativas; no es el total de créditos del grado)")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def render_comparison(title_a, title_b, operation, subjects):
+    if operation == "difference":
+        header = f"Asignaturas de {title_a} que no tiene {title_b} ({len(subjects)}):"
+    else:
+        header = f"Asignaturas comunes a {title_a} y {title_b} ({len(subjects)}):"
+    lines = [header] + [f"  - {name}" for name in subjects]
+    lines.append("")
+    return "\n".join(lines)
+
+
+class SubjectIndex:
+    """
+    Catálogo de asignaturas indexado por título de grado. Las posiciones de los grados coinciden
+    con las del catálogo y las del DegreeResolver interno, también las de planes distintos con el mismo título
+    (search devuelve todas).
+    Se construye con la lista de grados de los JSON (se compila en memoria) o con un Catalogue ya abierto.
+    """
+
+    def __init__(self, data_list=None, catalogue=None):
+        self.catalogue = catalogue if catalogue is not None else Catalogue.from_data_list(data_list)
+        self.titles = self.catalogue.titles()   # títulos originales, por posición
+        self.resolver = DegreeResolver(self.titles)
+        self._rendered = {}                     # posición -> texto ya preparado para el LLM
+        self._keys = {}                         # posición -> {clave de asignatura: nombre}
+
+        # créditos totales de cada curso (las asignaturas sin créditos legibles cuentan 0)
+        sections = self.catalogue.sections
+        values = np.nan_to_num(sections["subject_ects_value"].astype(np.float64), nan=0.0)
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        starts = sections["year_subject_start"].astype(np.int64)
+        self.year_ects = cumulative[starts[1:]] - cumulative[starts[:-1]]
+
+    @classmethod
+    def from_catalogue(cls, catalogue):
+        return cls(catalogue=catalogue)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def subjects(self, pos):
+        """Lista plana de asignaturas de un grado."""
+        return self.catalogue.subjects(pos)
+
+    def year_totals(self, pos):
+        """Lista de (curso, créditos, número de asignaturas) de un grado."""
+        first = int(self.catalogue.sections["degree_year_start"][pos])
+        return [
+            (label, float(self.year_ects[first + i]), end - start)
+            for i, (label, start, end) in enumerate(self.catalogue.years(pos))
+        ]
+
+    def year_subjects(self, pos, label):
+        """Asignaturas (nombre, créditos) de un curso de un grado y el total del curso; None si no existe."""
+        first = int(self.catalogue.sections["degree_year_start"][pos])
+        names = self.catalogue.sections["subject_name"]
+        for i, (year, start, end) in enumerate(self.catalogue.years(pos)):
+            if year == label:
+                subjects = [(self.catalogue.string(int(names[j])), self.catalogue.ects(j)[0]) for j in range(start, end)]
+                return subjects, float(self.year_ects[first + i])
+        return None
+
+    def subject_keys(self, pos):
+        """{clave normalizada: nombre limpio} de las asignaturas de un grado (se calcula una vez por grado)."""
+        keys = self._keys.get(pos)
+        if keys is None:
+            keys = {}
+            for name in self.subjects(pos):
+                keys.setdefault(subject_key(name), clean_subject(name))
+            if len(self._keys) >= RENDER_CACHE_SIZE:
+                self._keys.clear()
+            self._keys[pos] = keys
+        return keys
+
+    def compare(self, pos_a, pos_b, operation="intersection"):
+        """Asignaturas comunes a los dos grados (intersection) o solo del primero (difference)."""
+        keys_a, keys_b = self.subject_keys(pos_a), self.subject_keys(pos_b)
+        if operation == "difference":
+            return [name for key, name in keys_a.items() if key not in keys_b]
+        return [name for key, name in keys_a.items() if key in keys_b]
+
+    def search(self, query):
+        """Devuelve las posiciones de los grados que casan con la consulta, de mejor a peor."""
+        if not normalize(query):
+            return list(range(len(self.titles)))
+        return [pos for pos, _ in self.resolver.resolve(query)]
+
+    def render(self, positions):
+        """Concatena el texto renderizado de los grados indicados."""
+        texts = []
+        for pos in positions:
+            text = self._rendered.get(pos)
+            if text is None:
+                if len(self._rendered) >= RENDER_CACHE_SIZE:
+                    self._rendered.clear()
+                text = self._rendered[pos] = render_degree(self.titles[pos], self.subjects(pos))
+            texts.append(text)
+        return "\n".join(texts)
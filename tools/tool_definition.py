@@ -1,10 +1,13 @@
 
 
+from typing import Literal, Optional
+
 from langchain_core.tools import StructuredTool
 
 from pydantic import BaseModel, Field
-from tools.retrieval_tool import retrieve_docs
+from tools.retrieval_tool import aembed_query, retrieve_docs, CHUNK_NEIGHBOURS
 from tools.get_subjects import retrieve_subjects
+from tools.executor import run_blocking
 
 
 class RetrieveDocsInput(BaseModel):
@@ -14,9 +17,22 @@ class RetrieveDocsInput(BaseModel):
 
     k: int = 5  
     Indica cuántos documentos se desean recuperar.
+
+    degree: str | None
+    Grado al que se refiere la pregunta, si lo hay. Se usa como filtro de metadatos para no mezclar grados.
+
+    section: str | None
+    Apartado concreto: conocimientos, salidas_profesionales o qa.
     """
     query: str = Field(..., description="Query to search in ChromaDB")
     k: int = Field(5, description="Number of results to return")
+    degree: Optional[str] = Field(
+        None, description="Degree name in spanish if the question is about a specific degree (e.g. 'criminología')"
+    )
+    section: Optional[str] = Field(
+        None,
+        description="Restrict to one section: 'conocimientos' (skills), 'salidas_profesionales' (careers) or 'qa'",
+    )
 
 
 class RetrieveSubjectsInput(BaseModel):
@@ -24,8 +40,40 @@ class RetrieveSubjectsInput(BaseModel):
     query: str
     como se indica abajo, es el nombre del grado del que se desea extraer información 
     (no necesariamente debe ser exacto porque se preprocesará pero debe acercarse lo mas posible)
+
+    year, totals, compare_with, operation
+    filtros opcionales para devolver solo lo que se pregunta (un curso, créditos por curso o la comparación
+    entre dos grados) en lugar de la lista completa de asignaturas
     """
     query: str = Field(..., description="Degree name to extract subjects for, in spanish")
+    year: Optional[int] = Field(
+        None, description="Only this course year (1 = primero ... 6 = sexto), with the ECTS of each subject"
+    )
+    totals: bool = Field(
+        False,
+        description="Return the ECTS sum of the listed subjects per course year instead of the subjects "
+                    "(electives included, so it is not the degree's credit total)",
+    )
+    compare_with: Optional[str] = Field(
+        None, description="Second degree name to compare with (common subjects or subjects only in `query`)"
+    )
+    operation: Literal["intersection", "difference"] = Field(
+        "intersection",
+        description="With compare_with: 'intersection' = subjects in both degrees, 'difference' = only in `query`",
+    )
+
+# versiones asíncronas de las herramientas: el trabajo pesado (embeddings, chroma) se lanza en el pool acotado
+# para que el grafo pueda ejecutarse con ainvoke/astream sin bloquear el event loop de la API
+async def aretrieve_docs(query: str, k: int = 5, degree: Optional[str] = None, section: Optional[str] = None):
+    # el embedding se pide al micro-batching sin ocupar un hilo del pool mientras espera su lote
+    query_embedding = await aembed_query(query)
+    return await run_blocking(retrieve_docs, query, k, degree, section, CHUNK_NEIGHBOURS, query_embedding)
+
+
+async def aretrieve_subjects(query: str, year: Optional[int] = None, totals: bool = False,
+                             compare_with: Optional[str] = None, operation: str = "intersection"):
+    return await run_blocking(retrieve_subjects, query, year, totals, compare_with, operation)
+
 
 retrieve_docs_tool = StructuredTool.from_function(
     name="retrieve_docs",
@@ -35,6 +83,7 @@ retrieve_docs_tool = StructuredTool.from_function(
         "Use this also for general questions about a degree for example 'Por qué elegir la carrera de diseño?' "
     ),
     func=retrieve_docs,
+    coroutine=aretrieve_docs,
     args_schema=RetrieveDocsInput,
 )
 
@@ -43,9 +92,12 @@ retrieve_subjects_tool = StructuredTool.from_function(
     description=(
         "Retrieve the full list of subjects for a specific university degree at UCM. "
         "ALWAYS use this tool when the user asks about subjects, courses, or the study plan of any degree. "
-        "Pass the degree name in Spanish (e.g. 'enfermería', 'derecho', 'medicina')."
+        "Pass the degree name in Spanish (e.g. 'enfermería', 'derecho', 'medicina'). "
+        "Use `year` for one course year, `totals` for ECTS per year, and `compare_with` with `operation` "
+        "to get the subjects two degrees share or the ones only the first degree has."
     ),
     func=retrieve_subjects,
+    coroutine=aretrieve_subjects,
     args_schema=RetrieveSubjectsInput,
 )
 
@@ -0,0 +1,298 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+
+"""
+Trazas y métricas de latencia por petición, sin dependencias externas.
+- span("nombre", **atributos): mide un tramo (nodo agent, nodo tools, cada herramienta, encode, consulta a chroma...)
+  y lo añade a la traza de la petición en curso; el tramo padre se hereda por contextvars, también en los hilos
+  del pool de herramientas (run_blocking copia el contexto)
+- trace(request_id): abre la traza de una petición; al cerrarse queda en las últimas TRACE_KEEP trazas
+  (GET /traces/{request_id}) y, si TRACE_LOG está definido, se añade como una línea JSON a ese fichero
+- metrics: histogramas de duración por tramo que la API expone en /metrics (formato de texto de Prometheus)
+- llm_timer: callback del LLM que mide el tiempo hasta el primer token (TTFT) y la duración de cada llamada
+- debug(...): sustituye a los print de depuración; desactivados salvo con DEBUG_LOGS=1 (print bloquea en stdout)
+Con TRACING=0, span() devuelve siempre el mismo nullcontext y no se mide nada.
+"""
+load_dotenv()
+
+TRACING = os.getenv("TRACING", "1") == "1"                  #medir tramos y exponer histogramas en /metrics
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", "200"))            #trazas recientes que se guardan en memoria
+TRACE_LOG = os.getenv("TRACE_LOG", "")                      #fichero JSONL donde se escribe cada traza ("" no escribe)
+DEBUG_LOGS = os.getenv("DEBUG_LOGS", "0") == "1"            #print de depuración en nodos y herramientas
+
+# límites superiores (segundos) de los cubos de los histogramas
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = contextlib.nullcontext()
+_trace = contextvars.ContextVar("trace", default=None)
+_parent = contextvars.ContextVar("span_parent", default=None)
+
+
+def debug(*args):
+    """print de depuración (solo con DEBUG_LOGS=1)."""
+    if DEBUG_LOGS:
+        print(*args)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Histogramas por (métrica, etiquetas), seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = OrderedDict()  # (nombre, etiquetas) -> Histogram
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """{nombre: {etiquetas: {"count", "mean_ms"}}} para inspección rápida (benchmarks)."""
+        with self._lock:
+            result = {}
+            for (name, labels), h in self._histograms.items():
+                label = ",".join(f"{k}={v}" for k, v in labels)
+                result.setdefault(name, {})[label] = {"count": h.count, "mean_ms": 1000 * h.sum / h.count}
+            return result
+
+    def render(self):
+        """Histogramas en formato de texto de Prometheus."""
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), h in self._histograms.items():
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                base = ",".join(f'{k}="{v}"' for k, v in labels)
+                sep = "," if base else ""
+                cumulative = 0
+                for bound, count in zip(self.format_buckets(h.buckets), h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{base}}} {h.sum:.6f}")
+                lines.append(f"{name}_count{{{base}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def format_buckets(buckets):
+        return [f"{b:g}" for b in buckets] + ["+Inf"]
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """Tramos de una petición, con tiempos relativos al inicio de la petición."""
+
+    def __init__(self, request_id, **attrs):
+        self.request_id = request_id
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.duration = None
+        self.spans = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        return {
+            "request_id": self.request_id,
+            "started_at": self.started_at,
+            "duration_ms": round(1000 * self.duration, 3) if self.duration is not None else None,
+            **self.attrs,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "id", "token")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        trace = _trace.get()
+        self.id = trace.new_id() if trace is not None else None
+        self.token = _parent.set(self.id)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _parent.reset(self.token)
+        metrics.observe("span_seconds", end - self.start, span=self.name)
+        trace = _trace.get()
+        if trace is not None:
+            record = {
+                "id": self.id,
+                "parent": _parent.get(),
+                "name": self.name,
+                "start_ms": round(1000 * (self.start - trace.start), 3),
+                "duration_ms": round(1000 * (end - self.start), 3),
+            }
+            if self.attrs:
+                record["attrs"] = self.attrs
+            if exc_type is not None:
+                record["error"] = repr(exc)
+            trace.add(record)
+        return False
+
+
+def span(name, **attrs):
+    """Context manager que mide el tramo `name` (no hace nada con TRACING=0)."""
+    if not TRACING:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current_request_id():
+    trace = _trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+_recent = OrderedDict()  # request_id -> traza terminada (dict)
+_recent_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def trace(request_id=None, **attrs):
+    """
+    Abre la traza de una petición: todos los tramos medidos dentro (aunque sea en otros hilos o tareas)
+    quedan ligados a `request_id`. Al salir se mide la petición completa (request_seconds).
+    """
+    if not TRACING:
+        yield None
+        return
+    current = Trace(request_id or new_request_id(), **attrs)
+    token = _trace.set(current)
+    try:
+        yield current
+    finally:
+        try:
+            _trace.reset(token)
+        except ValueError:
+            # un generador de streaming cerrado desde otro contexto (cliente desconectado)
+            pass
+        current.duration = time.perf_counter() - current.start
+        metrics.observe("request_seconds", current.duration, **{k: v for k, v in attrs.items() if k == "endpoint"})
+        _finish(current.to_dict())
+
+
+def _finish(record):
+    with _recent_lock:
+        _recent[record["request_id"]] = record
+        while len(_recent) > TRACE_KEEP:
+            _recent.popitem(last=False)
+    if TRACE_LOG:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with _log_lock, open(TRACE_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def get_trace(request_id):
+    """Traza terminada de una petición reciente (o None)."""
+    with _recent_lock:
+        return _recent.get(request_id)
+
+
+class LLMTimer(BaseCallbackHandler):
+    """
+    Callback del LLM: duración de cada llamada (tramo "llm") y tiempo hasta el primer fragmento con texto
+    o con tool call (llm_ttft_seconds). Solo hay TTFT si el modelo se llama en streaming.
+    """
+    run_inline = True  # se ejecuta en la misma tarea que la llamada (misma traza)
+
+    def __init__(self):
+        self._runs = {}  # run_id -> [inicio, ttft]
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if TRACING:
+            with self._lock:
+                self._runs[run_id] = [time.perf_counter(), None]
+
+    def on_llm_new_token(self, token, *, chunk=None, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is None or run[1] is not None:
+            return
+        message = getattr(chunk, "message", None)
+        if token or getattr(message, "tool_call_chunks", None):
+            run[1] = time.perf_counter() - run[0]
+            metrics.observe("llm_ttft_seconds", run[1])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def _end(self, run_id, error=None):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        end = time.perf_counter()
+        metrics.observe("span_seconds", end - run[0], span="llm")
+        trace = _trace.get()
+        if trace is not None:
+            record = {
+                "id": trace.new_id(),
+                "parent": _parent.get(),
+                "name": "llm",
+                "start_ms": round(1000 * (run[0] - trace.start), 3),
+                "duration_ms": round(1000 * (end - run[0]), 3),
+            }
+            if run[1] is not None:
+                record["attrs"] = {"ttft_ms": round(1000 * run[1], 3)}
+            if error is not None:
+                record["error"] = repr(error)
+            trace.add(record)
+
+
+llm_timer = LLMTimer()